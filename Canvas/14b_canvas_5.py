@@ -1,12 +1,32 @@
 import tkinter as tk
-from tkinter import scrolledtext, ttk, messagebox
-import ollama
-import threading
+from tkinter import scrolledtext, ttk, messagebox, filedialog, simpledialog
 import time
 import os
 from tkinter import font
-import re
 import uuid
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gptathome.startup import StartupTimer
+from gptathome.backend import OllamaBackend
+from gptathome.pump import TokenPump
+from gptathome.transcript import Transcript, THINK_TAG
+from gptathome.markdown import DARK_STYLES
+from gptathome.think import KEEP_THINKING
+from gptathome.chat import ChatTurn
+from gptathome.telemetry import TelemetryLog
+from gptathome.scheduler import RequestScheduler, Session, PRIORITY_HIGH, PRIORITY_NORMAL
+from gptathome.warmup import ModelWarmer
+from gptathome.store import ConversationStore
+from gptathome.cache import ResponseCache
+from gptathome.retrieval import Retriever, available as retrieval_available
+from gptathome.fences import FenceParser
+from gptathome.tabs import TabManager
+from gptathome.router import ModelRouter, LATENCY_TARGETS, installed_models
+
+# The highlighter engine is imported by the first editor, after the window is up
+startup = StartupTimer("14b_canvas_5")
 
 # Add constants at the top of the file:
 SYNTAX_COLORS = {
@@ -17,92 +37,273 @@ SYNTAX_COLORS = {
     "number": "#79C0FF"
 }
 
+# Replies are formatted as Markdown; fences use the editor's colors
+MARKDOWN_STYLES = dict(DARK_STYLES, **{tag: {"foreground": color} for tag, color in SYNTAX_COLORS.items()})
+
 UI_FONTS = {
     "code": ("Consolas", 12),
     "chat": ("Segoe UI", 10)
 }
 
+# How often highlight results are collected, and the time budget per frame
+HIGHLIGHT_POLL_MS = 16
+HIGHLIGHT_SLICE_SECONDS = 0.008
+# Lines above and below the visible ones that are highlighted ahead of scrolling
+VIEWPORT_MARGIN = 150
+# Time per event loop tick spent inserting a file being opened
+LOAD_SLICE_SECONDS = 0.03
+# Longer tabs only send the lines around the view with a prompt
+MAX_PROMPT_LINES = 2000
+
 class SyntaxHighlightingText(scrolledtext.ScrolledText):
     def __init__(self, *args, **kwargs):
+        from gptathome.highlighter import HighlightWorker
+        
         super().__init__(*args, **kwargs)
-        self.tag_configure("keyword", foreground="#FF7B72")
-        self.tag_configure("string", foreground="#A5D6FF")
-        self.tag_configure("comment", foreground="#8B949E")
-        self.tag_configure("function", foreground="#D2A8FF")
-        self.tag_configure("number", foreground="#79C0FF")
+        for tag, color in SYNTAX_COLORS.items():
+            self.tag_configure(tag, foreground=color)
         
-        self.bind('<KeyRelease>', self.highlight_syntax)
+        # Lexing runs on the shared highlight worker; edits only send the
+        # touched lines and bump the generation so stale results are dropped
+        self._doc = HighlightWorker.shared().document()
+        self._generation = 0
+        self._poll_timer = None
+        self._viewport_timer = None
         
-    def highlight_syntax(self, event=None):
-        # Add debouncing to prevent excessive updates
-        if hasattr(self, '_highlight_timer'):
-            self.after_cancel(self._highlight_timer)
+        # Long documents are only tagged around the visible lines, so every
+        # scroll (and resize) reports the viewport to the worker
+        self.configure(yscrollcommand=self._on_yscroll)
+        
+        # Route the Tcl widget command through _proxy so typing, pasting and
+        # programmatic inserts/deletes all report which lines they touched
+        self._orig = self._w + "_orig"
+        self.tk.call("rename", self._w, self._orig)
+        self.tk.createcommand(self._w, self._proxy)
         
-        self._highlight_timer = self.after(500, self._do_highlight)
+    def destroy(self):
+        if self._poll_timer:
+            self.after_cancel(self._poll_timer)
+        if self._viewport_timer:
+            self.after_cancel(self._viewport_timer)
+        self._doc.close()
+        self.tk.deletecommand(self._w)
+        self.tk.call("rename", self._orig, self._w)
+        super().destroy()
+    
+    def _line_of(self, index):
+        return int(self.tk.call(self._orig, "index", index).split(".")[0])
+    
+    def visible_lines(self):
+        """First and last line on screen"""
+        return self._line_of("@0,0"), self._line_of(f"@0,{self.winfo_height()}")
+    
+    def _on_yscroll(self, first, last):
+        self.vbar.set(first, last)
+        if self._viewport_timer is None:
+            self._viewport_timer = self.after(HIGHLIGHT_POLL_MS, self._send_viewport)
+    
+    def _send_viewport(self):
+        self._viewport_timer = None
+        first, last = self.visible_lines()
+        self._doc.set_viewport(first - VIEWPORT_MARGIN, last + VIEWPORT_MARGIN)
+        self._schedule_poll()
+    
+    def _proxy(self, command, *args):
+        if command not in ("insert", "delete", "replace") or not args:
+            return self.tk.call((self._orig, command) + args)
+        
+        last_line = self._line_of("end-1c")
+        first = min(self._line_of(args[0]), last_line)
+        removed = 0
+        inserted = ""
+        if command == "insert":
+            inserted = "".join(args[1::2])
+        else:
+            end = args[1] if len(args) > 1 else f"{args[0]}+1c"
+            removed = min(self._line_of(end), last_line) - first
+            if command == "replace":
+                inserted = "".join(args[2::2])
+            elif len(args) > 2:
+                removed = None  # Multiple ranges: fall back to a full re-lex
+        
+        result = self.tk.call((self._orig, command) + args)
+        
+        self._generation += 1
+        if removed is None:
+            self.highlight_syntax()
+        else:
+            last = first + inserted.count("\n")
+            texts = self.tk.call(self._orig, "get", f"{first}.0", f"{last}.end")
+            self._doc.edit(self._generation, first, removed, str(texts).split("\n"))
+            self._schedule_poll()
+        return result
+        
+    def highlight_syntax(self, event=None):
+        """Re-highlight the whole document"""
+        self._generation += 1
+        text = self.tk.call(self._orig, "get", "1.0", "end-1c")
+        self._doc.reset(self._generation, str(text).split("\n"))
+        self._schedule_poll()
+    
+    def _schedule_poll(self):
+        if self._poll_timer is None:
+            self._poll_timer = self.after(HIGHLIGHT_POLL_MS, self._apply_highlight)
 
-    def _do_highlight(self):
-        # Remove all existing tags
-        for tag in ["keyword", "string", "comment", "function", "number"]:
-            self.tag_remove(tag, "1.0", "end")
-        
-        # Get visible lines only instead of entire content
-        first_line = self.index("@0,0")
-        last_line = self.index("@0,%d" % self.winfo_height())
-        content = self.get(first_line, last_line)
-        
-        # Keywords
-        keywords = ["def", "class", "import", "from", "return", "if", "else", "elif",
-                   "try", "except", "finally", "for", "while", "in", "is", "None",
-                   "True", "False", "and", "or", "not", "with", "as", "break",
-                   "continue", "global", "lambda"]
-        
-        for keyword in keywords:
-            start_index = first_line
-            while True:
-                start = self.search(r'\m' + keyword + r'\M', start_index, last_line, regexp=True)
-                if not start:
-                    break
-                end = f"{start}+{len(keyword)}c"
-                self.tag_add("keyword", start, end)
-                start_index = end
-                
-        # Strings
-        for match in re.finditer(pattern := r'(\".*?\"|\'.*?\')', content):
-            start = f"{first_line}+{match.start()}c"
-            end = f"{first_line}+{match.end()}c"
-            self.tag_add("string", start, end)
-            
-        # Comments
-        for match in re.finditer(r'#.*$', content, re.MULTILINE):
-            start = f"{first_line}+{match.start()}c"
-            end = f"{first_line}+{match.end()}c"
-            self.tag_add("comment", start, end)
-            
-        # Functions
-        for match in re.finditer(r'def\s+(\w+)\s*\(', content):
-            start = f"{first_line}+{match.start(1)}c"
-            end = f"{first_line}+{match.end(1)}c"
-            self.tag_add("function", start, end)
-            
-        # Numbers
-        for match in re.finditer(r'\b\d+\b', content):
-            start = f"{first_line}+{match.start()}c"
-            end = f"{first_line}+{match.end()}c"
-            self.tag_add("number", start, end)
+    def _apply_highlight(self):
+        """Apply worker results within a bounded time slice"""
+        from gptathome.highlighter import TAGS
+        
+        self._poll_timer = None
+        deadline = time.perf_counter() + HIGHLIGHT_SLICE_SECONDS
+        results = self._doc.results
+        while time.perf_counter() < deadline and not results.empty():
+            result_id, generation, first, last, ranges = results.get()
+            if generation != self._generation:
+                continue  # Superseded; the worker re-lexes these lines
+            for tag in TAGS:
+                self.tag_remove(tag, f"{first}.0", f"{last}.end")
+            for tag, indices in ranges.items():
+                self.tag_add(tag, *indices)
+            self._doc.acked.add(result_id)
+        
+        if self._doc.busy:
+            self._schedule_poll()
 
 class CodeTab(ttk.Frame):
-    """A tab containing a code editor with syntax highlighting"""
-    def __init__(self, parent, *args, **kwargs):
+    """
+    A tab containing a code editor with syntax highlighting.
+    
+    The editor is only built when the tab is first shown or its editor is
+    used, so tabs opened in the background cost a frame and a string.
+    """
+    def __init__(self, parent, code_content="", bindings=None, *args, **kwargs):
         super().__init__(parent)
-        self.code_editor = SyntaxHighlightingText(
-            self,
-            wrap=tk.NONE,
-            font=UI_FONTS["code"],
-            background='#0D1117',
-            foreground='#C9D1D9',
-            insertbackground='white'
-        )
-        self.code_editor.pack(expand=True, fill='both', padx=5, pady=5)
+        self._code_editor = None
+        self._initial_code = code_content
+        self._bindings = bindings or {}
+        self.path = None          # File this tab was opened from or saved to
+        self.newline = "\n"
+        self.language = None
+        self._load_timer = None
+        self.bind("<Map>", lambda event: self.code_editor)
+    
+    def destroy(self):
+        if self._load_timer:
+            self.after_cancel(self._load_timer)
+        super().destroy()
+    
+    @property
+    def loading(self):
+        return self._load_timer is not None
+    
+    @property
+    def code_editor(self):
+        if self._code_editor is None:
+            editor = SyntaxHighlightingText(
+                self,
+                wrap=tk.NONE,
+                font=UI_FONTS["code"],
+                background='#0D1117',
+                foreground='#C9D1D9',
+                insertbackground='white'
+            )
+            editor.pack(expand=True, fill='both', padx=5, pady=5)
+            for sequence, handler in self._bindings.items():
+                editor.bind(sequence, handler)
+            if self._initial_code:
+                editor.insert("1.0", self._initial_code)
+                self._initial_code = ""
+                editor.edit_modified(False)
+            self._code_editor = editor
+            # Keep placed overlays (the close button) above the new editor
+            for child in self.place_slaves():
+                child.lift()
+        return self._code_editor
+    
+    @property
+    def touched(self):
+        """Edited by the user (or still loading) since it was opened or saved"""
+        if self._code_editor is None:
+            return False
+        return self.loading or bool(self._code_editor.edit_modified())
+    
+    def get_text(self):
+        """The full content without building an editor that was never shown"""
+        if self._code_editor is None:
+            return self._initial_code
+        return self._code_editor.get("1.0", "end-1c")
+    
+    def memory_stats(self):
+        """(chars, lines, tag ranges, editor built) for the tab memory report"""
+        editor = self._code_editor
+        if editor is None:
+            return len(self._initial_code), self._initial_code.count("\n") + 1, 0, False
+        chars = int(editor.tk.call(editor._orig, "count", "-chars", "1.0", "end-1c") or 0)
+        tag_ranges = sum(len(editor.tag_ranges(tag)) // 2 for tag in SYNTAX_COLORS)
+        return chars, editor._line_of("end-1c"), tag_ranges, True
+    
+    def get_code(self):
+        """The tab's code without building an editor that was never shown"""
+        if self._code_editor is None:
+            return self._initial_code.strip()
+        editor = self._code_editor
+        line_count = editor._line_of("end-1c")
+        if line_count <= MAX_PROMPT_LINES:
+            return editor.get("1.0", tk.END).strip()
+        # Large file: only the part around the view
+        first, last = editor.visible_lines()
+        first = max(1, min(first - (MAX_PROMPT_LINES - (last - first)) // 2,
+                           line_count - MAX_PROMPT_LINES + 1))
+        last = first + MAX_PROMPT_LINES - 1
+        name = os.path.basename(self.path) if self.path else "this tab"
+        return (f"# Lines {first}-{last} of {line_count} in {name}\n"
+                + editor.get(f"{first}.0", f"{last}.end"))
+    
+    def load_file(self, path, on_progress=None, on_done=None):
+        """
+        Replace the content with a file, inserted piece by piece from the
+        event loop so the window stays responsive while it loads
+        """
+        from gptathome.files import iter_text_chunks, detect_newline
+        
+        if self._load_timer:
+            self.after_cancel(self._load_timer)
+        editor = self.code_editor
+        editor.delete("1.0", tk.END)
+        self.path = path
+        self.newline = detect_newline(path)
+        chunks = iter_text_chunks(path)
+        total = os.path.getsize(path)
+        loaded = 0
+        
+        def step():
+            nonlocal loaded
+            deadline = time.perf_counter() + LOAD_SLICE_SECONDS
+            for chunk in chunks:
+                editor.insert("end-1c", chunk)
+                loaded += len(chunk)
+                if time.perf_counter() > deadline:
+                    if on_progress:
+                        on_progress(self, min(loaded, total), total)
+                    self._load_timer = self.after(1, step)
+                    return
+            self._load_timer = None
+            editor.edit_reset()
+            editor.edit_modified(False)
+            editor.mark_set(tk.INSERT, "1.0")
+            if on_done:
+                on_done(self)
+        
+        step()
+    
+    def save_file(self, path=None):
+        """Write the content back with the file's original line endings"""
+        from gptathome.files import write_text
+        
+        path = path or self.path
+        write_text(path, self.code_editor.get("1.0", "end-1c"), self.newline)
+        self.path = path
+        self.code_editor.edit_modified(False)
 
 class ChatCodeEditor:
     """
@@ -122,13 +323,53 @@ class ChatCodeEditor:
         
         # Model settings
         self.model = 'deepseek-r1:14b'
-        self.chat_history = []
-        self.is_streaming = False
-        self.current_response = ""
+        
+        # All requests run as tasks on one persistent asyncio thread; the
+        # scheduler caps concurrent generations and queues the rest
+        self.cache = None  # Opened by the "Cache" checkbox; creates response_cache.db
+        self.backend = OllamaBackend()
+        self.scheduler = RequestScheduler(self.backend)
+        self.store = ConversationStore()
+        # Snippets of past conversations are added to prompts when numpy is installed;
+        # no context is reserved for them until the embedding model has answered
+        self.retriever = Retriever(self.store) if retrieval_available() else None
+        # Project folder indexed for relevant code (parsed in worker processes)
+        self.workspace = None
+        self.workspace_executor = None
+        self.workspace_refreshing = False
+        self.sessions = {}  # Chat tab widget name -> Session
+        # Code tabs: repeated blocks reuse their tab, idle tabs over the cap are stashed
+        self.tabs = TabManager()
+        self.telemetry_log = TelemetryLog()
+        # Picks a model size per prompt from measured speeds and the latency target
+        self.router = ModelRouter()
+        self.router.warm.add(self.model)
+        self.loading_dots = 0
+        self.editing_queued = False
         
         self.setup_ui()
         self.setup_bindings()
-        self.accumulated_response = ""  # Add this line to track full response
+        
+        # Preload the model once the window has painted and keep it resident
+        self.warmer = ModelWarmer(
+            self.model,
+            on_status=lambda text: self.root.after(0, self.show_model_status, text),
+            options=self.session.context.options()  # Tuned profile, if any
+        )
+        startup.defer(self.warmer.start)
+        startup.defer(self.load_router_history)
+        startup.defer(self.load_installed_models)
+        if self.retriever:
+            startup.defer(self.retriever.start)
+        
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+    
+    def on_close(self):
+        """Flush queued conversation writes before the window goes away"""
+        if self.workspace_executor:
+            self.workspace_executor.shutdown(wait=False, cancel_futures=True)
+        self.store.close()
+        self.root.destroy()
     
     def setup_ui(self):
         # Configure grid
@@ -142,6 +383,25 @@ class ChatCodeEditor:
         
         # Code Editor Frame with Notebook
         self.code_frame = ttk.Frame(self.paned_window)
+        
+        # File toolbar: large files load progressively and keep their line endings
+        self.file_toolbar = ttk.Frame(self.code_frame)
+        self.open_file_button = ttk.Button(self.file_toolbar, text="Open File", command=self.open_file)
+        self.open_file_button.pack(side=tk.LEFT, padx=5)
+        self.save_file_button = ttk.Button(self.file_toolbar, text="Save", command=self.save_file)
+        self.save_file_button.pack(side=tk.LEFT, padx=5)
+        self.save_as_button = ttk.Button(self.file_toolbar, text="Save As",
+                                         command=lambda: self.save_file(save_as=True))
+        self.save_as_button.pack(side=tk.LEFT, padx=5)
+        self.stash_button = ttk.Menubutton(self.file_toolbar, text="Stashed")
+        self.stash_menu = tk.Menu(self.stash_button, tearoff=False, postcommand=self.update_stash_menu)
+        self.stash_button.config(menu=self.stash_menu)
+        self.stash_button.pack(side=tk.LEFT, padx=5)
+        self.tab_memory_button = ttk.Button(self.file_toolbar, text="Tab Memory",
+                                            command=self.show_tab_memory)
+        self.tab_memory_button.pack(side=tk.LEFT, padx=5)
+        self.file_toolbar.pack(fill=tk.X, pady=(5, 0))
+        
         self.notebook = ttk.Notebook(self.code_frame)
         self.notebook.pack(expand=True, fill='both')
         
@@ -150,16 +410,11 @@ class ChatCodeEditor:
         
         self.paned_window.add(self.code_frame, weight=1)
         
-        # Chat Frame
+        # Chat Frame: one notebook tab per conversation
         self.chat_frame = ttk.Frame(self.paned_window)
-        self.chat_window = scrolledtext.ScrolledText(
-            self.chat_frame,
-            wrap=tk.WORD,
-            font=('Segoe UI', 10),
-            background='#0D1117',
-            foreground='#C9D1D9'
-        )
-        self.chat_window.pack(expand=True, fill='both', padx=5, pady=5)
+        self.chat_notebook = ttk.Notebook(self.chat_frame)
+        self.chat_notebook.pack(expand=True, fill='both', padx=5, pady=5)
+        self.create_session()
         
         # Input Frame
         self.input_frame = ttk.Frame(self.chat_frame)
@@ -177,34 +432,272 @@ class ChatCodeEditor:
         )
         self.cancel_button.pack(side=tk.LEFT, padx=5)
         
+        self.new_chat_button = ttk.Button(self.input_frame, text="New Chat", command=self.create_session)
+        self.new_chat_button.pack(side=tk.LEFT, padx=5)
+        
+        self.workspace_button = ttk.Button(self.input_frame, text="Open Folder", command=self.open_workspace)
+        self.workspace_button.pack(side=tk.LEFT, padx=5)
+        
+        # Cached replies need deterministic sampling, so the cache implies temperature 0
+        self.cache_var = tk.BooleanVar(value=False)
+        self.cache_check = ttk.Checkbutton(
+            self.input_frame,
+            text="Cache",
+            variable=self.cache_var,
+            command=self.toggle_cache
+        )
+        self.cache_check.pack(side=tk.LEFT, padx=5)
+        
+        # DeepSeek-R1 reasoning is usually not worth resending to the model
+        self.keep_thinking_var = tk.BooleanVar(value=KEEP_THINKING)
+        self.keep_thinking_check = ttk.Checkbutton(
+            self.input_frame,
+            text="Keep reasoning",
+            variable=self.keep_thinking_var
+        )
+        self.keep_thinking_check.pack(side=tk.LEFT, padx=5)
+        
+        self.export_button = ttk.Button(self.input_frame, text="Export Stats", command=self.export_telemetry)
+        self.export_button.pack(side=tk.LEFT, padx=5)
+        
+        # Model routing: the configured model by default; "Auto" picks a size
+        # per prompt within the latency target
+        self.model_var = tk.StringVar(value=self.model)
+        self.model_combo = ttk.Combobox(
+            self.input_frame,
+            textvariable=self.model_var,
+            values=self.model_choices(),
+            state="readonly",
+            width=18
+        )
+        self.model_combo.pack(side=tk.LEFT, padx=5)
+        self.model_combo.bind("<<ComboboxSelected>>", self.on_model_selected)
+        self.target_labels = {f"≤{seconds}s" if seconds else "No limit": seconds for seconds in LATENCY_TARGETS}
+        self.target_var = tk.StringVar(value="No limit")
+        self.target_combo = ttk.Combobox(
+            self.input_frame,
+            textvariable=self.target_var,
+            values=list(self.target_labels),
+            state="readonly",
+            width=9
+        )
+        self.target_combo.pack(side=tk.LEFT, padx=5)
+        
+        # Re-ask the last question with the next larger model; both answers stay
+        self.escalate_button = ttk.Button(self.input_frame, text="Escalate", command=self.escalate,
+                                          state=tk.DISABLED)
+        self.escalate_button.pack(side=tk.LEFT, padx=5)
+        
         self.input_frame.pack(fill=tk.X, padx=5, pady=5)
         
+        # Outgoing queue: messages sent while a reply streams go out when it finishes
+        self.queue_frame = ttk.Frame(self.chat_frame)
+        self.queue_list = tk.Listbox(
+            self.queue_frame,
+            height=4,
+            background='#0D1117',
+            foreground='#C9D1D9',
+            selectbackground='#1F6FEB',
+            activestyle='none'
+        )
+        self.queue_list.pack(side=tk.LEFT, expand=True, fill=tk.X, padx=5)
+        self.queue_list.bind("<Double-Button-1>", lambda event: self.edit_queued())
+        self.queue_list.bind("<Delete>", lambda event: self.remove_queued())
+        queue_buttons = ttk.Frame(self.queue_frame)
+        for text, command in (("▲", lambda: self.move_queued(-1)), ("▼", lambda: self.move_queued(1)),
+                              ("Edit", self.edit_queued), ("Remove", self.remove_queued)):
+            ttk.Button(queue_buttons, text=text, width=7, command=command).pack(fill=tk.X)
+        queue_buttons.pack(side=tk.LEFT)
+        
+        # Several queued messages can share one request (one prompt evaluation)
+        self.merge_var = tk.BooleanVar(value=False)
+        self.merge_check = ttk.Checkbutton(self.input_frame, text="Merge queued", variable=self.merge_var)
+        self.merge_check.pack(side=tk.LEFT, padx=5)
+        
         # Status Label
         self.status_label = ttk.Label(self.chat_frame, text="", foreground="gray")
         self.status_label.pack(pady=5)
         
+        self.cache_label = ttk.Label(self.chat_frame, text="", foreground="gray")
+        self.cache_label.pack()
+        
         self.paned_window.add(self.chat_frame, weight=1)
     
     def setup_bindings(self):
         self.user_entry.bind("<Return>", lambda event: self.send_message())
+        self.chat_notebook.bind("<<NotebookTabChanged>>", self.on_session_changed)
+        self.notebook.bind("<<NotebookTabChanged>>", lambda event: self.tabs.touch(self.notebook.select()))
+        self.root.bind("<Control-o>", lambda event: self.open_file())
+        self.root.bind("<Control-s>", lambda event: self.save_file())
+    
+    def create_session(self):
+        """Create a conversation with its own history and chat view"""
+        session = Session(self.model, retrieval_tokens=self.injected_tokens(), scheduler=self.scheduler)
+        session.store_id = self.store.start_session(session.title, session.model)
+        session.last_model = None  # Model of the last answer, for Escalate
+        frame = ttk.Frame(self.chat_notebook)
+        session.frame = frame
+        session.chat_window = scrolledtext.ScrolledText(
+            frame,
+            wrap=tk.WORD,
+            font=('Segoe UI', 10),
+            background='#0D1117',
+            foreground='#C9D1D9'
+        )
+        session.chat_window.pack(expand=True, fill='both')
+        
+        # Only a bounded window of messages lives in the widget
+        session.transcript = Transcript(session.chat_window, markdown=MARKDOWN_STYLES)
+        
+        # Streamed text is batched and drawn once per frame
+        session.pump = TokenPump(session.transcript)
+        session.pump.start()
+        
+        self.sessions[str(frame)] = session
+        self.chat_notebook.add(frame, text=session.title)
+        self.chat_notebook.select(frame)
+        return session
+    
+    def injected_tokens(self):
+        """Context budget kept free for retrieved snippets and workspace code"""
+        return sum(source.tokens for source in (self.retriever, self.workspace) if source)
+    
+    def open_workspace(self):
+        """Index a project folder; relevant functions and classes are sent with prompts"""
+        path = filedialog.askdirectory()
+        if not path:
+            return
+        from concurrent.futures import ProcessPoolExecutor
+        from gptathome.workspace import WorkspaceIndex
+        
+        if self.workspace_executor is None:
+            self.workspace_executor = ProcessPoolExecutor()
+        self.workspace = WorkspaceIndex(path)
+        self.refresh_workspace()
+    
+    def refresh_workspace(self):
+        """Re-check changed files in the background"""
+        if self.workspace is None or self.workspace_refreshing:
+            return
+        self.workspace_refreshing = True
+        workspace = self.workspace
+        
+        def progress(done, total):
+            self.root.after(0, lambda: self.status_label.config(text=f"Indexing workspace {done}/{total}"))
+        
+        def run():
+            try:
+                workspace.refresh(self.workspace_executor, progress)
+                text = (f"Workspace {os.path.basename(workspace.root)}: "
+                        f"{len(workspace.files)} files, {len(workspace.chunks)} symbols")
+            except Exception as e:
+                text = f"Indexing workspace failed: {e}"
+            self.workspace_refreshing = False
+            self.root.after(0, lambda: self.status_label.config(text=text))
+        
+        threading.Thread(target=run, daemon=True).start()
+    
+    def toggle_cache(self):
+        if self.cache is None and self.cache_var.get():
+            self.cache = self.backend.cache = ResponseCache()
+        if self.cache is not None:
+            self.cache.enabled = self.cache_var.get()
+        self.update_cache_label()
+    
+    def update_cache_label(self):
+        enabled = self.cache is not None and self.cache.enabled
+        self.cache_label.config(text=self.cache.stats_text() if enabled else "")
+    
+    def request_options(self, session, model=None):
+        """Ollama options for the next request of a session"""
+        extra = {'temperature': 0} if self.cache_var.get() else None
+        return session.context.options(extra, model)
+    
+    def load_router_history(self):
+        """Seed the router's speed estimates from stored timings"""
+        self.router.load_history(stats["telemetry"] for stats in self.store.timing_stats()
+                                 if "telemetry" in stats)
+    
+    def load_installed_models(self):
+        """Restrict routing to the models the server has pulled (listed off the UI thread)"""
+        def worker():
+            try:
+                names = installed_models()
+            except Exception as e:
+                print(f"Listing installed models failed: {e}")
+                return
+            self.root.after(0, self.use_installed_models, names)
+        threading.Thread(target=worker, daemon=True).start()
+    
+    def warm_model(self, model):
+        """Move the warm-up heartbeat to the model about to be used"""
+        if model != self.warmer.model:
+            self.router.warm.discard(self.warmer.model)
+            self.router.warm.add(model)
+            self.warmer.switch_model(model, self.session.context.options(model=model))
+    
+    def on_model_selected(self, event=None):
+        if self.model_var.get() != "Auto":
+            self.warm_model(self.model_var.get())
+    
+    def use_installed_models(self, names):
+        self.router.use_installed(names)
+        self.model_combo.config(values=self.model_choices())
+    
+    def model_choices(self):
+        return ["Auto", self.model] + [model for model in self.router.models if model != self.model]
+    
+    def choose_model(self, turn):
+        """(model, note) for a built turn: the fixed choice, or the router's"""
+        choice = self.model_var.get()
+        if choice != "Auto":
+            return choice, None
+        if not self.router.models:
+            return self.model, "no routed model installed"
+        # The whole context counts, including tab code sent in earlier turns
+        decision = self.router.route_turn(turn, self.target_labels.get(self.target_var.get()))
+        return decision.model, decision.reason
+    
+    @property
+    def session(self):
+        """The conversation shown in the selected chat tab"""
+        return self.sessions[self.chat_notebook.select()]
+    
+    def on_session_changed(self, event=None):
+        session = self.session
+        # The conversation being looked at jumps ahead of background ones
+        if session.state == "queued":
+            self.scheduler.reprioritize(session.request, PRIORITY_HIGH)
+        self.refresh_ui_state()
+        self.refresh_queue_view()
+        self.update_status()
+    
+    def update_session_title(self, session):
+        marks = {"queued": " …", "running": " ●"}
+        waiting = f" +{len(session.outbox)}" if session.outbox else ""
+        self.chat_notebook.tab(session.frame, text=session.title + marks.get(session.state, "") + waiting)
     
     def handle_tab(self, event):
-        self.code_editor.insert(tk.INSERT, "    ")
+        event.widget.insert(tk.INSERT, "    ")
         return "break"
 
     def extract_code_blocks(self, text):
+        import re
+        
         # Find all Python code blocks in the text
         code_blocks = re.finditer(r'```(?:python)?\n(.*?)\n```', text, re.DOTALL)
         return [match.group(1).strip() for match in code_blocks]
 
-    def create_new_tab(self, code_content=""):
+    def create_new_tab(self, code_content="", language=None, title=None):
         """Create a new tab with optional initial content"""
-        # Create the main tab content
-        tab = CodeTab(self.notebook)
+        # Create the main tab content; its editor is built when first shown
+        tab = CodeTab(self.notebook, code_content,
+                      {"<Tab>": self.handle_tab, "<<Modified>>": self.on_tab_modified})
+        tab.language = language
         tab_id = str(uuid.uuid4())[:8]
         
         # Add the tab first
-        self.notebook.add(tab, text=f"Code {tab_id}")
+        self.notebook.add(tab, text=title or f"{language or 'Code'} {tab_id}")
         
         # Create and add close button directly to the tab
         close_button = ttk.Button(
@@ -224,131 +717,347 @@ class ChatCodeEditor:
                            relief='flat',
                            background='#0D1117')
         
-        # Add Tab key binding to the code editor in this tab
-        tab.code_editor.bind("<Tab>", self.handle_tab)
-        
-        if code_content:
-            tab.code_editor.insert("1.0", code_content)
-            tab.code_editor.highlight_syntax()
-        
+        self.tabs.add(str(tab), code_content)
         self.notebook.select(tab)
+        self.enforce_tab_cap()
         return tab
 
+    def on_tab_modified(self, event):
+        """An edited tab no longer stands in for the code it was opened with"""
+        if event.widget.edit_modified():
+            self.tabs.edited(str(event.widget.master))
+
     def close_tab(self, tab):
         """Close the specified tab"""
         if self.notebook.index('end') > 1:  # Keep at least one tab
-            self.notebook.forget(tab)
+            self.discard_tab(tab)
         else:
             messagebox.showinfo("Info", "Cannot close the last tab")
 
-    def get_current_code(self):
-        """Get code from the currently selected tab"""
+    def discard_tab(self, tab):
+        """Remove a tab from the notebook and free its widgets"""
+        name = str(tab)
+        self.notebook.forget(tab)
+        self.tabs.remove(name)
+        for session in self.sessions.values():
+            session.code_context.forget(name)
+        tab.destroy()
+
+    def enforce_tab_cap(self):
+        """Stash the least recently used untouched tabs beyond the cap"""
+        selected = self.notebook.select()
+        
+        def can_evict(name):
+            return name != selected and not self.notebook.nametowidget(name).touched
+        
+        for name in self.tabs.eviction_candidates(can_evict):
+            tab = self.notebook.nametowidget(name)
+            code = "" if tab.path else tab.get_text()
+            try:
+                self.tabs.stash_tab(name, code, self.notebook.tab(tab, "text"),
+                                    tab.language, tab.path, tab.newline)
+            except OSError as e:
+                print(f"Stashing tab failed: {e}")
+                return
+            self.discard_tab(tab)
+
+    def restore_stashed(self, key):
+        """Reopen a stashed tab"""
+        entry = self.tabs.stash.take(key)
+        if entry is None:
+            return None
+        if entry["path"] and not entry["code"]:
+            if not os.path.exists(entry["path"]):
+                messagebox.showerror("Stashed", f"{entry['path']} no longer exists")
+                return None
+            tab = self.create_new_tab(title=entry["title"])
+            tab.load_file(entry["path"])
+            return tab
+        tab = self.create_new_tab(entry["code"], entry["language"], entry["title"])
+        tab.path = entry["path"]
+        tab.newline = entry["newline"]
+        return tab
+
+    def update_stash_menu(self):
+        self.stash_menu.delete(0, tk.END)
+        entries = self.tabs.stash.recent()
+        if not entries:
+            self.stash_menu.add_command(label="(empty)", state=tk.DISABLED)
+        for key, entry in entries:
+            stashed = time.strftime("%H:%M", time.localtime(entry["stashed"]))
+            self.stash_menu.add_command(label=f"{entry['title']}  ({stashed})",
+                                        command=lambda k=key: self.restore_stashed(k))
+
+    def show_tab_memory(self):
+        """Per-tab text, tag and estimated memory use"""
+        def measure(name):
+            tab = self.notebook.nametowidget(name)
+            return (self.notebook.tab(tab, "text"),) + tab.memory_stats()
+        
+        messagebox.showinfo("Tab Memory", self.tabs.report(measure))
+
+    def current_tab(self):
+        """The selected CodeTab, or None"""
         current_tab = self.notebook.select()
         if current_tab:
-            tab = self.notebook.children[current_tab.split('.')[-1]]
-            return tab.code_editor.get("1.0", tk.END).strip()
-        return ""
+            return self.notebook.children[current_tab.split('.')[-1]]
+        return None
+    
+    def get_current_code(self):
+        """Get code from the currently selected tab"""
+        tab = self.current_tab()
+        return tab.get_code() if tab else ""
+    
+    def open_file(self):
+        """Open a file in a new tab without blocking the UI while it loads"""
+        path = filedialog.askopenfilename()
+        if not path:
+            return
+        start = time.perf_counter()
+        tab = self.create_new_tab(title=os.path.basename(path))
+        
+        def progress(tab, loaded, total):
+            self.status_label.config(text=f"Loading {os.path.basename(path)}: {loaded * 100 // max(total, 1)}%")
+        
+        def done(tab):
+            lines = tab.code_editor._line_of("end-1c")
+            self.status_label.config(
+                text=f"Opened {os.path.basename(path)} ({lines} lines) in {time.perf_counter() - start:.2f}s")
+        
+        try:
+            tab.load_file(path, progress, done)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Open File", f"Could not open {path}: {e}")
+    
+    def save_file(self, save_as=False):
+        """Save the selected tab to its file (or ask for one)"""
+        tab = self.current_tab()
+        if tab is None or tab.loading:
+            return
+        path = tab.path
+        if save_as or not path:
+            path = filedialog.asksaveasfilename(defaultextension=".py")
+            if not path:
+                return
+        try:
+            tab.save_file(path)
+        except OSError as e:
+            messagebox.showerror("Save", f"Could not save {path}: {e}")
+            return
+        self.notebook.tab(tab, text=os.path.basename(path))
+        self.status_label.config(text=f"Saved {os.path.basename(path)}")
 
+    def code_attachment(self):
+        """(tab key, tab title, code) of the selected tab, or None without code"""
+        tab = self.current_tab()
+        code_content = tab.get_code() if tab else ""
+        if not code_content:
+            return None
+        tab_key = self.notebook.select()
+        return tab_key, self.notebook.tab(tab_key, "text"), code_content
+    
     def send_message(self):
-        if self.is_streaming:
-            return
-            
+        """Send the input, or queue it while the conversation is busy"""
+        session = self.session
         user_input = self.user_entry.get().strip()
-        code_content = self.get_current_code()  # Get code from current tab
-        
         if not user_input:
             return
         
-        self.start_time = time.time()
+        # The code is captured now, as it was when the message was written
+        attachment = self.code_attachment()
+        self.user_entry.delete(0, tk.END)
+        if session.is_streaming or session.outbox:
+            session.outbox.add(user_input, attachment)
+            self.refresh_queue_view()
+            self.update_session_title(session)
+            return
+        self.dispatch(session, user_input, attachment)
+    
+    def dispatch_queued(self, session):
+        """Send the next queued message (all of them when merging) once the session is free"""
+        if session.is_streaming or self.editing_queued:
+            return
+        session.outbox.merge = self.merge_var.get()
+        queued = session.outbox.pop_next()
+        if queued is None:
+            return
+        text, attachment, count = queued
+        self.dispatch(session, text, attachment)
+        self.refresh_queue_view()
+    
+    def dispatch(self, session, user_input, attachment=None):
+        """Start a request for a message and its code attachment"""
+        start_time = time.time()
+        
+        # Workspace code is picked per prompt; edits on disk are picked up for the next one
+        session.context.retrieval_tokens = self.injected_tokens()
+        self.refresh_workspace()
         
-        # Combine user input and code if code exists
+        # Combine user input and code if code exists; after the first turn
+        # only a diff against what the model has already seen is sent
         combined_content = user_input
-        if code_content:
-            combined_content += f"\n\nCurrent code:\n```python\n{code_content}\n```"
+        if attachment:
+            tab_key, name, code_content = attachment
+            # The diff base must be in the window this request is sent with. A
+            # full copy is the longest this message can get, so the window
+            # built with it starts no earlier than the one actually sent.
+            longest = f"{user_input}\n\n{session.code_context.full_text(tab_key, name, code_content)}"
+            window_start = session.context.window_start(
+                session.chat_history + [{'role': 'user', 'content': longest}])
+            code_context = session.code_context.render(
+                tab_key,
+                name,
+                code_content,
+                session.chat_history,
+                window_start
+            )
+            combined_content += f"\n\n{code_context}"
         
         # Add user message and clear input
-        self.chat_history.append({'role': 'user', 'content': combined_content})
-        self.chat_window.insert(tk.END, f"You: {combined_content}\n\n")
-        self.user_entry.delete(0, tk.END)
+        session.chat_history.append({'role': 'user', 'content': combined_content})
+        session.pump.call(lambda: session.transcript.add_message(
+            'user', f"You: {combined_content}\n\n", collapse_code=True))
+        session.pump.flush()
+        session.pump.reset_stats()
         
-        # Update UI state
-        self.toggle_ui_state(False)
+        # Queue the request; it starts as soon as a generation slot is free
+        self.stream_model_response(session, start_time)
+        self.refresh_ui_state()
         self.start_loading_animation()
-        self.is_streaming = True
-        self.current_response = ""
+    
+    def stream_model_response(self, session, start_time=None, model=None, note=None, replace=False):
+        """
+        Build and queue a request; without a model one is chosen for the built
+        context. With replace, the request answers the last question again and
+        its answer replaces the last one only once it completes.
+        """
+        session.replace_last = replace
+        history = session.chat_history[:-1] if replace else session.chat_history
+        session.turn = ChatTurn(model or session.model, session.context, history,
+                                session.title, start_time, self.retriever,
+                                self.workspace if self.workspace and self.workspace.ready else None,
+                                keep_thinking=self.keep_thinking_var.get())
+        if model is None:
+            model, note = self.choose_model(session.turn)
+            session.turn.retarget(model)
+        self.warm_model(model)
+        session.fence_parser = FenceParser()
         
-        # Start response thread
-        threading.Thread(target=self.stream_model_response, args=(combined_content,)).start()
+        header = "Assistant: "
+        if model != session.model or note:
+            header = f"Assistant ({model}, {note}): " if note else f"Assistant ({model}): "
+        session.pump.call(lambda: session.transcript.add_message('assistant', header))
+        priority = PRIORITY_HIGH if session is self.session else PRIORITY_NORMAL
+        session.request = self.scheduler.submit(
+            priority=priority,
+            model=model,
+            messages=session.turn.messages,
+            options=self.request_options(session, model),
+            keep_alive=self.warmer.keep_alive,
+            prepare=session.turn.prepare,
+            on_start=lambda request: self.on_stream_start(session),
+            on_chunk=lambda chunk: self.on_stream_chunk(session, chunk),
+            on_done=lambda request: self.on_stream_done(session, request)
+        )
+        self.update_session_title(session)
+    
+    def on_stream_start(self, session):
+        """A queued request got a generation slot (runs off the UI thread)"""
+        self.warmer.touch()
+        session.turn.telemetry.mark_started()
+        session.pump.call(lambda: self.update_session_title(session))
+    
+    def on_stream_chunk(self, session, chunk):
+        """Handle one streamed chunk (runs on the backend thread)"""
+        # Reasoning goes to a collapsed region; only the answer is parsed for code
+        self.handle_segments(session, session.turn.feed(chunk))
     
-    def stream_model_response(self, combined_content):
-        self.accumulated_response = ""  # Reset accumulated response
+    def handle_segments(self, session, segments):
+        """Route think/answer segments to the transcript and the fence parser"""
+        for kind, text in segments:
+            if kind == "think":
+                session.pump.put(text, THINK_TAG)
+                continue
+            session.pump.put(text)
+            # Open a tab as soon as a code block's closing fence arrives
+            for block in session.fence_parser.feed(text):
+                session.pump.call(lambda b=block: self.open_code_block(session, b))
+    
+    def on_stream_done(self, session, request):
+        """Finish a response after success, error or cancel (runs off the UI thread)"""
+        if request.error:
+            session.pump.put(f"Error: {request.error}\n")
         
-        try:
-            stream = ollama.chat(
-                model=self.model,
-                messages=self.chat_history,
-                stream=True
-            )
-            
-            self.chat_window.insert(tk.END, "Assistant: ")
-            for chunk in stream:
-                if not self.is_streaming:
-                    break
-                chunk_content = chunk['message']['content']
-                self.accumulated_response += chunk_content
-                
-                # Only update chat window during streaming
-                self.chat_window.after(0, lambda c=chunk_content: self.update_chat_window(c))
-            
-        except Exception as e:
-            self.chat_window.after(0, lambda: self.chat_window.insert(tk.END, f"Error: {e}\n"))
+        turn = session.turn
+        parser = turn.think_parser
+        self.handle_segments(session, turn.finish(request))
+        telemetry = self.telemetry_log.add(turn.telemetry)
         
-        finally:
-            if self.is_streaming:
-                elapsed_time = time.time() - self.start_time
-                self.chat_history.append({'role': 'assistant', 'content': self.accumulated_response})
-                self.chat_window.after(0, lambda: self.chat_window.insert(tk.END, f"\nElapsed time: {elapsed_time:.2f}s\n\n"))
-                
-                # Create tabs for code blocks after streaming is complete
-                def create_code_tabs():
-                    code_blocks = self.extract_code_from_response(self.accumulated_response)
-                    seen_blocks = set()  # Track unique code blocks
-                    for code_block in code_blocks:
-                        # Only create tab for unique code blocks
-                        if code_block not in seen_blocks:
-                            seen_blocks.add(code_block)
-                            self.create_new_tab(code_block)
-                
-                # Schedule tab creation after streaming
-                self.chat_window.after(100, create_code_tabs)
-            
-            self.is_streaming = False
-            self.chat_window.after(0, self.stop_loading_animation)
-            self.chat_window.after(0, lambda: self.toggle_ui_state(True))
+        # Hand over a block whose closing fence was the last line (also on Cancel)
+        for block in session.fence_parser.finish():
+            session.pump.call(lambda b=block: self.open_code_block(session, b))
+        
+        elapsed_time = turn.elapsed
+        if request.cancelled:
+            session.pump.put(f"\n[Stream cancelled] Elapsed time: {elapsed_time:.2f}s\n\n")
+        else:
+            # Reasoning is dropped from history unless "Keep reasoning" is on
+            entry = turn.history_entry()
+            if not session.replace_last:
+                session.chat_history.append(entry)
+            elif not request.error:
+                session.chat_history[-1] = entry
+            if not request.error:
+                self.router.record(telemetry)
+                session.last_model = turn.model
+            turn.log(self.store, session.store_id, telemetry)
+            if self.retriever:
+                self.retriever.sync()
+            cached = " | cache hit" if request.cache_hit else ""
+            thinking = ""
+            if parser.think_tokens:
+                thinking = f" | Thinking: {parser.think_tokens} tokens, answer: {parser.answer_tokens} tokens"
+            session.pump.put(f"\nElapsed time: {elapsed_time:.2f}s | Context: {turn.context_stats.sent_tokens} tokens "
+                             f"({turn.context_stats.saved_tokens} saved){thinking}{cached}\n"
+                             f"{turn.telemetry.summary_text()}\n\n")
+        
+        session.pump.call(lambda: self.update_session_title(session))
+        session.pump.call(self.refresh_ui_state)
+        session.pump.call(self.update_status)
+        session.pump.call(self.update_cache_label)
+        # Follow-ups typed meanwhile go out now (also after Cancel)
+        session.pump.call(lambda: self.dispatch_queued(session))
 
-    def extract_code_from_response(self, text):
-        """Extract all Python code blocks from the response."""
-        # Look for code blocks with or without the python identifier
-        patterns = [
-            r'```python\n(.*?)\n```',  # Matches ```python\n code \n```
-            r'```\n(.*?)\n```',        # Matches ```\n code \n```
-            r'```(.*?)```'             # Matches ``` code ```
-        ]
-        
-        code_blocks = []
-        for pattern in patterns:
-            matches = re.finditer(pattern, text, re.DOTALL)
-            for match in matches:
-                code = match.group(1).strip()
-                if code:  # Only add non-empty code blocks
-                    code_blocks.append(code)
-        
-        return code_blocks
+    def open_code_block(self, session, block):
+        """Open a tab for a completed code block, or show the tab that already has it"""
+        name, stash_key = self.tabs.find(block.code)
+        if name is not None:
+            self.notebook.select(name)
+        elif stash_key is not None:
+            self.restore_stashed(stash_key)
+        else:
+            self.create_new_tab(block.code, block.language)
+    
+    def escalate(self):
+        """Ask the last question again with the next larger model"""
+        session = self.session
+        model = session.last_model
+        larger = self.router.larger(model) if model else None
+        if session.is_streaming or larger is None:
+            return
+        if not session.chat_history or session.chat_history[-1]['role'] != 'assistant':
+            return
+        # The smaller model's answer stays in the view and the store, but the
+        # conversation continues from the larger model's answer (once it is complete;
+        # after Cancel or an error the smaller model's answer is kept)
+        session.pump.reset_stats()
+        self.stream_model_response(session, time.time(), larger, f"escalated from {model}", replace=True)
+        self.refresh_ui_state()
+        self.start_loading_animation()
     
     def update_chat_window(self, chunk_content):
-        self.chat_window.insert(tk.END, chunk_content)
-        self.chat_window.see(tk.END)
-        self.chat_window.update_idletasks()
+        """Queue a chunk for the selected conversation's view"""
+        self.session.pump.put(chunk_content)
 
     def update_code_editor(self, new_code):
         """Update the code editor with new code and highlight syntax"""
@@ -356,51 +1065,133 @@ class ChatCodeEditor:
         pass
 
     def cancel_stream(self):
-        """Cancel the current stream and process any code blocks received so far"""
-        self.is_streaming = False
-        
-        # Process any code blocks that were received before canceling
-        if self.accumulated_response:
-            def create_code_tabs():
-                code_blocks = self.extract_code_from_response(self.accumulated_response)
-                seen_blocks = set()  # Track unique code blocks
-                for code_block in code_blocks:
-                    # Only create tab for unique code blocks
-                    if code_block not in seen_blocks:
-                        seen_blocks.add(code_block)
-                        self.create_new_tab(code_block)
-            
-            # Schedule tab creation after a short delay
-            self.chat_window.after(100, create_code_tabs)
-        
-        # Add a newline and elapsed time to the chat window
-        elapsed_time = time.time() - self.start_time
-        self.chat_window.insert(tk.END, f"\n[Stream cancelled] Elapsed time: {elapsed_time:.2f}s\n\n")
-        self.chat_window.see(tk.END)
+        """Cancel the selected conversation's request (queued or running)"""
+        request = self.session.request
+        if request is not None:
+            request.cancel()
+    
+    def export_telemetry(self):
+        """Save this run's per-request timings as CSV or JSON"""
+        path = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("JSON", "*.json")]
+        )
+        if path:
+            count = self.telemetry_log.export(path)
+            self.status_label.config(text=f"Exported {count} requests to {os.path.basename(path)}")
+    
+    def refresh_ui_state(self):
+        """Send (or Queue) and Cancel for the selected conversation"""
+        streaming = self.session.is_streaming
+        self.toggle_ui_state(not streaming)
     
     def toggle_ui_state(self, enabled):
-        state = tk.NORMAL if enabled else tk.DISABLED
-        self.user_entry.config(state=state)
-        self.send_button.config(state=state)
+        # Input stays enabled while a reply streams; Send then queues
+        self.send_button.config(text="Send" if enabled else "Queue")
         self.cancel_button.config(state=tk.NORMAL if not enabled else tk.DISABLED)
+        model = self.session.last_model
+        can_escalate = enabled and model is not None and self.router.larger(model) is not None
+        self.escalate_button.config(state=tk.NORMAL if can_escalate else tk.DISABLED)
+    
+    def refresh_queue_view(self):
+        """Show the selected conversation's queued messages (hidden when empty)"""
+        outbox = self.session.outbox
+        selection = self.queue_list.curselection()
+        self.queue_list.delete(0, tk.END)
+        for index, item in enumerate(outbox, 1):
+            self.queue_list.insert(tk.END, f"{index}. {item.preview()}")
+        if outbox:
+            if selection:
+                self.queue_list.selection_set(min(selection[0], len(outbox) - 1))
+            if not self.queue_frame.winfo_ismapped():
+                self.queue_frame.pack(fill=tk.X, padx=5, pady=(0, 5), after=self.input_frame)
+        else:
+            self.queue_frame.pack_forget()
+        self.update_session_title(self.session)
+    
+    def selected_queued(self):
+        selection = self.queue_list.curselection()
+        items = self.session.outbox.items
+        if selection and selection[0] < len(items):
+            return items[selection[0]]
+        return None
+    
+    def move_queued(self, offset):
+        item = self.selected_queued()
+        if item is None:
+            return
+        index = self.session.outbox.move(item.id, offset)
+        self.refresh_queue_view()
+        self.queue_list.selection_clear(0, tk.END)
+        self.queue_list.selection_set(index)
+    
+    def edit_queued(self):
+        item = self.selected_queued()
+        if item is None:
+            return
+        session = self.session
+        # Nothing is dispatched while the dialog is open, so the edit cannot miss
+        self.editing_queued = True
+        try:
+            text = simpledialog.askstring("Edit queued message", "Message:", initialvalue=item.text,
+                                          parent=self.root)
+        finally:
+            self.editing_queued = False
+        if text is not None:
+            session.outbox.edit(item.id, text)
+            self.refresh_queue_view()
+        for waiting in self.sessions.values():
+            self.dispatch_queued(waiting)
+    
+    def remove_queued(self):
+        item = self.selected_queued()
+        if item is not None:
+            self.session.outbox.remove(item.id)
+            self.refresh_queue_view()
     
     def start_loading_animation(self):
-        self.loading_dots = 0
-        self.update_loading_animation()
+        if not self.loading_dots:
+            self.loading_dots = 1
+            self.update_loading_animation()
     
     def update_loading_animation(self):
-        if self.is_streaming:
-            dots = "." * (self.loading_dots % 4)
-            self.status_label.config(text=f"Model is responding{dots}")
+        if any(session.is_streaming for session in self.sessions.values()):
+            self.update_status()
             self.loading_dots += 1
             self.root.after(500, self.update_loading_animation)
+        else:
+            self.loading_dots = 0
+            self.stop_loading_animation()
+    
+    def update_status(self):
+        """Status line for the selected conversation"""
+        session = self.session
+        dots = "." * (self.loading_dots % 4)
+        if session.state == "queued":
+            position = self.scheduler.position(session.request)
+            self.status_label.config(text=f"Queued (#{position}, {self.scheduler.running} running){dots}")
+        elif session.state == "running":
+            live = session.turn.telemetry.live_text()
+            self.status_label.config(text=f"Model is responding{dots} {live}".rstrip())
+        else:
+            self.stop_loading_animation()
     
     def stop_loading_animation(self):
-        self.status_label.config(text="")
+        # After a response, also how the stream rendered (missed frames, backlog)
+        text = self.warmer.describe()
+        if self.session.pump.chunks:
+            text += f" | {self.session.pump.stats_text()}"
+        self.status_label.config(text=text)
+    
+    def show_model_status(self, text):
+        """Show the model load state unless a response is streaming"""
+        if not self.session.is_streaming:
+            self.status_label.config(text=text)
 
 # [Rest of the code remains the same]
 
 if __name__ == "__main__":
     root = tk.Tk()
     app = ChatCodeEditor(root)
+    startup.watch(root, app.on_close)
     root.mainloop()
\ No newline at end of file
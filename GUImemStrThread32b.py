@@ -1,88 +1,274 @@
 import tkinter as tk
-from tkinter import scrolledtext
-import ollama
-import threading
+from tkinter import scrolledtext, simpledialog, ttk
 import time
 import os
+import threading
+from gptathome.startup import StartupTimer
+from gptathome.backend import OllamaBackend
+from gptathome.scheduler import RequestScheduler, PRIORITY_NORMAL
+from gptathome.pump import TokenPump
+from gptathome.transcript import Transcript, THINK_TAG
+from gptathome.markdown import STYLES as MARKDOWN_STYLES
+from gptathome.think import KEEP_THINKING
+from gptathome.chat import ChatTurn
+from gptathome.context import ContextManager
+from gptathome.warmup import ModelWarmer
+from gptathome.store import ConversationStore
+from gptathome.cache import ResponseCache
+from gptathome.outbox import Outbox
+from gptathome.router import ModelRouter, LATENCY_TARGETS, installed_models
+from gptathome.retrieval import Retriever, available as retrieval_available
+
+# Başlangıç süreleri (pencerenin etkileşime hazır olma süresi kaydedilir)
+startup = StartupTimer("GUImemStrThread32b")
 
 # Model ayarı
 desiredModel = 'deepseek-r1:14b'
 
 # Sohbet geçmişini ve thread kontrolü için değişkenler
 chat_history = []
+context = ContextManager(desiredModel)  # İstekleri num_ctx bütçesine sığdırır
 is_streaming = False
 loading_dots = 0
 
-# Mesaj gönderme fonksiyonu (threading ile)
+# "Otomatik" seçiliyken model boyutu her soru için ölçülen hızlara ve süre hedefine göre seçilir
+router = ModelRouter()
+router.warm.add(desiredModel)
+last_model = None  # Son cevabı veren model ("Büyük modelle sor" için)
+
+def load_router_history():
+    router.load_history(stats["telemetry"] for stats in store.timing_stats() if "telemetry" in stats)
+
+# Otomatik seçim yalnız sunucuda kurulu (pull edilmiş) modeller arasında yapılır
+def load_installed_models():
+    def worker():
+        try:
+            names = installed_models()
+        except Exception as e:
+            print(f"Listing installed models failed: {e}")
+            return
+        root.after(0, use_installed_models, names)
+    threading.Thread(target=worker, daemon=True).start()
+
+# Heartbeat, seçilen ya da yönlendirilen modeli takip eder
+def warm_model(model):
+    if model != warmer.model:
+        router.warm.discard(warmer.model)
+        router.warm.add(model)
+        warmer.switch_model(model, context.options(model=model))
+
+def on_model_selected(event=None):
+    if model_var.get() != "Otomatik":
+        warm_model(model_var.get())
+
+def use_installed_models(names):
+    router.use_installed(names)
+    model_combo.config(values=model_choices())
+
+def model_choices():
+    return ["Otomatik"] + [desiredModel] + [m for m in router.models if m != desiredModel]
+
+def choose_model(turn):
+    if model_var.get() != "Otomatik":
+        return model_var.get(), None
+    if not router.models:
+        return desiredModel, "kurulu model bulunamadı"
+    # Yalnız yeni mesaj değil, gönderilecek bağlamın tamamı ve içindeki kod sayılır
+    decision = router.route_turn(turn, target_labels.get(target_var.get()))
+    return decision.model, decision.reason
+
+# Yanıt akarken gönderilen mesajlar sıraya girer, yanıt bitince sırayla gönderilir
+outbox = Outbox()
+editing_queued = False
+
+# Tüm istekler tek bir kalıcı asyncio thread'inde çalışır; önbellek isteğe bağlıdır
+# Önbellek kutusu ilk işaretlenince açılır (response_cache.db o zaman oluşur)
+cache = None
+backend = OllamaBackend()
+# Bağlam özetleri de buradan, sohbet isteklerinin arkasında düşük öncelikle gider
+scheduler = RequestScheduler(backend)
+context.scheduler = scheduler
+current_request = None
+current_telemetry = None
+
+# Konuşmalar SQLite'a arka plan thread'inden yazılır; eski metin kaydı bir kez içe aktarılır
+legacy_log_path = "model_responses.txt"
+store = ConversationStore()
+store_session = store.start_session("DeepSeek r1 Chat", desiredModel)
+
+# Eski konuşmalardan ilgili parçalar isteğe eklenir (numpy gerekir, gömme işi arka planda)
+retriever = Retriever(store) if retrieval_available() else None
+
+def import_legacy_log():
+    threading.Thread(target=store.import_text_log, args=(legacy_log_path, desiredModel), daemon=True).start()
+
+# Mesaj gönderme fonksiyonu (istek backend'in event loop'unda çalışır)
 def send_message():
-    global is_streaming
     user_input = user_entry.get()
     if not user_input.strip():
         return
-    
+    user_entry.delete(0, tk.END)
+
+    # Model meşgulse mesaj sıraya eklenir
+    if is_streaming or outbox:
+        outbox.add(user_input)
+        refresh_queue_view()
+        return
+    dispatch(user_input)
+
+# Sıradaki mesajı (birleştirme açıksa hepsini tek istekte) gönder
+def dispatch_queued():
+    if is_streaming or editing_queued:
+        return
+    outbox.merge = merge_var.get()
+    queued = outbox.pop_next()
+    if queued is None:
+        return
+    dispatch(queued[0])
+    refresh_queue_view()
+
+def dispatch(user_input):
+    global is_streaming
     start_time = time.time()
     
-    # Kullanıcı mesajını ekle ve temizle
+    # Kullanıcı mesajını ekle
     chat_history.append({'role': 'user', 'content': user_input})
-    chat_window.insert(tk.END, f"Sen: {user_input}\n")
-    user_entry.delete(0, tk.END)
+    pump.call(lambda: transcript.add_message('user', f"Sen: {user_input}\n", collapse_code=True))
+    pump.flush()
+    pump.reset_stats()
 
     # UI elemanlarını güncelle
     toggle_ui_state(False)
     start_loading_animation()
     is_streaming = True
 
-    # Model yanıtını arka planda işle
-    threading.Thread(target=stream_model_response, args=(user_input, start_time)).start()
+    # Model yanıtını arka planda işle (model, bağlam kurulunca seçilir)
+    stream_model_response(start_time)
 
-# Model yanıtını akışla al (arka plan thread'inde)
-def stream_model_response(user_input, start_time):
+# Son soruyu bir büyük modele tekrar sor; iki cevap da ekranda ve kayıtta kalır
+def escalate():
     global is_streaming
-    model_response = ""
-    output_file_path = "model_responses.txt"
-    try:
-        stream = ollama.chat(
-            model=desiredModel,
-            messages=chat_history,
-            stream=True
-        )
-
-        for chunk in stream:
-            if not is_streaming:
-                break
-            chunk_content = chunk['message']['content']
-            model_response += chunk_content
-            chat_window.after(0, lambda c=chunk_content: update_chat_window(c))
-
-    except Exception as e:
-        chat_window.after(0, lambda: chat_window.insert(tk.END, f"Hata: {e}\n"))
-    
-    finally:
-        end_time = time.time()
-        elapsed_time = end_time - start_time
-        
-        if is_streaming:
-            chat_history.append({'role': 'assistant', 'content': model_response})
-            chat_window.after(0, lambda: chat_window.insert(tk.END, f"\nGeçen süre: {elapsed_time:.2f}s\n\n"))
-
-             # Write the model response to a file
-            with open(output_file_path, "a", encoding="utf-8") as file:
-                file.write("user input: \n")
-                file.write(user_input + "\n")
-                file.write(model_response + "\n")
-                file.write(f"elapsed time: {elapsed_time:.2f}s\n")
-        
+    larger = router.larger(last_model) if last_model else None
+    if is_streaming or larger is None or not chat_history or chat_history[-1]['role'] != 'assistant':
+        return
+    # Sohbet büyük modelin cevabıyla devam eder; eski cevap ancak yenisi
+    # tamamlanınca değiştirilir (iptal ya da hatada yerinde kalır)
+    pump.reset_stats()
+    toggle_ui_state(False)
+    start_loading_animation()
+    is_streaming = True
+    stream_model_response(time.time(), larger, f"{last_model} yerine", replace=True)
+
+# Model yanıtını akışla al (callback'ler backend thread'inde, UI işleri pump ile)
+def stream_model_response(start_time, model=None, note=None, replace=False):
+    global current_request, current_telemetry
+    # Gömme modeli cevap verene kadar bağlamdan yer ayrılmaz
+    context.retrieval_tokens = retriever.tokens if retriever else 0
+    # replace: son cevap yerine yenisi istenir, bağlam o cevap olmadan kurulur
+    history = chat_history[:-1] if replace else chat_history
+    turn = ChatTurn(model or desiredModel, context, history, store_session, start_time, retriever,
+                    keep_thinking=keep_thinking_var.get())
+    if model is None:
+        model, note = choose_model(turn)
+        turn.retarget(model)
+    warm_model(model)
+    think_parser = turn.think_parser
+    telemetry = current_telemetry = turn.telemetry
+    context_stats = turn.context_stats
+    header = ""
+    if model != desiredModel or note:
+        header = f"[{model}, {note}]\n" if note else f"[{model}]\n"
+    pump.call(lambda: transcript.add_message('assistant', header))
+
+    # <think> bölümleri katlanmış alana, cevap normal metne gider
+    def show_segments(segments):
+        for kind, text in segments:
+            if kind == "think":
+                pump.put(text, THINK_TAG)
+            else:
+                update_chat_window(text)
+
+    def on_chunk(chunk):
+        show_segments(turn.feed(chunk))
+
+    def on_done(request):
+        global is_streaming, last_model
+        if request.error:
+            pump.put(f"Hata: {request.error}\n")
+
+        show_segments(turn.finish(request))
+        elapsed_time = turn.elapsed
+
+        if not request.cancelled:
+            # Düşünme metni, ayar açık değilse geçmişe (ve modele) geri gönderilmez
+            entry = turn.history_entry()
+            if not replace:
+                chat_history.append(entry)
+            elif not request.error:
+                chat_history[-1] = entry
+            think_text = ""
+            if think_parser.think_tokens:
+                think_text = (f" | Düşünme: {think_parser.think_tokens} token, "
+                              f"cevap: {think_parser.answer_tokens} token")
+            cache_text = ""
+            if cache is not None and cache.enabled:
+                source = "önbellekten, " if request.cache_hit else ""
+                cache_text = f" | {source}önbellek: {cache.hits} isabet / {cache.misses} ıska"
+            pump.put(f"\nGeçen süre: {elapsed_time:.2f}s | Bağlam: {context_stats.sent_tokens} token "
+                     f"({context_stats.saved_tokens} token tasarruf){think_text}{cache_text}\n"
+                     f"{telemetry.summary_text()}\n\n")
+
+            # Yanıtı kaydet (yazma işlemi store'un kendi thread'inde yapılır)
+            turn.log(store, store_session)
+            if not request.error:
+                router.record(turn.telemetry.to_dict())
+                last_model = model
+            if retriever:
+                retriever.sync()
+        else:
+            pump.put(f"\n[İptal edildi] Geçen süre: {elapsed_time:.2f}s\n\n")
+
         is_streaming = False
-        chat_window.after(0, stop_loading_animation)
-        chat_window.after(0, lambda: toggle_ui_state(True))
+        pump.call(stop_loading_animation)
+        pump.call(lambda: toggle_ui_state(True))
+        # Bu sırada yazılan mesajlar şimdi gönderilir (iptalden sonra da)
+        pump.call(dispatch_queued)
 
-# İptal butonu fonksiyonu
+    def on_start(request):
+        telemetry.mark_started()
+        warmer.touch()
+
+    current_request = scheduler.submit(
+        PRIORITY_NORMAL,
+        model=model,
+        messages=turn.messages,
+        options=context.options({'temperature': 0} if cache_var.get() else None, model),
+        keep_alive=warmer.keep_alive,
+        prepare=turn.prepare,
+        on_start=on_start,
+        on_chunk=on_chunk,
+        on_done=on_done
+    )
+
+# İptal butonu fonksiyonu: isteği iptal eder, bağlantı kapanınca Ollama da durur
 def cancel_stream():
-    global is_streaming
-    is_streaming = False
+    if current_request is not None:
+        current_request.cancel()
+
+# Model durumu; bir yanıttan sonra ekran akışı istatistikleri de (geciken kare, birikme)
+def idle_status():
+    text = warmer.describe()
+    if pump.chunks:
+        text += f" | {pump.stats_text()}"
+    return text
 
 def stop_loading_animation():
-    loading_label.config(text="")
+    loading_label.config(text=idle_status())
+
+# Model yükleme durumunu göster (yanıt akarken animasyon öncelikli)
+def show_model_status(text):
+    if not is_streaming:
+        loading_label.config(text=text)
 
 # Yükleme animasyonu
 def start_loading_animation():
@@ -94,24 +280,72 @@ def update_loading_dots():
     global loading_dots
     if is_streaming:
         dots = "." * (loading_dots % 4)
-        loading_label.config(text=f"Model yanıt veriyor{dots}")
+        live = current_telemetry.live_text() if current_telemetry else ""
+        loading_label.config(text=f"Model yanıt veriyor{dots} {live}".rstrip())
         loading_dots += 1
         root.after(500, update_loading_dots)
     else:
-        loading_label.config(text="")
+        loading_label.config(text=idle_status())
 
-# UI durumunu değiştir
+# UI durumunu değiştir (giriş hiç kapanmaz; yanıt akarken Gönder sıraya ekler)
 def toggle_ui_state(enabled):
-    state = tk.NORMAL if enabled else tk.DISABLED
-    user_entry.config(state=state)
-    send_button.config(state=state)
+    send_button.config(text="Gönder" if enabled else "Sıraya ekle")
     cancel_button.config(state=tk.NORMAL if not enabled else tk.DISABLED)
+    can_escalate = enabled and last_model is not None and router.larger(last_model) is not None
+    escalate_button.config(state=tk.NORMAL if can_escalate else tk.DISABLED)
+
+# Sıradaki mesajları göster (sıra boşken gizli)
+def refresh_queue_view():
+    selection = queue_list.curselection()
+    queue_list.delete(0, tk.END)
+    for index, item in enumerate(outbox, 1):
+        queue_list.insert(tk.END, f"{index}. {item.preview()}")
+    if outbox:
+        if selection:
+            queue_list.selection_set(min(selection[0], len(outbox) - 1))
+        queue_frame.grid()
+    else:
+        queue_frame.grid_remove()
+
+def selected_queued():
+    selection = queue_list.curselection()
+    if selection and selection[0] < len(outbox):
+        return outbox.items[selection[0]]
+    return None
 
-# GUI'yi ana thread'de güncelle
+def move_queued(offset):
+    item = selected_queued()
+    if item is not None:
+        index = outbox.move(item.id, offset)
+        refresh_queue_view()
+        queue_list.selection_clear(0, tk.END)
+        queue_list.selection_set(index)
+
+def edit_queued():
+    global editing_queued
+    item = selected_queued()
+    if item is None:
+        return
+    # Pencere açıkken hiçbir şey gönderilmez, düzenleme kaybolmaz
+    editing_queued = True
+    try:
+        text = simpledialog.askstring("Mesajı düzenle", "Mesaj:", initialvalue=item.text, parent=root)
+    finally:
+        editing_queued = False
+    if text is not None:
+        outbox.edit(item.id, text)
+        refresh_queue_view()
+    dispatch_queued()
+
+def remove_queued():
+    item = selected_queued()
+    if item is not None:
+        outbox.remove(item.id)
+        refresh_queue_view()
+
+# Parçayı kuyruğa at; pump her karede bekleyen metni tek seferde ekler
 def update_chat_window(chunk_content):
-    chat_window.insert(tk.END, chunk_content)
-    chat_window.yview(tk.END)
-    chat_window.update_idletasks()
+    pump.put(chunk_content)
 
 # Ana pencereyi oluştur
 root = tk.Tk()
@@ -122,13 +356,23 @@ root.grid_rowconfigure(0, weight=1)  # Chat window row
 root.grid_columnconfigure(0, weight=1)  # First column (for user_entry)
 root.grid_columnconfigure(1, weight=0)  # Send button column
 root.grid_columnconfigure(2, weight=0)  # Cancel button column
+root.grid_columnconfigure(3, weight=0)  # Cache checkbox column
+root.grid_columnconfigure(4, weight=0)  # Keep-thinking checkbox column
 
 # Modify the chat window grid
 
 
 # Sohbet penceresi
 chat_window = scrolledtext.ScrolledText(root, wrap=tk.WORD)
-chat_window.grid(row=0, column=0, columnspan=3, padx=10, pady=10, sticky='nsew')
+chat_window.grid(row=0, column=0, columnspan=5, padx=10, pady=10, sticky='nsew')
+
+# Mesaj modeli: pencerede sınırlı sayıda mesaj tutulur, eskiler kaydırınca geri gelir
+# Model cevapları akarken satır satır Markdown olarak biçimlenir
+transcript = Transcript(chat_window, markdown=MARKDOWN_STYLES)
+
+# Akış parçalarını sabit kare hızında ekrana basan kuyruk
+pump = TokenPump(transcript)
+pump.start()
 
 # Kullanıcı girişi
 user_entry = tk.Entry(root)
@@ -142,12 +386,89 @@ send_button.grid(row=1, column=1, padx=5, pady=10)
 cancel_button = tk.Button(root, text="İptal", command=cancel_stream, state=tk.DISABLED)
 cancel_button.grid(row=1, column=2, padx=5, pady=10)
 
+# Önbellek (açıkken temperature 0 kullanılır, aynı soru tekrar üretilmez)
+def toggle_cache():
+    global cache
+    if cache is None and cache_var.get():
+        cache = backend.cache = ResponseCache()
+    if cache is not None:
+        cache.enabled = cache_var.get()
+
+cache_var = tk.BooleanVar(value=False)
+cache_check = tk.Checkbutton(root, text="Önbellek", variable=cache_var, command=toggle_cache)
+cache_check.grid(row=1, column=3, padx=5, pady=10)
+
+# Düşünme (<think>) metnini sohbet geçmişinde tut
+keep_thinking_var = tk.BooleanVar(value=KEEP_THINKING)
+keep_thinking_check = tk.Checkbutton(root, text="Düşünceyi sakla", variable=keep_thinking_var)
+keep_thinking_check.grid(row=1, column=4, padx=5, pady=10)
+
 # Yükleme indikatörü
 loading_label = tk.Label(root, text="", fg="gray")
-loading_label.grid(row=2, column=0, columnspan=3, pady=5)
+loading_label.grid(row=2, column=0, columnspan=5, pady=5)
+
+# Model seçimi: ayarlı model varsayılan; "Otomatik" süre hedefine göre boyut seçer
+model_frame = tk.Frame(root)
+model_frame.grid(row=4, column=0, columnspan=5, padx=10, pady=(0, 10), sticky='w')
+tk.Label(model_frame, text="Model:").pack(side=tk.LEFT)
+model_var = tk.StringVar(value=desiredModel)
+model_combo = ttk.Combobox(model_frame, textvariable=model_var, values=model_choices(),
+                           state="readonly", width=18)
+model_combo.pack(side=tk.LEFT, padx=5)
+model_combo.bind("<<ComboboxSelected>>", on_model_selected)
+tk.Label(model_frame, text="Süre hedefi:").pack(side=tk.LEFT)
+target_labels = {f"≤{seconds}s" if seconds else "Sınırsız": seconds for seconds in LATENCY_TARGETS}
+target_var = tk.StringVar(value="Sınırsız")
+ttk.Combobox(model_frame, textvariable=target_var, values=list(target_labels),
+             state="readonly", width=9).pack(side=tk.LEFT, padx=5)
+escalate_button = tk.Button(model_frame, text="Büyük modelle sor", command=escalate, state=tk.DISABLED)
+escalate_button.pack(side=tk.LEFT, padx=5)
+
+# Mesaj sırası: sırala, düzenle, sil; birleştirme açıksa hepsi tek istekte gider
+queue_frame = tk.Frame(root)
+queue_frame.grid(row=3, column=0, columnspan=5, padx=10, pady=(0, 10), sticky='ew')
+queue_frame.grid_columnconfigure(0, weight=1)
+queue_list = tk.Listbox(queue_frame, height=4)
+queue_list.grid(row=0, column=0, rowspan=2, sticky='ew')
+queue_list.bind("<Double-Button-1>", lambda event: edit_queued())
+queue_list.bind("<Delete>", lambda event: remove_queued())
+tk.Button(queue_frame, text="▲", width=3, command=lambda: move_queued(-1)).grid(row=0, column=1, padx=2)
+tk.Button(queue_frame, text="▼", width=3, command=lambda: move_queued(1)).grid(row=1, column=1, padx=2)
+tk.Button(queue_frame, text="Düzenle", command=edit_queued).grid(row=0, column=2, padx=2, sticky='ew')
+tk.Button(queue_frame, text="Sil", command=remove_queued).grid(row=1, column=2, padx=2, sticky='ew')
+merge_var = tk.BooleanVar(value=False)
+tk.Checkbutton(queue_frame, text="Birleştir", variable=merge_var).grid(row=0, column=3, rowspan=2, padx=5)
+queue_frame.grid_remove()
 
 # Enter tuşu ile mesaj gönderme
 user_entry.bind("<Return>", lambda event: send_message())
 
+# Modeli önceden yükle ve heartbeat ile açık tut (pencere çizildikten sonra başlar)
+warmer = ModelWarmer(
+    desiredModel,
+    on_status=lambda text: root.after(0, show_model_status, text),
+    options=context.options(),  # Ayarlanmış profil varsa (python -m gptathome.tuning) onunla
+    status_text={
+        "idle": "",
+        "loading": "Model yükleniyor: {model}...",
+        "ready": "Model hazır: {model}",
+        "error": "Model yüklenemedi ({model}): {error}",
+    }
+)
+startup.defer(warmer.start)
+startup.defer(import_legacy_log)
+startup.defer(load_router_history)
+startup.defer(load_installed_models)
+if retriever:
+    startup.defer(retriever.start)
+
+# Pencere kapanırken bekleyen kayıtları diske yaz
+def on_close():
+    store.close()
+    root.destroy()
+
+root.protocol("WM_DELETE_WINDOW", on_close)
+
 # Programı başlat
+startup.watch(root, on_close)
 root.mainloop()
\ No newline at end of file
@@ -0,0 +1 @@
+"""Headless benchmarks for the GPTatHome GUI pipeline."""
@@ -0,0 +1,419 @@
+"""
+Headless benchmarks for the streaming, highlighting and code-block paths.
+
+    python -m bench.run_bench                  # run and compare to bench/baseline.json
+    python -m bench.run_bench --save-baseline  # record a new baseline
+    python -m bench.run_bench --only lex,fences
+
+Tk benchmarks need a display; without one an Xvfb server is started if it is
+installed (or run the whole thing under `xvfb-run -a`). Streaming benchmarks
+talk to the stub server in bench/stub_server.py, never to a real Ollama.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from gptathome.highlighter import LineHighlighter, HighlightWorker
+from gptathome.fences import FenceParser
+from gptathome.markdown import MarkdownStream, split_lines, STYLES
+from bench.stub_server import StubOllamaServer, StubConfig, sample_tokens
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+CANVAS_PATH = os.path.join(ROOT, "Canvas", "14b_canvas_5.py")
+CHAT_PATH = os.path.join(ROOT, "GUImemStrThread32b.py")
+
+# File sizes (lines) for the highlighter benchmarks
+FILE_SIZES = (1_000, 10_000, 50_000)
+# A metric regresses when it is this much slower than the baseline...
+TOLERANCE = 0.20
+# ...and at least this much slower in absolute terms (filters timer noise)
+MIN_DELTA = {"_ms": 0.5, "_us": 0.1}
+
+PYTHON_BLOCK = '''class Parser{n}(object):
+    """Parse block {n} of the input"""
+    def feed(self, data, limit=4096):
+        # Skip empty chunks early
+        if not data or len(data) > limit:
+            return None
+        total = sum(ord(c) for c in data) + {n}
+        return "done: %d" % total
+'''
+
+
+def python_source(lines):
+    blocks = []
+    count = 0
+    n = 0
+    while count < lines:
+        block = PYTHON_BLOCK.format(n=n)
+        blocks.append(block)
+        count += block.count("\n")
+        n += 1
+    return "".join(blocks).split("\n")[:lines]
+
+
+def timed(func, repeat):
+    """Median wall time of func() in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+# Engine benchmarks (no Tk)
+
+def bench_lex(results, repeat):
+    for size in FILE_SIZES:
+        lines = python_source(size)
+        get_lines = lambda first, last: lines[first - 1:last]
+
+        def full():
+            highlighter = LineHighlighter()
+            highlighter.reset(len(lines))
+            highlighter.relex(get_lines, len(lines))
+        results[f"lex.full.{size}_lines_ms"] = timed(full, repeat)
+
+        highlighter = LineHighlighter()
+        highlighter.reset(len(lines))
+        highlighter.relex(get_lines, len(lines))
+
+        def keystroke():
+            highlighter.mark_dirty(size // 2)
+            highlighter.relex(get_lines, len(lines))
+        results[f"lex.keystroke.{size}_lines_ms"] = timed(keystroke, repeat * 20)
+
+
+def bench_worker(results, repeat):
+    worker = HighlightWorker.shared()
+    for size in FILE_SIZES:
+        lines = python_source(size)
+
+        def full():
+            doc = worker.document()
+            doc.reset(1, lines)
+            while doc.busy:
+                while not doc.results.empty():
+                    result_id = doc.results.get()[0]
+                    doc.acked.add(result_id)
+                time.sleep(0.0005)
+            doc.close()
+        results[f"worker.full.{size}_lines_ms"] = timed(full, repeat)
+
+
+def bench_fences(results, repeat):
+    tokens = sample_tokens(20_000)
+    for chunk_size in (1, 8):
+        chunks = ["".join(tokens[i:i + chunk_size]) for i in range(0, len(tokens), chunk_size)]
+
+        def parse():
+            parser = FenceParser()
+            for chunk in chunks:
+                parser.feed(chunk)
+            parser.finish()
+        total = timed(parse, repeat)
+        results[f"fences.per_chunk.{chunk_size}_tokens_us"] = total * 1000 / len(chunks)
+
+
+def bench_markdown(results, repeat):
+    """Per-chunk Markdown cost must not grow with the length of the message"""
+    for count in (1_000, 20_000):
+        tokens = sample_tokens(count)
+
+        def parse():
+            parser = MarkdownStream()
+            for token in tokens:
+                for piece in split_lines(token):
+                    parser.feed_piece(piece)
+            parser.end_line()
+        total = timed(parse, repeat)
+        results[f"markdown.per_chunk.{count}_tokens_us"] = total * 1000 / len(tokens)
+
+
+# Tk benchmarks
+
+def load_canvas_module():
+    spec = importlib.util.spec_from_file_location("canvas_app", CANVAS_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def wait_highlighted(root, editor, timeout=60):
+    deadline = time.perf_counter() + timeout
+    while editor._doc.busy or editor._poll_timer:
+        root.update()
+        if time.perf_counter() > deadline:
+            raise TimeoutError("highlighting did not finish")
+
+
+def bench_editor(results, repeat):
+    import tkinter as tk
+    canvas = load_canvas_module()
+    root = tk.Tk()
+    root.geometry("1000x700")
+    try:
+        for size in FILE_SIZES:
+            text = "\n".join(python_source(size))
+            insert_ms = []
+            highlight_ms = []
+            for _ in range(repeat):
+                editor = canvas.SyntaxHighlightingText(root)
+                editor.pack(fill=tk.BOTH, expand=True)
+                root.update()
+                start = time.perf_counter()
+                editor.insert("1.0", text)
+                insert_ms.append((time.perf_counter() - start) * 1000)
+                wait_highlighted(root, editor)
+                highlight_ms.append((time.perf_counter() - start) * 1000)
+                editor.destroy()
+            results[f"editor.insert.{size}_lines_ms"] = statistics.median(insert_ms)
+            results[f"editor.highlighted.{size}_lines_ms"] = statistics.median(highlight_ms)
+
+            # Typing in the middle of the file: time until the line is re-tagged
+            editor = canvas.SyntaxHighlightingText(root)
+            editor.pack(fill=tk.BOTH, expand=True)
+            editor.insert("1.0", text)
+            wait_highlighted(root, editor)
+            editor.see(f"{size // 2}.0")
+            samples = []
+            for index in range(repeat * 10):
+                start = time.perf_counter()
+                editor.insert(f"{size // 2}.4", "x" if index % 2 else "# ")
+                wait_highlighted(root, editor)
+                samples.append((time.perf_counter() - start) * 1000)
+            results[f"editor.keystroke_p50.{size}_lines_ms"] = percentile(samples, 0.5)
+            results[f"editor.keystroke_p95.{size}_lines_ms"] = percentile(samples, 0.95)
+            editor.destroy()
+    finally:
+        root.destroy()
+
+
+def bench_open(results, repeat):
+    """Open a multi-megabyte log in a CodeTab: time until fully loaded and first highlight"""
+    import tkinter as tk
+    canvas = load_canvas_module()
+    root = tk.Tk()
+    root.geometry("1000x700")
+    lines = python_source(20_000)
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "big.log")
+        with open(path, "w", encoding="utf-8") as f:
+            while f.tell() < 5_000_000:
+                f.write("\n".join(lines) + "\n")
+        try:
+            loaded_ms = []
+            highlighted_ms = []
+            for _ in range(repeat):
+                tab = canvas.CodeTab(root)
+                tab.pack(fill=tk.BOTH, expand=True)
+                root.update()
+                start = time.perf_counter()
+                tab.load_file(path)
+                while tab.loading:
+                    root.update()
+                loaded_ms.append((time.perf_counter() - start) * 1000)
+                # The visible lines are tagged long before the whole file is lexed
+                editor = tab.code_editor
+                while not editor.tag_ranges("keyword"):
+                    root.update()
+                highlighted_ms.append((time.perf_counter() - start) * 1000)
+                tab.destroy()
+            results["open.5mb_loaded_ms"] = statistics.median(loaded_ms)
+            results["open.5mb_first_highlight_ms"] = statistics.median(highlighted_ms)
+        finally:
+            root.destroy()
+
+
+def bench_stream(results, repeat):
+    import tkinter as tk
+    from gptathome.backend import OllamaBackend
+    from gptathome.pump import TokenPump
+    from gptathome.transcript import Transcript
+
+    class MeasuredPump(TokenPump):
+        """Records how long each chunk waited between arrival and the screen"""
+        def __init__(self, widget):
+            super().__init__(widget)
+            self.arrivals = []
+            self.latencies = []
+
+        def flush(self):
+            arrived = len(self.arrivals)
+            super().flush()
+            self.widget.widget.update_idletasks()
+            now = time.perf_counter()
+            self.latencies.extend(now - t for t in self.arrivals[:arrived])
+            del self.arrivals[:arrived]
+
+    server = StubOllamaServer(StubConfig(rate=0)).start()
+    backend = OllamaBackend(host=server.url)
+    root = tk.Tk()
+    try:
+        for rate, chunk_size in ((50, 1), (200, 1), (1000, 4)):
+            server.config = StubConfig(rate=rate, chunk_size=chunk_size, tokens=rate * 2)
+            chat_window = tk.Text(root)
+            chat_window.pack()
+            pump = MeasuredPump(Transcript(chat_window, markdown=STYLES))
+            pump.start()
+            for _ in range(repeat):
+                pump.call(lambda: pump.widget.add_message('assistant', ""))
+
+                def on_chunk(chunk):
+                    pump.arrivals.append(time.perf_counter())
+                    pump.put(chunk['message']['content'])
+                request = backend.chat(model="stub", messages=[{'role': 'user', 'content': "hi"}],
+                                       on_chunk=on_chunk)
+                while not request.done or pump.arrivals:
+                    root.update()
+                    time.sleep(0.001)
+            pump.stop()
+            chat_window.destroy()
+            label = f"{rate}tps_{chunk_size}chunk"
+            results[f"stream.chunk_to_screen_p50.{label}_ms"] = percentile(pump.latencies, 0.5) * 1000
+            results[f"stream.chunk_to_screen_p95.{label}_ms"] = percentile(pump.latencies, 0.95) * 1000
+            results[f"stream.dropped_frames.{label}"] = pump.dropped_frames
+    finally:
+        root.destroy()
+        backend.close()
+        server.stop()
+
+
+def bench_startup(results, repeat):
+    from gptathome import startup
+
+    server = StubOllamaServer(StubConfig(rate=0)).start()
+    os.environ["OLLAMA_HOST"] = server.url
+    try:
+        for label, app in (("canvas", CANVAS_PATH), ("chat", CHAT_PATH)):
+            tti = []
+            wall = []
+            for _ in range(repeat):
+                # Fresh directory: no existing database or legacy log to open
+                with tempfile.TemporaryDirectory() as cwd:
+                    record, imports, seconds = startup.measure(app, cwd=cwd)
+                if record is None:
+                    raise RuntimeError(f"{label} did not report its startup time")
+                tti.append(record["tti"] * 1000)
+                wall.append(seconds * 1000)
+            results[f"startup.time_to_interactive.{label}_ms"] = statistics.median(tti)
+            results[f"startup.process_wall.{label}_ms"] = statistics.median(wall)
+    finally:
+        server.stop()
+
+
+# name -> (function, needs a display, extra module it needs)
+BENCHMARKS = {
+    "lex": (bench_lex, False, None),
+    "worker": (bench_worker, False, None),
+    "fences": (bench_fences, False, None),
+    "markdown": (bench_markdown, False, None),
+    "editor": (bench_editor, True, None),
+    "open": (bench_open, True, None),
+    "stream": (bench_stream, True, "ollama"),
+    "startup": (bench_startup, True, None),
+}
+
+
+def ensure_display():
+    """Return an Xvfb process if one had to be started, False if no display"""
+    if os.environ.get("DISPLAY"):
+        return None
+    xvfb = shutil.which("Xvfb")
+    if not xvfb:
+        return False
+    display = f":{90 + os.getpid() % 100}"
+    process = subprocess.Popen([xvfb, display, "-screen", "0", "1280x1024x24", "-nolisten", "tcp"],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    time.sleep(0.5)
+    os.environ["DISPLAY"] = display
+    return process
+
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, value in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            print(f"  {name:48} {value:10.3f}   (new)")
+            continue
+        change = (value - base) / base if base else 0.0
+        min_delta = MIN_DELTA.get(name[-3:], 1)  # Counters: at least one more
+        flag = ""
+        if change > tolerance and value - base >= min_delta:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"  {name:48} {value:10.3f}   baseline {base:10.3f}  {change:+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GPTatHome benchmarks")
+    parser.add_argument("--only", help="comma separated subset of: " + ", ".join(BENCHMARKS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    xvfb = None
+    if any(BENCHMARKS[name][1] for name in names):
+        xvfb = ensure_display()
+
+    results = {}
+    try:
+        for name in names:
+            func, needs_display, module = BENCHMARKS[name]
+            if needs_display and xvfb is False:
+                print(f"Skipping {name}: no display (install Xvfb or use xvfb-run)")
+                continue
+            if module and importlib.util.find_spec(module) is None:
+                print(f"Skipping {name}: {module} is not installed")
+                continue
+            print(f"Running {name}...")
+            func(results, args.repeat)
+    finally:
+        if xvfb:
+            xvfb.terminate()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print("\nResults (lower is better):")
+    regressions = compare(results, baseline, args.tolerance)
+
+    if args.save_baseline:
+        baseline.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"\nBaseline saved to {args.baseline}")
+    elif regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.tolerance:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
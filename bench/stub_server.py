@@ -0,0 +1,158 @@
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# A response with prose, reasoning and a code fence, repeated as needed
+SAMPLE_WORDS = (
+    "<think> Let me work through this step by step and check the edge cases . </think> "
+    "Here is a solution : ``` python \n def solve ( values ) : \n return sorted ( values ) \n ``` "
+    "This runs in O ( n log n ) time and handles empty input . "
+).split(" ")
+
+
+def sample_tokens(count):
+    tokens = []
+    while len(tokens) < count:
+        for word in SAMPLE_WORDS:
+            tokens.append(word if word.endswith("\n") else word + " ")
+            if len(tokens) == count:
+                break
+    return tokens
+
+
+class StubOllamaHandler(BaseHTTPRequestHandler):
+    """Speaks enough of the Ollama HTTP API for the apps and benchmarks"""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _send_json(self, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/api/tags":
+            self._send_json({"models": [{"name": "stub:latest", "model": "stub:latest"}]})
+        elif self.path == "/api/version":
+            self._send_json({"version": "0.0.0-stub"})
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        body = self._json_body()
+        if self.path == "/api/chat":
+            self._stream_chat(body)
+        elif self.path == "/api/generate":
+            self._send_json({"model": body.get("model"), "response": "", "done": True,
+                             "load_duration": 0})
+        elif self.path in ("/api/embed", "/api/embeddings"):
+            texts = body.get("input") or body.get("prompt") or ""
+            texts = texts if isinstance(texts, list) else [texts]
+            vectors = [[(hash(text) >> shift & 0xFF) / 255 for shift in range(0, 64, 2)] for text in texts]
+            self._send_json({"model": body.get("model"), "embeddings": vectors})
+        else:
+            self.send_error(404)
+
+    def _stream_chat(self, body):
+        config = self.server.config
+        model = body.get("model", "stub")
+        prompt_chars = sum(len(m.get("content", "")) for m in body.get("messages", []))
+        tokens = sample_tokens(config.tokens)
+        started = time.perf_counter()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def write(payload):
+            data = (json.dumps(payload) + "\n").encode()
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+
+        if config.prompt_delay:
+            time.sleep(config.prompt_delay)
+        interval = config.chunk_size / config.rate if config.rate else 0
+        next_send = time.perf_counter()
+        try:
+            for index in range(0, len(tokens), config.chunk_size):
+                content = "".join(tokens[index:index + config.chunk_size])
+                write({"model": model, "created_at": "", "done": False,
+                       "message": {"role": "assistant", "content": content}})
+                if interval:
+                    next_send += interval
+                    time.sleep(max(0, next_send - time.perf_counter()))
+            decode = time.perf_counter() - started - config.prompt_delay
+            write({"model": model, "created_at": "", "done": True, "done_reason": "stop",
+                   "message": {"role": "assistant", "content": ""},
+                   "total_duration": int((time.perf_counter() - started) * 1e9),
+                   "load_duration": 0,
+                   "prompt_eval_count": prompt_chars // 4,
+                   "prompt_eval_duration": int(config.prompt_delay * 1e9),
+                   "eval_count": len(tokens),
+                   "eval_duration": int(decode * 1e9)})
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # Client cancelled: stop "generating" like Ollama does
+            self.server.cancelled += 1
+
+
+class StubConfig:
+    def __init__(self, rate=200.0, chunk_size=1, tokens=400, prompt_delay=0.0):
+        self.rate = rate                  # Tokens per second (0 = as fast as possible)
+        self.chunk_size = chunk_size      # Tokens per streamed chunk
+        self.tokens = tokens              # Tokens per response
+        self.prompt_delay = prompt_delay  # Simulated prompt eval time in seconds
+
+
+class StubOllamaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        super().__init__((host, port), StubOllamaHandler)
+        self.config = config or StubConfig()
+        self.cancelled = 0
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub Ollama server for benchmarks")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--rate", type=float, default=200.0, help="tokens per second (0 = unthrottled)")
+    parser.add_argument("--chunk-size", type=int, default=1, help="tokens per chunk")
+    parser.add_argument("--tokens", type=int, default=400, help="tokens per response")
+    parser.add_argument("--prompt-delay", type=float, default=0.0, help="seconds before the first chunk")
+    args = parser.parse_args()
+    server = StubOllamaServer(StubConfig(args.rate, args.chunk_size, args.tokens, args.prompt_delay),
+                              port=args.port)
+    print(f"Stub Ollama listening on {server.url} (set OLLAMA_HOST to use it)")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Shared building blocks for the GPTatHome chat GUIs.
+
+Submodules load on first use, so importing the package stays cheap:
+    from gptathome import ChatTurn
+"""
+import importlib
+
+_EXPORTS = {
+    "OllamaBackend": "backend",
+    "ChatRequest": "backend",
+    "ResponseCache": "cache",
+    "ChatTurn": "chat",
+    "ContextManager": "context",
+    "FenceParser": "fences",
+    "Outbox": "outbox",
+    "TokenPump": "pump",
+    "Retriever": "retrieval",
+    "ModelRouter": "router",
+    "RequestScheduler": "scheduler",
+    "Session": "scheduler",
+    "StartupTimer": "startup",
+    "TabManager": "tabs",
+    "ConversationStore": "store",
+    "RequestTelemetry": "telemetry",
+    "ThinkParser": "think",
+    "Transcript": "transcript",
+    "Autotuner": "tuning",
+    "ModelWarmer": "warmup",
+    "WorkspaceIndex": "workspace",
+}
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
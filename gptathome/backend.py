@@ -0,0 +1,182 @@
+import asyncio
+import threading
+
+from .cache import final_fields
+
+
+class ChatRequest:
+    """
+    Handle for one streaming chat request running on the backend loop.
+
+    on_chunk(chunk) is called for every streamed chunk and on_done(request)
+    exactly once at the end, both on the backend thread. cancel() may be
+    called from any thread; it aborts the request task, which closes the HTTP
+    stream so Ollama stops generating.
+    """
+    def __init__(self, kwargs, on_chunk=None, on_done=None):
+        self.kwargs = kwargs
+        self.on_chunk = on_chunk
+        self.on_done = on_done
+        self.cancelled = False
+        self.error = None
+        self.final_chunk = None
+        self.cache_hit = False
+        self.future = None
+        self.state = "pending"   # pending/queued -> running -> done
+        self.priority = None
+        self.on_start = None
+        self.prepare = None      # Blocking hook run off the loop before sending
+        self.cancel_hook = None  # Set by a scheduler while the request is queued
+        self._task_started = False
+        self._finished = threading.Event()
+        self._finish_lock = threading.Lock()
+
+    @property
+    def done(self):
+        return self.future is not None and self.future.done()
+
+    def cancel(self):
+        self.cancelled = True
+        if self.future is not None:
+            self.future.cancel()
+        elif self.cancel_hook is not None:
+            self.cancel_hook(self)
+
+    def wait(self, timeout=None):
+        """Block until the request has started and finished (for headless callers)"""
+        self._finished.wait(timeout)
+
+    def finish(self):
+        """Run on_done once; called by whoever ends the request"""
+        with self._finish_lock:
+            if self.state == "done":
+                return
+            self.state = "done"
+        if self.on_done:
+            self.on_done(self)
+        self._finished.set()
+
+
+class OllamaBackend:
+    """
+    One persistent asyncio event loop thread talking to Ollama through
+    ollama.AsyncClient. Every request is a task on that loop instead of a new
+    thread per message.
+    """
+    def __init__(self, host=None, cache=None):
+        self.host = host
+        self.cache = cache  # Optional ResponseCache consulted before Ollama
+        self.loop = asyncio.new_event_loop()
+        self._client = None
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="ollama-backend")
+        self._thread.start()
+        self._ready.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self._ready.set)
+        self.loop.run_forever()
+
+    @property
+    def client(self):
+        if self._client is None:
+            from ollama import AsyncClient
+            self._client = AsyncClient(host=self.host)
+        return self._client
+
+    def submit(self, coro):
+        """Run a coroutine on the backend loop; returns a concurrent Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def chat(self, on_chunk=None, on_done=None, prepare=None, **kwargs):
+        """Start a streaming chat request; kwargs go to AsyncClient.chat"""
+        request = ChatRequest(kwargs, on_chunk, on_done)
+        request.prepare = prepare
+        return self.start(request)
+
+    def start(self, request):
+        """Start a request created earlier (e.g. by a scheduler)"""
+        request.state = "running"
+        request.future = self.submit(self._stream_chat(request))
+        request.future.add_done_callback(lambda future: self._future_done(request, future))
+        # cancel() may have run while future was still None
+        if request.cancelled:
+            request.future.cancel()
+        return request
+
+    def _future_done(self, request, future):
+        if future.cancelled():
+            self.loop.call_soon_threadsafe(self._finish_unstarted, request)
+
+    def _finish_unstarted(self, request):
+        # A task cancelled before its first step never runs _stream_chat's finally
+        if not request._task_started:
+            request.cancelled = True
+            request.finish()
+
+    async def _stream_chat(self, request):
+        request._task_started = True
+        try:
+            if request.cancelled:
+                return  # Cancelled between leaving a scheduler's queue and start()
+            key = None
+            if self.cache is not None:
+                # Keyed on the messages as built, so a hit also skips prepare();
+                # SQLite calls block, so they run off the loop
+                kwargs = request.kwargs
+                key, entry = await self.loop.run_in_executor(
+                    None, self.cache.lookup, kwargs.get('model'), list(kwargs.get('messages', [])),
+                    kwargs.get('options'))
+                if entry is not None:
+                    request.cache_hit = True
+                    await self._replay(request, entry)
+                    return
+            if request.prepare is not None:
+                # e.g. retrieval: may call Ollama itself, so keep it off the loop
+                await self.loop.run_in_executor(None, request.prepare, request)
+
+            chunks = []
+            stream = await self.client.chat(stream=True, **request.kwargs)
+            async for chunk in stream:
+                if request.on_chunk:
+                    request.on_chunk(chunk)
+                if key:
+                    chunks.append(chunk['message']['content'])
+                if chunk.get('done'):
+                    request.final_chunk = chunk
+            if key:
+                await self.loop.run_in_executor(None, self.cache.put, key, request.kwargs.get('model'),
+                                                chunks, final_fields(request.final_chunk or {}))
+        except asyncio.CancelledError:
+            # Unwinding the stream generator closes the HTTP connection
+            request.cancelled = True
+            raise
+        except Exception as e:
+            request.error = e
+        finally:
+            request.finish()
+
+    async def _replay(self, request, entry):
+        """Feed a cached response through the normal chunk path"""
+        rate = self.cache.replay_rate
+        chunks = entry['chunks']
+        for index, content in enumerate(chunks):
+            chunk = {'message': {'role': 'assistant', 'content': content}, 'done': False}
+            if index == len(chunks) - 1:
+                chunk.update(entry['final'], done=True, cached=True)
+                request.final_chunk = chunk
+            if request.on_chunk:
+                request.on_chunk(chunk)
+            if rate:
+                await asyncio.sleep(1 / rate)
+
+    def close(self):
+        async def shutdown():
+            if self._client is not None:
+                await self._client._client.aclose()
+        try:
+            self.submit(shutdown()).result(timeout=2)
+        except Exception:
+            pass
+        self.loop.call_soon_threadsafe(self.loop.stop)
@@ -0,0 +1,251 @@
+"""
+Headless batch mode: run a JSONL file of prompts through the chat pipeline.
+
+    python -m gptathome.batch prompts.jsonl -o results.jsonl --concurrency 4
+
+Each input line is one job:
+    {"id": "q1", "prompt": "..."}                       single question
+    {"id": "c1", "turns": ["...", "..."]}               conversation, one turn at a time
+    {"id": "m1", "messages": [{"role": ..., ...}]}      prepared message list
+with optional "model", "system" and "options". Results are appended to the
+output as each turn finishes, so an interrupted run continues where it left
+off when started again with the same output file.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+from .backend import OllamaBackend
+from .cache import ResponseCache
+from .chat import ChatTurn
+from .scheduler import RequestScheduler, Session, MAX_PARALLEL, PRIORITY_HIGH, PRIORITY_NORMAL
+from .store import ConversationStore
+
+DEFAULT_MODEL = 'deepseek-r1:14b'
+
+
+def load_jobs(path):
+    """Parse the input file into job dicts with an id and a list of turns"""
+    jobs = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            item = json.loads(line)
+            if isinstance(item, str):
+                item = {"prompt": item}
+            job = {
+                "id": str(item.get("id", f"line-{number}")),
+                "model": item.get("model"),
+                "options": item.get("options"),
+                "history": [],
+            }
+            if item.get("system"):
+                job["history"].append({'role': 'system', 'content': item["system"]})
+            if "messages" in item:
+                # The last user message is the turn; earlier ones are history
+                messages = list(item["messages"])
+                job["history"].extend(messages[:-1])
+                job["turns"] = [messages[-1]['content']]
+            elif "turns" in item:
+                job["turns"] = list(item["turns"])
+            else:
+                job["turns"] = [item["prompt"]]
+            jobs.append(job)
+    return jobs
+
+
+def load_finished(path):
+    """(job id, turn) pairs already written without an error"""
+    finished = {}
+    if not os.path.exists(path):
+        return finished
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # Partial line from an interrupted run
+            if record.get("status") == "ok":
+                finished[(record["id"], record["turn"])] = record
+    return finished
+
+
+class BatchRunner:
+    """
+    Runs jobs through the same scheduler, context manager, store and
+    telemetry the GUIs use, at most concurrency generations at a time.
+    Turns of one conversation run in order; follow-up turns get priority so
+    started conversations finish before new ones begin.
+    """
+    def __init__(self, output, model=DEFAULT_MODEL, concurrency=MAX_PARALLEL, host=None,
+                 store=None, cache=None, keep_thinking=False):
+        self.output = output
+        self.model = model
+        self.keep_thinking = keep_thinking
+        self.store = store
+        self.backend = OllamaBackend(host=host, cache=cache)
+        self.scheduler = RequestScheduler(self.backend, concurrency)
+        self.requests = set()
+        self.written = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._remaining = 0
+        self._all_done = threading.Event()
+
+    def run(self, jobs, finished=None):
+        finished = finished or {}
+        pending = []
+        for job in jobs:
+            session = Session(job["model"] or self.model, title=f"batch {job['id']}",
+                              scheduler=self.scheduler)
+            session.job = job
+            session.chat_history = list(job["history"])
+            session.store_id = None
+            # Replay turns finished in an earlier run into the history
+            turn = 0
+            while turn < len(job["turns"]) and (job["id"], turn) in finished:
+                session.chat_history.append({'role': 'user', 'content': job["turns"][turn]})
+                session.chat_history.append({'role': 'assistant',
+                                             'content': finished[(job["id"], turn)]["answer"]})
+                turn += 1
+            if turn < len(job["turns"]):
+                pending.append((session, turn))
+
+        self._remaining = len(pending)
+        if not pending:
+            return
+        self._all_done.clear()
+        with open(self.output, "a", encoding="utf-8") as self._out:
+            for session, turn in pending:
+                self._submit(session, turn, PRIORITY_NORMAL)
+            try:
+                while not self._all_done.wait(0.5):
+                    pass
+            except KeyboardInterrupt:
+                # Finished turns are already on disk; the next run resumes
+                for request in list(self.requests):
+                    request.cancel()
+                raise
+
+    def close(self):
+        self.backend.close()
+
+    def _submit(self, session, index, priority):
+        job = session.job
+        prompt = job["turns"][index]
+        session.chat_history.append({'role': 'user', 'content': prompt})
+        turn = ChatTurn(session.model, session.context, session.chat_history, session.id,
+                        keep_thinking=self.keep_thinking)
+        options = session.context.options(job["options"])
+
+        def on_done(request):
+            turn.finish(request)
+            with self._lock:
+                self.requests.discard(request)
+            if request.cancelled:
+                return
+            answer = turn.history_entry()['content']
+            stats = turn.stats()
+            record = {
+                "id": job["id"],
+                "turn": index,
+                "model": session.model,
+                "status": "error" if request.error else "ok",
+                "error": str(request.error) if request.error else None,
+                "prompt": prompt,
+                "answer": answer,
+                "thinking": turn.think_parser.thinking,
+                **stats,
+            }
+            self._write(record)
+            if not request.error and self.store is not None:
+                if session.store_id is None:
+                    session.store_id = self.store.start_session(session.title, session.model)
+                turn.log(self.store, session.store_id, stats["telemetry"])
+
+            if not request.error and index + 1 < len(job["turns"]):
+                session.chat_history.append({'role': 'assistant', 'content': answer})
+                self._submit(session, index + 1, PRIORITY_HIGH)
+                return
+            with self._lock:
+                self._remaining -= 1
+                if self._remaining == 0:
+                    self._all_done.set()
+
+        request = self.scheduler.submit(
+            priority=priority,
+            model=session.model,
+            messages=turn.messages,
+            options=options,
+            on_chunk=turn.feed,
+            on_done=on_done,
+            on_start=lambda request: turn.telemetry.mark_started(),
+        )
+        with self._lock:
+            self.requests.add(request)
+        session.request = request
+
+    def _write(self, record):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._out.write(line + "\n")
+            self._out.flush()
+            self.written += 1
+            if record["status"] != "ok":
+                self.failed += 1
+        status = record["error"] or f"{record['telemetry']['total'] or 0:.2f}s"
+        print(f"[{self.written}] {record['id']}#{record['turn']} {record['status']}: {status}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a JSONL file of prompts through Ollama")
+    parser.add_argument("input", help="JSONL file of prompts or conversations")
+    parser.add_argument("-o", "--output", help="results JSONL (default: INPUT.results.jsonl)")
+    parser.add_argument("-m", "--model", default=DEFAULT_MODEL)
+    parser.add_argument("-c", "--concurrency", type=int, default=MAX_PARALLEL,
+                        help="parallel generations (match OLLAMA_NUM_PARALLEL)")
+    parser.add_argument("--host", help="Ollama host (default: OLLAMA_HOST)")
+    parser.add_argument("--no-store", action="store_true", help="do not log to the conversation store")
+    parser.add_argument("--cache", action="store_true", help="use the response cache (temperature 0)")
+    parser.add_argument("--keep-thinking", action="store_true",
+                        help="send <think> text back as conversation history")
+    parser.add_argument("--restart", action="store_true", help="ignore results already in the output")
+    args = parser.parse_args(argv)
+
+    output = args.output or os.path.splitext(args.input)[0] + ".results.jsonl"
+    if args.restart and os.path.exists(output):
+        os.remove(output)
+    jobs = load_jobs(args.input)
+    finished = load_finished(output)
+    total = sum(len(job["turns"]) for job in jobs)
+    print(f"{len(jobs)} jobs, {total} turns, {len(finished)} already done -> {output}")
+
+    cache = None
+    if args.cache:
+        cache = ResponseCache()
+        for job in jobs:
+            job["options"] = dict(job["options"] or {}, temperature=0)
+    store = None if args.no_store else ConversationStore()
+    runner = BatchRunner(output, args.model, args.concurrency, args.host, store, cache,
+                         args.keep_thinking)
+    start = time.perf_counter()
+    try:
+        runner.run(jobs, finished)
+    except KeyboardInterrupt:
+        print("Interrupted; run again with the same output to resume")
+        return 130
+    finally:
+        runner.close()
+        if store is not None:
+            store.close()
+    print(f"{runner.written} turns in {time.perf_counter() - start:.1f}s, {runner.failed} failed")
+    return 1 if runner.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
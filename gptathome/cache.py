@@ -0,0 +1,140 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+CACHE_PATH = "response_cache.db"
+MAX_BYTES = 200 * 1024 * 1024
+MAX_ENTRIES = 5000
+# Chunks per second when replaying a hit; 0 shows it instantly
+REPLAY_RATE = 0
+
+# Final-chunk fields worth keeping with a cached response
+FINAL_FIELDS = ("done_reason", "total_duration", "load_duration", "prompt_eval_count",
+                "prompt_eval_duration", "eval_count", "eval_duration")
+
+
+def normalize_messages(messages):
+    """Keep role/content only and ignore trailing whitespace and line-ending noise"""
+    normalized = []
+    for message in messages:
+        content = message['content'].replace("\r\n", "\n").strip()
+        content = "\n".join(line.rstrip() for line in content.split("\n"))
+        normalized.append({'role': message['role'], 'content': content})
+    return normalized
+
+
+class ResponseCache:
+    """
+    On-disk LRU cache of complete responses.
+
+    Keys hash the model, the options and the normalized messages. Only
+    deterministic requests (temperature explicitly <= 0) are cached; anything
+    else bypasses the cache. Entries are evicted least-recently-used first
+    once the total size or count goes over its limit.
+    """
+    def __init__(self, path=CACHE_PATH, max_bytes=MAX_BYTES, max_entries=MAX_ENTRIES,
+                 replay_rate=REPLAY_RATE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.replay_rate = replay_rate
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            model TEXT,
+            value TEXT,
+            size INTEGER,
+            created REAL,
+            last_used REAL,
+            hits INTEGER DEFAULT 0
+        )""")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries(last_used)")
+        self.conn.commit()
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def cacheable(self, options):
+        if not self.enabled:
+            return False
+        temperature = (options or {}).get('temperature')
+        return temperature is not None and temperature <= 0
+
+    def key(self, model, messages, options=None):
+        payload = json.dumps({
+            'model': model,
+            'options': options or {},
+            'messages': normalize_messages(messages),
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def lookup(self, model, messages, options=None):
+        """Return (key, entry); key is None when the request bypasses the cache"""
+        if not self.cacheable(options):
+            with self._lock:
+                self.bypassed += 1
+            return None, None
+        key = self.key(model, messages, options)
+        entry = self.get(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return key, entry
+
+    def get(self, key):
+        row = self.conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        with self.conn:
+            self.conn.execute("UPDATE entries SET last_used = ?, hits = hits + 1 WHERE key = ?",
+                              (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key, model, chunks, final=None):
+        """Store a completed response as its list of content chunks"""
+        value = json.dumps({'chunks': chunks, 'final': final or {}}, ensure_ascii=False)
+        now = time.time()
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, 0)",
+                              (key, model, value, len(value), now, now))
+            self._evict()
+
+    def _evict(self):
+        count, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        if count <= self.max_entries and size <= self.max_bytes:
+            return
+        rows = self.conn.execute("SELECT key, size FROM entries ORDER BY last_used").fetchall()
+        doomed = []
+        for key, entry_size in rows:
+            if count <= self.max_entries and size <= self.max_bytes:
+                break
+            doomed.append((key,))
+            count -= 1
+            size -= entry_size
+        self.conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+
+    def clear(self):
+        with self.conn:
+            self.conn.execute("DELETE FROM entries")
+
+    def stats_text(self):
+        return f"cache: {self.hits} hits / {self.misses} misses / {self.bypassed} bypassed"
+
+
+def final_fields(chunk):
+    """Pick the timing/count fields out of a final stream chunk"""
+    return {name: chunk.get(name) for name in FINAL_FIELDS if chunk.get(name) is not None}
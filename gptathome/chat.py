@@ -0,0 +1,101 @@
+import time
+
+from .telemetry import RequestTelemetry
+from .think import ThinkParser, KEEP_THINKING
+
+
+class ChatTurn:
+    """
+    One prompt/response exchange, shared by the GUIs and batch mode.
+
+    Builds the request from the history within the context budget, splits
+    the stream into reasoning and answer, keeps the timings and produces the
+    history entry and store record once the response is done. Views only
+    decide where the returned segments go.
+    """
+    def __init__(self, model, context, history, session=None, start_time=None, retriever=None,
+                 workspace=None, keep_thinking=KEEP_THINKING):
+        self.model = model
+        # Read from the UI when the turn is built; history_entry() runs on the backend thread
+        self.keep_thinking = keep_thinking
+        self.context = context
+        # Extra context sources: context_message(query, budget, counter, model, exclude)
+        self.sources = [source for source in (workspace, retriever) if source is not None]
+        self.retrieved_tokens = 0
+        self.prompt = history[-1]['content'] if history else ""
+        self.messages, self.context_stats = context.build(history)
+        self.think_parser = ThinkParser()
+        self.telemetry = RequestTelemetry(model, session)
+        self.response_parts = []
+        self.start_time = start_time or time.time()
+        self.elapsed = None
+
+    def prepare(self, request):
+        """Add workspace code and retrieved snippets; runs off the UI and backend loop"""
+        remaining = self.context.retrieval_tokens
+        exclude = [m['content'] for m in self.messages]
+        for source in self.sources:
+            budget = min(source.tokens, remaining)
+            try:
+                message = source.context_message(self.prompt, budget, self.context.counter,
+                                                 self.model, exclude=exclude)
+            except Exception as e:
+                print(f"Adding {type(source).__name__} context failed: {e}")
+                continue
+            if message:
+                # request.kwargs['messages'] is this list; context goes right before the prompt
+                self.messages.insert(len(self.messages) - 1, message)
+                cost = self.context.count([message])
+                self.retrieved_tokens += cost
+                remaining -= cost
+
+    def retarget(self, model):
+        """Send this turn to another model (e.g. the router's pick for the built context)"""
+        self.model = model
+        self.telemetry = RequestTelemetry(model, self.telemetry.session)
+
+    @property
+    def response(self):
+        """Raw response text including any <think> section"""
+        return "".join(self.response_parts)
+
+    def feed(self, chunk):
+        """Handle one streamed chunk; returns its ("think" | "answer", text) segments"""
+        self.telemetry.on_chunk(chunk)
+        message = chunk['message']
+        self.response_parts.append(message['content'])
+        segments = self.think_parser.feed(message['content'], message.get('thinking'))
+        if chunk.get('done'):
+            self.context.record_usage(self.messages, chunk.get('prompt_eval_count'))
+        return segments
+
+    def finish(self, request):
+        """Close the turn after success, error or cancel; returns the held-back segments"""
+        final = request.final_chunk or {}
+        segments = self.think_parser.finish(final.get('eval_count'))
+        self.telemetry.finish()
+        self.elapsed = time.time() - self.start_time
+        # A summary of turns that left the window goes out behind this request
+        self.context.start_pending_summary()
+        return segments
+
+    def history_entry(self, keep_thinking=None):
+        """chat_history message for the response (reasoning dropped unless kept)"""
+        if keep_thinking is None:
+            keep_thinking = self.keep_thinking
+        return {'role': 'assistant', 'content': self.think_parser.history_content(keep_thinking)}
+
+    def stats(self, telemetry=None):
+        """Per-exchange stats stored next to the response"""
+        return {
+            'context_tokens': self.context_stats.sent_tokens,
+            'saved_tokens': self.context_stats.saved_tokens,
+            'think_tokens': self.think_parser.think_tokens,
+            'answer_tokens': self.think_parser.answer_tokens,
+            'retrieved_tokens': self.retrieved_tokens,
+            'telemetry': telemetry or self.telemetry.to_dict(),
+        }
+
+    def log(self, store, store_id, telemetry=None):
+        """Queue the exchange for the conversation store"""
+        store.add_exchange(store_id, self.prompt, self.response, self.elapsed, self.stats(telemetry))
@@ -0,0 +1,84 @@
+import difflib
+
+# Send the whole file again when the diff is larger than this share of it
+MAX_DIFF_RATIO = 0.6
+DIFF_CONTEXT_LINES = 3
+
+
+class _TabState:
+    def __init__(self, code, message_index, text):
+        self.code = code
+        self.version = 1
+        self.base_index = message_index     # Message holding the last full copy
+        self.messages = [(message_index, text)]
+
+
+class CodeContextTracker:
+    """
+    Tracks which version of each code tab the model has already seen.
+
+    The first turn that includes a tab sends it in full. Later turns send a
+    unified diff against the previous version (or a note that it is
+    unchanged). When a new full copy is sent, earlier copies and diffs of that
+    tab in chat_history are collapsed to a one-line reference.
+    """
+    def __init__(self, max_diff_ratio=MAX_DIFF_RATIO, context_lines=DIFF_CONTEXT_LINES):
+        self.max_diff_ratio = max_diff_ratio
+        self.context_lines = context_lines
+        self.tabs = {}
+
+    def render(self, tab_key, name, code, history, window_start=0):
+        """
+        Return the code context for the next user message.
+
+        history is the session's chat_history; the message will be appended
+        at len(history). window_start is the first history index the context
+        manager still sends; a diff is only used if its base is inside it.
+        """
+        index = len(history)
+        state = self.tabs.get(tab_key)
+        if state is None or state.base_index < window_start:
+            return self._full(tab_key, name, code, history, index)
+
+        if code == state.code:
+            text = f"Current code ({name}): unchanged since version {state.version}."
+        else:
+            diff = "".join(difflib.unified_diff(
+                state.code.splitlines(keepends=True),
+                code.splitlines(keepends=True),
+                fromfile=f"{name} v{state.version}",
+                tofile=f"{name} v{state.version + 1}",
+                n=self.context_lines,
+            ))
+            if len(diff) > self.max_diff_ratio * len(code):
+                return self._full(tab_key, name, code, history, index)
+            state.version += 1
+            state.code = code
+            text = f"Changes to {name} since the previous version:\n```diff\n{diff.rstrip()}\n```"
+        state.messages.append((index, text))
+        return text
+
+    def full_text(self, tab_key, name, code):
+        """Text of a full copy of the tab, the longest render() can return"""
+        old = self.tabs.get(tab_key)
+        version = old.version + 1 if old else 1
+        return f"Current code ({name} v{version}):\n```python\n{code}\n```"
+
+    def _full(self, tab_key, name, code, history, index):
+        old = self.tabs.get(tab_key)
+        version = old.version + 1 if old else 1
+        text = self.full_text(tab_key, name, code)
+        if old:
+            self._collapse(old, name, history, version)
+        state = self.tabs[tab_key] = _TabState(code, index, text)
+        state.version = version
+        return text
+
+    def _collapse(self, state, name, history, version):
+        reference = f"[Earlier copy of {name}, superseded by v{version} below]"
+        for index, text in state.messages:
+            if index < len(history) and text in history[index]['content']:
+                history[index]['content'] = history[index]['content'].replace(text, reference)
+
+    def forget(self, tab_key):
+        self.tabs.pop(tab_key, None)
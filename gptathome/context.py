@@ -0,0 +1,281 @@
+import math
+import re
+import threading
+
+from .think import strip_think
+from .tuning import load_profile
+from .warmup import KEEP_ALIVE
+
+# Default context window sent to Ollama as options['num_ctx'] (unless tuned)
+NUM_CTX = 8192
+# Tokens kept free for the model's reply
+RESPONSE_RESERVE = 2048
+# Rough per-message overhead of the chat template (role markers etc.)
+MESSAGE_OVERHEAD = 4
+
+_WORD_RE = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+SUMMARY_PROMPT = (
+    "Summarize the following conversation so it can replace the original "
+    "messages as context. Keep facts, decisions, code names and open questions. "
+    "Be concise."
+)
+
+
+class TokenCounter:
+    """
+    Approximate tokenizer.
+
+    Counts words/punctuation and splits long words into ~4 character pieces,
+    then scales by a per-model factor learned from Ollama's prompt_eval_count.
+    """
+    def __init__(self):
+        self.scales = {}
+
+    def raw_count(self, text):
+        count = 0
+        for piece in _WORD_RE.findall(text):
+            count += max(1, math.ceil(len(piece) / 4))
+        return count
+
+    def count(self, text, model=None):
+        return int(self.raw_count(text) * self.scales.get(model, 1.0))
+
+    def count_messages(self, messages, model=None):
+        return sum(self.count(m['content'], model) + MESSAGE_OVERHEAD for m in messages)
+
+    def calibrate(self, model, messages, prompt_eval_count):
+        """Adjust the model's scale using the real token count of a request"""
+        if not prompt_eval_count:
+            return
+        raw = sum(self.raw_count(m['content']) + MESSAGE_OVERHEAD for m in messages)
+        if raw <= 0:
+            return
+        observed = prompt_eval_count / raw
+        # Exponential moving average so one odd request doesn't swing it
+        current = self.scales.get(model)
+        self.scales[model] = observed if current is None else current * 0.7 + observed * 0.3
+
+
+class ContextStats:
+    """Token accounting for one built request"""
+    def __init__(self, total_tokens, sent_tokens, dropped_messages, summarized_messages):
+        self.total_tokens = total_tokens
+        self.sent_tokens = sent_tokens
+        self.dropped_messages = dropped_messages
+        self.summarized_messages = summarized_messages
+
+    @property
+    def saved_tokens(self):
+        return max(0, self.total_tokens - self.sent_tokens)
+
+    def __repr__(self):
+        return (f"ContextStats(sent={self.sent_tokens}, total={self.total_tokens}, "
+                f"saved={self.saved_tokens}, dropped={self.dropped_messages}, "
+                f"summarized={self.summarized_messages})")
+
+
+class ContextManager:
+    """
+    Builds each request from chat_history within a num_ctx token budget.
+
+    The leading system message is pinned, the newest turns are kept in a
+    sliding window, and turns that fall out of the window are folded into a
+    rolling summary. With a scheduler the summary is a low-priority request
+    queued once the request that needed it is done (start_pending_summary),
+    so it never holds Ollama's slot ahead of a chat request; otherwise it
+    runs on a background thread.
+    """
+    def __init__(self, model, num_ctx=None, response_reserve=RESPONSE_RESERVE,
+                 pin_system=True, summarize=True, counter=None, summarizer=None, retrieval_tokens=0,
+                 scheduler=None):
+        self.model = model
+        # Options found by `python -m gptathome.tuning` for this model and machine
+        self.tuned = load_profile(model) or {}
+        self.num_ctx = num_ctx or self.tuned.get('num_ctx', NUM_CTX)
+        self.response_reserve = response_reserve
+        self.retrieval_tokens = retrieval_tokens  # Kept free for retrieved snippets
+        self.pin_system = pin_system
+        self.summarize = summarize
+        self.counter = counter or TokenCounter()
+        self.summarizer = summarizer  # summarizer(model, transcript) -> text; blocking
+        self.scheduler = scheduler    # RequestScheduler used when no summarizer is given
+        self.keep_alive = KEEP_ALIVE  # Same as chat requests, so summaries don't reload the model
+
+        self.summary = ""
+        self.summary_upto = 0  # chat_history[:summary_upto] is covered by the summary
+        self.first_kept = 0    # First chat_history index in the last built window
+        self._summary_thread = None
+        self._summary_request = None
+        self._pending_summary = None
+        self._lock = threading.Lock()
+
+    @property
+    def budget(self):
+        return max(256, self.num_ctx - self.response_reserve - self.retrieval_tokens)
+
+    def options(self, extra=None, model=None):
+        """Ollama options for a request built by this manager (sent to model, if another)"""
+        tuned = self.tuned if model in (None, self.model) else (load_profile(model) or {})
+        options = dict(tuned, num_ctx=self.num_ctx)
+        if extra:
+            options.update(extra)
+        return options
+
+    def count(self, messages):
+        return self.counter.count_messages(messages, self.model)
+
+    def _count(self, message):
+        return self.counter.count(message['content'], self.model) + MESSAGE_OVERHEAD
+
+    def _window(self, history):
+        """(pinned, summary message, window, first kept index, summary_upto) for history"""
+        count = self._count
+        start = 0
+        pinned = []
+        if self.pin_system and history and history[0]['role'] == 'system':
+            pinned.append(history[0])
+            start = 1
+
+        with self._lock:
+            summary, summary_upto = self.summary, self.summary_upto
+
+        budget = self.budget - sum(count(m) for m in pinned)
+        summary_msg = None
+        if summary and summary_upto > start:
+            summary_msg = {'role': 'system',
+                           'content': f"Summary of the earlier conversation:\n{summary}"}
+            budget -= count(summary_msg)
+
+        # Sliding window: newest turns first, always keep the latest message
+        window = []
+        index = len(history)
+        while index > start:
+            message = history[index - 1]
+            cost = count(message)
+            if window and cost > budget:
+                break
+            window.append(message)
+            budget -= cost
+            index -= 1
+        window.reverse()
+        return pinned, summary_msg, window, index, summary_upto
+
+    def window_start(self, history):
+        """First chat_history index build(history) would keep; builds nothing"""
+        return self._window(history)[3]
+
+    def build(self, history):
+        """Return (messages, ContextStats) for the given chat_history"""
+        count = self._count
+        total = sum(count(m) for m in history)
+        pinned, summary_msg, window, first_kept, summary_upto = self._window(history)
+        self.first_kept = first_kept
+        start = len(pinned)
+
+        messages = list(pinned)
+        summarized = 0
+        if summary_msg and first_kept > start:
+            messages.append(summary_msg)
+            summarized = min(summary_upto, first_kept) - start
+        messages.extend(window)
+
+        dropped = first_kept - start - summarized
+        if self.summarize and first_kept > summary_upto:
+            self._start_summary(history, first_kept)
+
+        sent = sum(count(m) for m in messages)
+        return messages, ContextStats(total, sent, dropped, summarized)
+
+    def record_usage(self, messages, prompt_eval_count):
+        """Feed Ollama's real prompt size back into the token counter"""
+        self.counter.calibrate(self.model, messages, prompt_eval_count)
+
+    def reset(self):
+        with self._lock:
+            self.summary = ""
+            self.summary_upto = 0
+
+    def _summary_running(self):
+        if self._summary_thread and self._summary_thread.is_alive():
+            return True
+        return self._summary_request is not None and self._summary_request.state != "done"
+
+    def _start_summary(self, history, upto):
+        if self._summary_running():
+            return
+        with self._lock:
+            previous, start = self.summary, self.summary_upto
+        if self.pin_system and history and history[0]['role'] == 'system':
+            start = max(start, 1)
+        turns = list(history[start:upto])
+        if not turns:
+            return
+        if self.summarizer is None and self.scheduler is not None:
+            self._pending_summary = (previous, turns, upto)
+            return
+        self._summary_thread = threading.Thread(
+            target=self._summarize_worker, args=(previous, turns, upto), daemon=True)
+        self._summary_thread.start()
+
+    def start_pending_summary(self):
+        """Queue the summary the last build asked for; call when its request is done"""
+        from .scheduler import PRIORITY_LOW
+
+        pending, self._pending_summary = self._pending_summary, None
+        if pending is None or self._summary_running():
+            return
+        previous, turns, upto = pending
+        parts = []
+
+        def on_done(request):
+            if request.error or request.cancelled:
+                print(f"Context summary failed: {request.error or 'cancelled'}")
+                return
+            self._set_summary("".join(parts), upto)
+
+        self._summary_request = self.scheduler.submit(
+            PRIORITY_LOW,
+            on_chunk=lambda chunk: parts.append(chunk['message']['content']),
+            on_done=on_done,
+            **self._summary_request_kwargs(self._transcript(previous, turns)),
+        )
+
+    def _transcript(self, previous, turns):
+        transcript = "\n\n".join(f"{m['role']}: {m['content']}" for m in turns)
+        if previous:
+            transcript = f"Earlier summary:\n{previous}\n\n{transcript}"
+        return transcript
+
+    def _set_summary(self, summary, upto):
+        with self._lock:
+            if upto > self.summary_upto:
+                # R1 models think before answering; only the answer is the summary
+                self.summary = strip_think(summary).strip()
+                self.summary_upto = upto
+
+    def _summarize_worker(self, previous, turns, upto):
+        summarizer = self.summarizer or self._ollama_summarize
+        try:
+            summary = summarizer(self.model, self._transcript(previous, turns))
+        except Exception as e:
+            print(f"Context summary failed: {e}")
+            return
+        self._set_summary(summary, upto)
+
+    def _summary_request_kwargs(self, transcript, model=None):
+        return dict(
+            model=model or self.model,
+            messages=[
+                {'role': 'system', 'content': SUMMARY_PROMPT},
+                {'role': 'user', 'content': transcript},
+            ],
+            # Different options would make Ollama reload the model
+            options=self.options(model=model),
+            keep_alive=self.keep_alive,
+        )
+
+    def _ollama_summarize(self, model, transcript):
+        import ollama
+        response = ollama.chat(**self._summary_request_kwargs(transcript, model))
+        return response['message']['content']
@@ -0,0 +1,83 @@
+from collections import namedtuple
+
+CodeBlock = namedtuple("CodeBlock", ["language", "code"])
+
+FENCE = "```"
+
+
+class FenceParser:
+    """
+    Incremental Markdown code-fence parser.
+
+    Feed it streamed chunks; each call returns the code blocks whose closing
+    fence arrived in that chunk. Only the current unfinished line is buffered,
+    so the work per chunk is proportional to the chunk.
+    """
+    def __init__(self):
+        self.blocks = []
+        self._line = ""
+        self._fence = None       # Opening fence while inside a block
+        self._language = ""
+        self._code = []
+
+    @property
+    def in_block(self):
+        return self._fence is not None
+
+    def feed(self, chunk):
+        completed = []
+        text = self._line + chunk
+        start = 0
+        while True:
+            newline = text.find("\n", start)
+            if newline < 0:
+                break
+            self._process_line(text[start:newline], completed)
+            start = newline + 1
+        self._line = text[start:]
+        return completed
+
+    def finish(self):
+        """Process the last buffered line; unterminated blocks are dropped"""
+        completed = []
+        if self._line:
+            self._process_line(self._line, completed)
+            self._line = ""
+        self._fence = None
+        self._code = []
+        return completed
+
+    def pending(self):
+        """Code received so far for an unterminated block, if any"""
+        if self._fence is None:
+            return None
+        return CodeBlock(self._language, "\n".join(self._code + [self._line]).strip("\n"))
+
+    def _process_line(self, line, completed):
+        stripped = line.strip()
+        if self._fence is None:
+            if not stripped.startswith(FENCE):
+                return
+            ticks = len(stripped) - len(stripped.lstrip("`"))
+            fence = "`" * ticks
+            rest = stripped[ticks:]
+            # Single-line block: ```code```
+            if rest.endswith(fence) and len(rest) > ticks:
+                self._emit("", rest[:-ticks], completed)
+                return
+            self._fence = fence
+            self._language = rest.strip()
+            self._code = []
+        elif stripped.startswith(self._fence) and not stripped.strip("`"):
+            self._emit(self._language, "\n".join(self._code), completed)
+            self._fence = None
+            self._code = []
+        else:
+            self._code.append(line)
+
+    def _emit(self, language, code, completed):
+        code = code.strip("\n")
+        if code.strip():
+            block = CodeBlock(language, code)
+            self.blocks.append(block)
+            completed.append(block)
@@ -0,0 +1,58 @@
+import codecs
+import mmap
+import os
+import stat
+import tempfile
+
+# Bytes per piece handed to the UI while a file loads
+CHUNK_BYTES = 256 * 1024
+
+
+def detect_newline(path):
+    """"\\r\\n" if the file uses Windows line endings, else "\\n\""""
+    with open(path, "rb") as f:
+        head = f.read(65536)
+    return "\r\n" if b"\r\n" in head else "\n"
+
+
+def iter_text_chunks(path, chunk_bytes=CHUNK_BYTES, encoding="utf-8"):
+    """
+    Yield a file's text in pieces of about chunk_bytes that end at a line
+    break, read through mmap so only the current piece is decoded. Line
+    endings are normalized to "\\n" and undecodable bytes replaced.
+    """
+    size = os.path.getsize(path)
+    if not size:
+        return
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = 0
+        while start < size:
+            end = min(size, start + chunk_bytes)
+            if end < size:
+                newline = mm.rfind(b"\n", start, end)
+                if newline >= 0:
+                    end = newline + 1
+            yield decoder.decode(mm[start:end], final=end == size).replace("\r\n", "\n")
+            start = end
+
+
+def write_text(path, text, newline="\n", encoding="utf-8"):
+    """Save through a temporary file in the same folder so a failed write keeps the old file"""
+    folder = os.path.dirname(os.path.abspath(path))
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o666 & ~umask
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix=".save-")
+    try:
+        with os.fdopen(fd, "w", encoding=encoding, newline=newline) as f:
+            f.write(text)
+        # mkstemp creates the file 0600; keep the saved file's permissions
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
@@ -0,0 +1,432 @@
+import queue
+import re
+import threading
+
+TAGS = ("keyword", "string", "comment", "function", "number")
+
+KEYWORDS = ["def", "class", "import", "from", "return", "if", "else", "elif",
+            "try", "except", "finally", "for", "while", "in", "is", "None",
+            "True", "False", "and", "or", "not", "with", "as", "break",
+            "continue", "global", "lambda"]
+
+# One combined pattern, tried left to right at each position
+TOKEN_RE = re.compile(r"""
+    (?P<comment>\#.*)
+  | (?P<triple>[rRbBuUfF]{0,2}(?:\"\"\"|'''))
+  | (?P<string>[rRbBuUfF]{0,2}(?:"(?:[^"\\]|\\.)*"?|'(?:[^'\\]|\\.)*'?))
+  | (?P<def>\bdef\b)(?:\s+(?P<function>[A-Za-z_]\w*)(?=\s*\())?
+  | (?P<keyword>\b(?:%s)\b)
+  | (?P<ident>[A-Za-z_]\w*)
+  | (?P<number>\b\d+\b)
+""" % "|".join(k for k in KEYWORDS if k != "def"), re.VERBOSE)
+
+TRIPLE_END = {
+    '"""': re.compile(r'(?:\\.|[^\\])*?"""'),
+    "'''": re.compile(r"(?:\\.|[^\\])*?'''"),
+}
+
+
+def lex_line(text, state=None):
+    """
+    Lex one line of Python.
+
+    state is None or the triple-quote delimiter still open from the previous
+    line. Returns (spans, end_state) where spans are (tag, start_col, end_col).
+    """
+    spans = []
+    pos = 0
+    if state:
+        match = TRIPLE_END[state].match(text)
+        if not match:
+            if text:
+                spans.append(("string", 0, len(text)))
+            return spans, state
+        pos = match.end()
+        spans.append(("string", 0, pos))
+        state = None
+
+    length = len(text)
+    while pos < length:
+        match = TOKEN_RE.search(text, pos)
+        if not match:
+            break
+        kind = match.lastgroup
+        start, end = match.span()
+        if kind == "triple":
+            delim = match.group("triple")[-3:]
+            closing = TRIPLE_END[delim].match(text, end)
+            if closing:
+                end = closing.end()
+            else:
+                spans.append(("string", start, length))
+                return spans, delim
+            spans.append(("string", start, end))
+        elif match.group("def"):
+            spans.append(("keyword", *match.span("def")))
+            if match.group("function"):
+                spans.append(("function", *match.span("function")))
+        elif kind != "ident":
+            spans.append((kind, start, end))
+        pos = end if end > pos else pos + 1
+    return spans, state
+
+
+class LineHighlighter:
+    """
+    Incremental, line-based highlighter state.
+
+    Keeps the lexer state at the end of every line plus its spans, and a list
+    of dirty line ranges (1-based, inclusive). Edits shift the cache; relex()
+    re-lexes only the dirty lines and keeps going past them while the end
+    state differs from the cached one (e.g. an opened triple-quoted string).
+    """
+    def __init__(self):
+        self.states = []   # states[i] = lexer state at the end of line i + 1
+        self.spans = []    # spans[i] = spans of line i + 1
+        self.dirty = []    # merged [first, last] ranges
+
+    def __len__(self):
+        return len(self.states)
+
+    def mark_dirty(self, first, last=None):
+        last = first if last is None else last
+        ranges = self.dirty + [[first, last]]
+        ranges.sort()
+        merged = []
+        for start, end in ranges:
+            if merged and start <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self.dirty = merged
+
+    def lines_inserted(self, line, count):
+        """count new lines were created after line (text inserted on line)"""
+        if count:
+            # The last new line now ends where line used to end, so it takes
+            # over line's cached end state
+            self.states[line - 1:line - 1] = [False] * count
+            self.spans[line:line] = [[] for _ in range(count)]
+            for rng in self.dirty:
+                if rng[0] > line:
+                    rng[0] += count
+                if rng[1] > line:
+                    rng[1] += count
+        self.mark_dirty(line, line + count)
+
+    def lines_deleted(self, line, count):
+        """count lines after line were joined into it"""
+        if count:
+            # line now ends where the last joined line ended; keep that end
+            # state so relex() compares against what the next line was lexed with
+            if line + count - 1 < len(self.states):
+                self.states[line - 1] = self.states[line + count - 1]
+            del self.states[line:line + count]
+            del self.spans[line:line + count]
+            for rng in self.dirty:
+                rng[0] = rng[0] - count if rng[0] > line + count else min(rng[0], line)
+                rng[1] = rng[1] - count if rng[1] > line + count else min(rng[1], line)
+        self.mark_dirty(line)
+
+    def reset(self, line_count):
+        self.states = [False] * line_count
+        self.spans = [[] for _ in range(line_count)]
+        self.dirty = [[1, line_count]] if line_count else []
+
+    def relex(self, get_lines, line_count, limit=None, start_at=None):
+        """
+        Re-lex dirty lines.
+
+        get_lines(first, last) returns the text of lines first..last. Returns
+        a list of (first, last, [spans per line]) runs that changed. With a
+        limit, at most that many lines are lexed and the rest stays dirty.
+        start_at lexes dirty lines from that line on first (e.g. the visible
+        ones), starting from the cached state of the line before; when the
+        lines above are lexed later, lexing continues into them only if that
+        state turns out different.
+        """
+        self._resize(line_count)
+        self.dirty = [[max(1, a), min(b, line_count)] for a, b in self.dirty
+                      if a <= line_count and b >= 1]
+        if start_at is not None:
+            for index, (a, b) in enumerate(self.dirty):
+                if b >= start_at:
+                    if a < start_at:
+                        self.dirty[index:index + 1] = [[a, start_at - 1], [start_at, b]]
+                        index += 1
+                    self.dirty.insert(0, self.dirty.pop(index))
+                    break
+        runs = []
+        budget = limit
+        while self.dirty and (budget is None or budget > 0):
+            first, last = self.dirty.pop(0)
+            state = self.states[first - 2] if first > 1 else None
+            line = first
+            run_spans = []
+            block = []
+            block_start = line
+            while line <= line_count:
+                if budget is not None and budget <= 0:
+                    self.mark_dirty(line, max(line, last))
+                    break
+                if line - block_start >= len(block):
+                    block_start = line
+                    block = get_lines(line, min(line_count, max(last, line + 199)))
+                text = block[line - block_start]
+                spans, end_state = lex_line(text, state or None)
+                old_state = self.states[line - 1]
+                self.states[line - 1] = end_state
+                self.spans[line - 1] = spans
+                run_spans.append(spans)
+                if budget is not None:
+                    budget -= 1
+                state = end_state
+                line += 1
+                if line > last and old_state is not False and old_state == end_state:
+                    break
+                # Absorb a following dirty range we have reached anyway
+                if self.dirty and first <= self.dirty[0][0] <= line:
+                    last = max(last, self.dirty.pop(0)[1])
+            if run_spans:
+                runs.append((first, first + len(run_spans) - 1, run_spans))
+        return runs
+
+    def _resize(self, line_count):
+        missing = line_count - len(self.states)
+        if missing > 0:
+            start = len(self.states) + 1
+            self.states.extend([False] * missing)
+            self.spans.extend([] for _ in range(missing))
+            self.mark_dirty(start, line_count)
+        elif missing < 0:
+            del self.states[line_count:]
+            del self.spans[line_count:]
+
+
+class LineRanges:
+    """Sorted, merged [first, last] line ranges that move with inserted/deleted lines"""
+    def __init__(self):
+        self.ranges = []
+
+    def add(self, first, last):
+        ranges = sorted(self.ranges + [[first, last]])
+        merged = []
+        for start, end in ranges:
+            if merged and start <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self.ranges = merged
+
+    def lines_inserted(self, line, count):
+        for rng in self.ranges:
+            if rng[0] > line:
+                rng[0] += count
+            if rng[1] > line:
+                rng[1] += count
+
+    def lines_deleted(self, line, count):
+        for rng in self.ranges:
+            rng[0] = rng[0] - count if rng[0] > line + count else min(rng[0], line)
+            rng[1] = rng[1] - count if rng[1] > line + count else min(rng[1], line)
+
+    def take(self, first, last):
+        """Remove and return the parts of the ranges within first..last"""
+        taken = []
+        kept = []
+        for start, end in self.ranges:
+            if end < first or start > last:
+                kept.append([start, end])
+                continue
+            taken.append((max(start, first), min(end, last)))
+            if start < first:
+                kept.append([start, first - 1])
+            if end > last:
+                kept.append([last + 1, end])
+        self.ranges = kept
+        return taken
+
+
+# Lines lexed per worker step before checking for newer edits
+LEX_CHUNK = 2000
+# Lines per result slice handed to the UI
+SLICE_LINES = 200
+# Documents up to this many lines are tagged in full; longer ones only
+# around the viewport, the rest is lexed (for its end state) but not posted
+EAGER_LINES = 5000
+
+
+class HighlightDocument:
+    """
+    Worker-side mirror of one text widget.
+
+    The UI thread calls edit()/reset() after every change with only the
+    affected lines. The worker lexes them and posts result slices of
+    (result_id, generation, first, last, {tag: [index, ...]}) to results; the
+    UI applies slices of the current generation and acks them. Slices that
+    were never applied are marked dirty again when the next edit arrives.
+
+    Once the UI reports a viewport and the document is long, only lines in
+    the viewport are posted; the others are remembered in unposted and sent
+    from the span cache when they scroll into view.
+    """
+    def __init__(self, worker):
+        self.worker = worker
+        self.results = queue.SimpleQueue()
+        self.acked = set()
+        self.sent = 0        # Messages posted by the UI thread
+        self.done = 0        # Messages fully lexed by the worker
+
+        # Worker thread only
+        self.lines = [""]
+        self.highlighter = LineHighlighter()
+        self.viewport = None
+        self.unposted = LineRanges()
+        self.generation = 0
+        self.processed = 0
+        self._pending = []
+        self._next_id = 0
+
+    @property
+    def busy(self):
+        return self.done < self.sent or not self.results.empty()
+
+    # UI thread
+    def edit(self, generation, first, removed, texts):
+        self.sent += 1
+        self.worker.post(self, ("edit", generation, first, removed, texts))
+
+    def reset(self, generation, texts):
+        self.sent += 1
+        self.worker.post(self, ("reset", generation, texts))
+
+    def set_viewport(self, first, last):
+        self.sent += 1
+        self.worker.post(self, ("viewport", first, last))
+
+    def close(self):
+        self.worker.post(self, ("close",))
+
+    # Worker thread
+    def handle(self, message):
+        kind = message[0]
+        self.processed += 1
+        self._remark_unacked()
+        if kind == "edit":
+            _, self.generation, first, removed, texts = message
+            self.lines[first - 1:first + removed] = texts
+            if removed:
+                self.highlighter.lines_deleted(first, removed)
+                self.unposted.lines_deleted(first, removed)
+            self.highlighter.lines_inserted(first, len(texts) - 1)
+            self.unposted.lines_inserted(first, len(texts) - 1)
+        elif kind == "reset":
+            _, self.generation, texts = message
+            self.lines = texts
+            self.highlighter.reset(len(texts))
+            self.unposted = LineRanges()
+        elif kind == "viewport":
+            _, first, last = message
+            self.viewport = (max(1, first), last)
+            for start, end in self.unposted.take(*self.viewport):
+                self._post_lines(start, self.highlighter.spans[start - 1:end])
+
+    @property
+    def lazy(self):
+        return self.viewport is not None and len(self.lines) > EAGER_LINES
+
+    def lex_some(self, limit=LEX_CHUNK):
+        start_at = None
+        if self.lazy:
+            first, last = self.viewport
+            if any(a <= last and b >= first for a, b in self.highlighter.dirty):
+                start_at = first  # Visible lines first
+        elif self.unposted.ranges:
+            # The document shrank below EAGER_LINES: send what was held back
+            for start, end in self.unposted.take(1, len(self.lines)):
+                self._post_lines(start, self.highlighter.spans[start - 1:end])
+        runs = self.highlighter.relex(self._get_lines, len(self.lines), limit, start_at)
+        for first, last, line_spans in runs:
+            if not self.lazy:
+                self._post_lines(first, line_spans)
+                continue
+            view_first, view_last = self.viewport
+            low, high = max(first, view_first), min(last, view_last)
+            if low > high:
+                self.unposted.add(first, last)
+                continue
+            self._post_lines(low, line_spans[low - first:high - first + 1])
+            if first < low:
+                self.unposted.add(first, low - 1)
+            if high < last:
+                self.unposted.add(high + 1, last)
+        return bool(self.highlighter.dirty)
+
+    def _post_lines(self, first, line_spans):
+        for offset in range(0, len(line_spans), SLICE_LINES):
+            self._post_slice(first + offset, line_spans[offset:offset + SLICE_LINES])
+
+    def _get_lines(self, first, last):
+        return self.lines[first - 1:last]
+
+    def _post_slice(self, first, line_spans):
+        # Convert spans to line.col indices here so the UI only calls tag add
+        ranges = {}
+        for line, spans in enumerate(line_spans, first):
+            for tag, start, end in spans:
+                ranges.setdefault(tag, []).extend((f"{line}.{start}", f"{line}.{end}"))
+        last = first + len(line_spans) - 1
+        self._next_id += 1
+        self._pending.append((self._next_id, first, last))
+        self.results.put((self._next_id, self.generation, first, last, ranges))
+
+    def _remark_unacked(self):
+        for result_id, first, last in self._pending:
+            if result_id not in self.acked:
+                self.highlighter.mark_dirty(first, last)
+        self._pending.clear()
+        self.acked.clear()
+
+
+class HighlightWorker(threading.Thread):
+    """Single background thread that lexes every HighlightDocument"""
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self):
+        super().__init__(daemon=True, name="highlight-worker")
+        self.inbox = queue.Queue()
+        self.active = set()
+
+    @classmethod
+    def shared(cls):
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls()
+                cls._instance.start()
+            return cls._instance
+
+    def document(self):
+        return HighlightDocument(self)
+
+    def post(self, doc, message):
+        self.inbox.put((doc, message))
+
+    def run(self):
+        while True:
+            try:
+                doc, message = self.inbox.get(block=not self.active)
+            except queue.Empty:
+                message = None
+            if message:
+                if message[0] == "close":
+                    self.active.discard(doc)
+                else:
+                    doc.handle(message)
+                    self.active.add(doc)
+                continue  # Drain all edits before lexing
+
+            for doc in list(self.active):
+                if not doc.lex_some():
+                    doc.done = doc.processed
+                    self.active.discard(doc)
@@ -0,0 +1,122 @@
+"""
+Incremental Markdown parsing for streamed replies.
+
+Text is fed as it arrives; each line is parsed once, when its newline
+arrives, so the work per chunk is proportional to the chunk. The result is
+a list of (tag, start, end) spans per line: the raw text stays in the widget
+and markup characters are hidden with an elided tag instead of removed.
+Lines inside a Python (or unlabelled) fence are lexed with the editor's
+highlighter, carrying triple-quote state across lines.
+"""
+import re
+
+_HEADING_RE = re.compile(r"(#{1,6})[ \t]+")
+_FENCE_RE = re.compile(r"[ \t]*(```+|~~~+)[ \t]*([\w+#.-]*)")
+_PIECE_RE = re.compile(r"[^\n]*\n|[^\n]+")
+_INLINE_RE = re.compile(r"`([^`\n]+)`|\*\*(?=\S)(.+?)(?<=\S)\*\*|__(?=\S)(.+?)(?<=\S)__")
+
+PYTHON_LANGUAGES = {"", "python", "py", "python3"}
+
+# Tag options for a light chat view; keys are span tags without the widget prefix
+STYLES = {
+    "h1": {"font": ("bold", 1.5)},
+    "h2": {"font": ("bold", 1.3)},
+    "h3": {"font": ("bold", 1.1)},
+    "bold": {"font": ("bold", 1.0)},
+    "code": {"font": ("fixed", 1.0), "background": "#EFF1F3"},
+    "fence": {"font": ("fixed", 1.0), "background": "#F6F8FA", "lmargin1": 12, "lmargin2": 12},
+    "fence_label": {"foreground": "#8B949E"},
+    "marker": {"elide": True},
+    "keyword": {"foreground": "#CF222E"},
+    "string": {"foreground": "#0A3069"},
+    "comment": {"foreground": "#6E7781"},
+    "function": {"foreground": "#8250DF"},
+    "number": {"foreground": "#0550AE"},
+}
+
+# Backgrounds for a dark chat view (the Canvas editor passes its own syntax colors)
+DARK_STYLES = dict(STYLES,
+                   code={"font": ("fixed", 1.0), "background": "#161B22"},
+                   fence={"font": ("fixed", 1.0), "background": "#161B22", "lmargin1": 12, "lmargin2": 12})
+
+
+class MarkdownStream:
+    """
+    Line-at-a-time Markdown state for one message.
+
+    feed_piece() takes text that contains at most one newline, at its end,
+    and returns the spans of the line it completed (or None). The only
+    state carried between lines is the open fence and the lexer state.
+    """
+    def __init__(self):
+        self.partial = []
+        self.fence = None        # Opening marker of the open fence, or None
+        self.language = ""
+        self.code_state = None   # Open triple quote inside a Python fence
+
+    @property
+    def at_line_start(self):
+        return not self.partial
+
+    @property
+    def in_fence(self):
+        return self.fence is not None
+
+    def feed_piece(self, piece):
+        self.partial.append(piece)
+        if not piece.endswith("\n"):
+            return None
+        return self.end_line()
+
+    def end_line(self):
+        """Parse and clear the buffered line; returns its spans"""
+        line = "".join(self.partial).rstrip("\n")
+        self.partial.clear()
+        return self.parse_line(line)
+
+    def parse_line(self, line):
+        if self.fence is not None:
+            stripped = line.strip()
+            if stripped.startswith(self.fence) and not stripped.strip(self.fence[0]):
+                self.fence = None
+                return [("marker", 0, len(line))]
+            spans = [("fence", 0, len(line))]
+            if self.language in PYTHON_LANGUAGES:
+                # Imported on the first code line; plain replies never load the lexer
+                from .highlighter import lex_line
+
+                code_spans, self.code_state = lex_line(line, self.code_state)
+                spans.extend(code_spans)
+            return spans
+
+        match = _FENCE_RE.match(line)
+        if match and match.end() == len(line.rstrip()):
+            self.fence = match.group(1)
+            self.language = match.group(2).lower()
+            self.code_state = None
+            spans = [("marker", 0, match.start(2) if self.language else len(line))]
+            if self.language:
+                spans.append(("fence_label", match.start(2), len(line)))
+            return spans
+
+        spans = []
+        offset = 0
+        match = _HEADING_RE.match(line)
+        if match:
+            level = min(len(match.group(1)), 3)
+            spans.append(("marker", 0, match.end()))
+            spans.append((f"h{level}", match.end(), len(line)))
+            offset = match.end()
+        for match in _INLINE_RE.finditer(line, offset):
+            start, end = match.span()
+            width = 1 if match.group(1) is not None else 2
+            tag = "code" if width == 1 else "bold"
+            spans.append(("marker", start, start + width))
+            spans.append((tag, start + width, end - width))
+            spans.append(("marker", end - width, end))
+        return spans
+
+
+def split_lines(text):
+    """Pieces of text that each end at a newline (except possibly the last)"""
+    return _PIECE_RE.findall(text)
@@ -0,0 +1,97 @@
+"""
+Outgoing messages typed while a reply is still streaming.
+
+The GUIs keep input enabled during generation and queue follow-ups here;
+the next one is sent as soon as the current request finishes. Queued items
+can be edited, reordered or removed until then, and with merge on, all
+queued items go out as a single request (one prompt evaluation instead of
+one per message) as long as they carry the same attachment or none.
+"""
+import itertools
+
+MERGE_SEPARATOR = "\n\n"
+
+
+class QueuedMessage:
+    _ids = itertools.count(1)
+
+    def __init__(self, text, attachment=None):
+        self.id = next(self._ids)
+        self.text = text
+        self.attachment = attachment  # Whatever the GUI sends along (e.g. the open tab's code)
+
+    def preview(self, width=60):
+        line = " ".join(self.text.split())
+        return line if len(line) <= width else line[:width - 1] + "…"
+
+
+class Outbox:
+    """Ordered queue of QueuedMessage; all methods run on the UI thread"""
+    def __init__(self, merge=False):
+        self.items = []
+        self.merge = merge
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def add(self, text, attachment=None):
+        item = QueuedMessage(text, attachment)
+        self.items.append(item)
+        return item
+
+    def get(self, item_id):
+        for item in self.items:
+            if item.id == item_id:
+                return item
+        return None
+
+    def edit(self, item_id, text):
+        item = self.get(item_id)
+        if item is not None:
+            if text.strip():
+                item.text = text
+            else:
+                self.remove(item_id)
+        return item
+
+    def remove(self, item_id):
+        self.items = [item for item in self.items if item.id != item_id]
+
+    def move(self, item_id, offset):
+        """Move an item up (negative offset) or down; returns its new index"""
+        item = self.get(item_id)
+        if item is None:
+            return None
+        index = self.items.index(item)
+        new_index = max(0, min(len(self.items) - 1, index + offset))
+        self.items.insert(new_index, self.items.pop(index))
+        return new_index
+
+    def clear(self):
+        self.items.clear()
+
+    def pop_next(self):
+        """
+        (text, attachment, count) for the next request, or None when empty.
+
+        With merge on, queued messages are joined into one text up to the
+        first one whose attachment differs from the others; a request carries
+        one attachment, so that message starts the next request.
+        """
+        if not self.items:
+            return None
+        count = 1
+        attachment = self.items[0].attachment
+        if self.merge:
+            for item in self.items[1:]:
+                if item.attachment is not None:
+                    if attachment is not None and item.attachment != attachment:
+                        break
+                    attachment = item.attachment
+                count += 1
+        taken, self.items = self.items[:count], self.items[count:]
+        text = MERGE_SEPARATOR.join(item.text for item in taken)
+        return text, attachment, count
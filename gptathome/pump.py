@@ -0,0 +1,107 @@
+import queue
+import time
+import tkinter as tk
+
+# Default UI refresh rate for streamed text
+FRAME_RATE = 30
+
+
+class TokenPump:
+    """
+    Thread-safe bridge between a stream worker and a Tk text widget.
+
+    Worker threads call put()/call() and never touch Tk directly. The UI thread
+    drains the queue once per frame, inserts all pending text with a single
+    insert and scrolls at most once per frame.
+    """
+    def __init__(self, widget, frame_rate=FRAME_RATE):
+        self.widget = widget
+        self.interval_ms = max(1, int(1000 / frame_rate))
+        self._queue = queue.SimpleQueue()
+        self._after_id = None
+        self._last_frame = None
+
+        # Stats
+        self.frames = 0              # Frames that inserted something
+        self.chunks = 0              # Chunks received from the worker
+        self.coalesced_frames = 0    # Frames that merged more than one chunk
+        self.dropped_frames = 0      # Frame slots missed because the UI was busy
+        self.max_backlog = 0         # Most chunks waiting for a single frame
+
+    def start(self):
+        """Start draining the queue on the Tk main loop"""
+        if self._after_id is None:
+            self._last_frame = time.perf_counter()
+            self._after_id = self.widget.after(self.interval_ms, self._tick)
+
+    def stop(self):
+        """Stop the frame timer after flushing whatever is pending"""
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+        self.flush()
+
+    def put(self, text, tags=None):
+        """Queue text for insertion (safe to call from any thread)"""
+        if text:
+            self._queue.put((text, tags))
+
+    def call(self, func):
+        """Queue a callback that runs on the UI thread, in order with the text"""
+        self._queue.put((func, None))
+
+    def reset_stats(self):
+        self.frames = self.chunks = self.coalesced_frames = self.dropped_frames = 0
+        self.max_backlog = 0
+
+    def stats_text(self):
+        return (f"frames: {self.frames}, chunks: {self.chunks}, "
+                f"coalesced: {self.coalesced_frames}, dropped: {self.dropped_frames}, "
+                f"max backlog: {self.max_backlog}")
+
+    def _tick(self):
+        now = time.perf_counter()
+        # Count frame slots we missed because the main loop was blocked
+        late = (now - self._last_frame) * 1000 - self.interval_ms
+        if late >= self.interval_ms:
+            self.dropped_frames += int(late // self.interval_ms)
+        self._last_frame = now
+
+        self.flush()
+        self._after_id = self.widget.after(self.interval_ms, self._tick)
+
+    def flush(self):
+        """Insert everything queued so far; must run on the UI thread"""
+        pending = []
+        pending_tags = None
+        inserted = 0
+
+        def insert_pending():
+            nonlocal inserted
+            if pending:
+                self.widget.insert(tk.END, "".join(pending), pending_tags)
+                inserted += len(pending)
+                pending.clear()
+
+        while True:
+            try:
+                item, tags = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if callable(item):
+                insert_pending()
+                item()
+            else:
+                if pending and tags != pending_tags:
+                    insert_pending()
+                pending_tags = tags
+                pending.append(item)
+        insert_pending()
+
+        if inserted:
+            self.frames += 1
+            self.chunks += inserted
+            if inserted > 1:
+                self.coalesced_frames += 1
+            self.max_backlog = max(self.max_backlog, inserted)
+            self.widget.see(tk.END)
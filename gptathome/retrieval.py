@@ -0,0 +1,265 @@
+"""
+Retrieval over past conversations.
+
+Stored messages are embedded with an Ollama embedding model on a background
+thread and appended to a memory-mapped float32 matrix. Each prompt is
+embedded once, scored against every row with batched matrix products, and
+the best snippets that fit the token budget are sent as a system message.
+numpy is optional: without it retrieval is simply unavailable.
+"""
+import importlib.util
+import json
+import os
+import threading
+
+from .think import strip_think
+
+INDEX_PATH = "memory_index"
+EMBED_MODEL = os.environ.get("GPTATHOME_EMBED_MODEL", "nomic-embed-text")
+# Tokens of retrieved snippets allowed per request
+RETRIEVAL_TOKENS = 1024
+# Messages embedded per Ollama call while catching up with the store
+EMBED_BATCH = 32
+# Rows scored per matrix product, bounds the temporary score array
+SEARCH_BLOCK = 65536
+TOP_K = 8
+MIN_SCORE = 0.35
+# Characters of a message that are embedded and can be injected
+SNIPPET_CHARS = 1500
+
+HEADER = "Possibly relevant excerpts from earlier conversations:"
+
+
+def available():
+    return importlib.util.find_spec("numpy") is not None
+
+
+def snippet_text(content):
+    """The part of a message that is embedded and injected"""
+    return strip_think(content).strip()[:SNIPPET_CHARS]
+
+
+class EmbeddingIndex:
+    """
+    Append-only matrix of unit-length embeddings in a memory-mapped file.
+
+    Rows live in PATH.f32 and their metadata in PATH.jsonl, one line per row,
+    with the embedding model and dimension in PATH.json. Appends write to the
+    end of the files; searches re-map the matrix once it has grown, so the
+    index is never rebuilt. A different embedding model starts a new index.
+    The files are read on first use, normally by the indexer thread.
+    """
+    def __init__(self, path=INDEX_PATH, model=EMBED_MODEL):
+        self.matrix_path = path + ".f32"
+        self.meta_path = path + ".jsonl"
+        self.header_path = path + ".json"
+        self.model = model
+        self.dim = None
+        self.meta = []
+        self._matrix = None
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def __len__(self):
+        self._ensure_loaded()
+        return len(self.meta)
+
+    @property
+    def last_id(self):
+        self._ensure_loaded()
+        return self.meta[-1]["id"] if self.meta else 0
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._load()
+                    self._loaded = True
+
+    def _load(self):
+        if not os.path.exists(self.header_path):
+            return
+        with open(self.header_path, encoding="utf-8") as f:
+            header = json.load(f)
+        if header.get("model") != self.model:
+            self._reset()
+            return
+        self.dim = header["dim"]
+        torn = False
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self.meta.append(json.loads(line))
+                    except ValueError:
+                        torn = True  # Torn last line after a crash
+                        break
+        # The matrix is written first, so it has at least as many rows
+        rows = 0
+        if os.path.exists(self.matrix_path):
+            rows = os.path.getsize(self.matrix_path) // (4 * self.dim)
+        if len(self.meta) > rows:
+            del self.meta[rows:]
+            torn = True
+        size = len(self.meta) * 4 * self.dim
+        if not os.path.exists(self.matrix_path) or os.path.getsize(self.matrix_path) != size:
+            with open(self.matrix_path, "ab") as f:
+                f.truncate(size)
+        if torn:
+            with open(self.meta_path, "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(m) + "\n" for m in self.meta)
+
+    def _reset(self):
+        for path in (self.matrix_path, self.meta_path, self.header_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.dim = None
+        self.meta = []
+        self._matrix = None
+
+    def append(self, vectors, metas):
+        """Add embeddings (n x dim) with one metadata dict each"""
+        import numpy as np
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(vectors):
+            return
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.maximum(norms, 1e-12)
+        self._ensure_loaded()
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                with open(self.header_path, "w", encoding="utf-8") as f:
+                    json.dump({"model": self.model, "dim": self.dim}, f)
+            with open(self.matrix_path, "ab") as f:
+                f.write(vectors.tobytes())
+            with open(self.meta_path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(m) + "\n" for m in metas)
+            self.meta.extend(metas)
+
+    def _rows(self):
+        import numpy as np
+
+        self._ensure_loaded()
+        with self._lock:
+            count = len(self.meta)
+            if count and (self._matrix is None or len(self._matrix) != count):
+                self._matrix = np.memmap(self.matrix_path, dtype=np.float32, mode="r",
+                                         shape=(count, self.dim))
+            return self._matrix if count else None
+
+    def search(self, queries, k=TOP_K):
+        """Top-k (score, meta) per query vector by cosine similarity"""
+        import numpy as np
+
+        matrix = self._rows()
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if matrix is None:
+            return [[] for _ in queries]
+        queries = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(matrix), SEARCH_BLOCK):
+            scores = queries @ matrix[start:start + SEARCH_BLOCK].T
+            rows = np.broadcast_to(np.arange(start, start + scores.shape[1]), scores.shape)
+            # Merge this block's candidates with the best so far
+            scores = np.concatenate([best_scores, scores], axis=1)
+            rows = np.concatenate([best_rows, rows], axis=1)
+            if scores.shape[1] > k:
+                keep = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, keep, axis=1)
+                rows = np.take_along_axis(rows, keep, axis=1)
+            best_scores, best_rows = scores, rows
+
+        results = []
+        for scores, rows in zip(best_scores, best_rows):
+            order = np.argsort(-scores)
+            results.append([(float(scores[i]), self.meta[rows[i]]) for i in order])
+        return results
+
+
+class Retriever:
+    """
+    Keeps an EmbeddingIndex in step with the ConversationStore and picks
+    snippets for new prompts. sync() only wakes the background thread, which
+    embeds messages newer than the last indexed one. tokens stays 0 (no
+    context budget reserved) until the embedding model has answered once.
+    """
+    def __init__(self, store, index=None, model=EMBED_MODEL, embed=None):
+        self.store = store
+        self.model = model
+        self.index = index if index is not None else EmbeddingIndex(model=model)
+        self.embed = embed or self._ollama_embed
+        self.ready = False
+        self._wake = threading.Event()
+        self._thread = None
+
+    @property
+    def tokens(self):
+        return RETRIEVAL_TOKENS if self.ready else 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name="retrieval-indexer")
+            self._thread.start()
+        self._wake.set()
+
+    def sync(self):
+        """Index whatever the store has committed since the last sync"""
+        self.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            try:
+                if not self.ready:
+                    self.embed([" "])  # Raises if the embedding model is missing
+                    self.ready = True
+                self.catch_up()
+            except Exception as e:
+                print(f"Retrieval indexing failed: {e}")
+
+    def catch_up(self):
+        while True:
+            rows = self.store.messages_after(self.index.last_id, EMBED_BATCH)
+            if not rows:
+                return
+            metas = []
+            for message_id, session_id, role, content in rows:
+                metas.append({"id": message_id, "session": session_id, "role": role,
+                              "text": snippet_text(content)})
+            # Empty messages keep their row so last_id still advances
+            vectors = self.embed([m["text"] or " " for m in metas])
+            self.index.append(vectors, metas)
+
+    def context_message(self, query, budget, counter, model=None, exclude=()):
+        """A system message with the best snippets that fit budget tokens, or None"""
+        if budget <= 0 or not len(self.index):
+            return None
+        hits = self.index.search(self.embed([snippet_text(query)]), TOP_K)[0]
+        excluded = {snippet_text(text) for text in exclude}
+        header_cost = counter.count(HEADER, model)
+        used = header_cost
+        parts = []
+        seen = set()
+        for score, meta in hits:
+            text = meta["text"]
+            if score < MIN_SCORE or not text or text in excluded or text in seen:
+                continue
+            part = f"[{meta['role']}] {text}"
+            cost = counter.count(part, model)
+            if used + cost > budget:
+                continue
+            seen.add(text)
+            parts.append(part)
+            used += cost
+        if not parts:
+            return None
+        return {'role': 'system', 'content': HEADER + "\n\n" + "\n\n".join(parts)}
+
+    def _ollama_embed(self, texts):
+        import ollama
+        return ollama.embed(model=self.model, input=texts)['embeddings']
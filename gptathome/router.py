@@ -0,0 +1,179 @@
+"""
+Latency-aware routing across sizes of one model family.
+
+Each request gets a difficulty tier from the size of its built context and
+the amount of code in it; the tier caps how large a model is worth asking.
+Among models up to the cap, the largest whose predicted reply time fits the
+user's latency target is chosen. Predictions use each model's measured
+prompt-eval and decode tokens/s (from the conversation store and every
+finished request), with size-based guesses until a model has been used.
+"""
+import os
+import re
+import time
+
+from .context import TokenCounter
+
+ROUTER_MODELS = [m.strip() for m in os.environ.get(
+    "GPTATHOME_MODELS", "deepseek-r1:1.5b,deepseek-r1:7b,deepseek-r1:14b,deepseek-r1:32b").split(",")
+    if m.strip()]
+# Latency targets offered in the GUIs, in seconds (None: no limit)
+LATENCY_TARGETS = [5, 15, 30, 60, 120, None]
+# Reply length assumed before any reply of a model was measured (R1 thinks first)
+DEFAULT_REPLY_TOKENS = 600
+# A model used this recently is assumed to still be loaded (Ollama keep_alive)
+LOADED_SECONDS = 30 * 60
+# Weight of a new measurement in the running averages
+SMOOTHING = 0.3
+
+_SIZE_RE = re.compile(r"(\d+(?:\.\d+)?)b\b", re.IGNORECASE)
+_FENCE_RE = re.compile(r"```[^\n]*\n(.*?)(?:\n```|$)", re.DOTALL)
+
+
+def model_size(model):
+    """Parameter count in billions from a tag like deepseek-r1:14b (7 if unknown)"""
+    match = _SIZE_RE.search(model)
+    return float(match.group(1)) if match else 7.0
+
+
+def installed_models(host=None):
+    """Names of the models the Ollama server has pulled"""
+    import ollama
+
+    names = set()
+    for item in ollama.Client(host=host).list()['models']:
+        name = item.get('model') or item.get('name')
+        if name:
+            names.add(name)
+    return names
+
+
+def code_lines(text):
+    """Lines inside Markdown code fences"""
+    return sum(block.count("\n") + 1 for block in _FENCE_RE.findall(text))
+
+
+class ModelStats:
+    """Running averages of one model's speed; size-based guesses until measured"""
+    def __init__(self, model):
+        size = model_size(model)
+        self.model = model
+        self.samples = 0
+        self.eval_tps = 60.0 / size          # CPU decode is memory-bound: ~size^-1
+        self.prompt_tps = 600.0 / size
+        self.reply_tokens = DEFAULT_REPLY_TOKENS
+        self.load_seconds = 1.0 + size * 0.5
+        self.last_used = 0.0
+
+    def _average(self, name, value):
+        if value:
+            current = getattr(self, name)
+            setattr(self, name, value if self.samples == 0 else current * (1 - SMOOTHING) + value * SMOOTHING)
+
+    def record(self, telemetry):
+        self._average("eval_tps", telemetry.get("eval_tps"))
+        self._average("prompt_tps", telemetry.get("prompt_tps"))
+        self._average("reply_tokens", telemetry.get("eval_count"))
+        load = telemetry.get("load_duration")
+        if load and load > 1.0:  # Only cold loads say how long a load takes
+            self.load_seconds = load
+        if telemetry.get("eval_tps"):
+            self.samples += 1
+
+    def predict(self, prompt_tokens, loaded=True):
+        seconds = prompt_tokens / self.prompt_tps + self.reply_tokens / self.eval_tps
+        return seconds if loaded else seconds + self.load_seconds
+
+
+class RouteDecision:
+    def __init__(self, model, predicted, tier, reason):
+        self.model = model
+        self.predicted = predicted
+        self.tier = tier
+        self.reason = reason
+
+    def __repr__(self):
+        return f"RouteDecision({self.model!r}, {self.predicted:.1f}s, tier={self.tier})"
+
+
+class ModelRouter:
+    """
+    Picks a model per prompt. models are ordered from smallest to largest;
+    record() is called with each finished request's telemetry dict.
+    """
+    def __init__(self, models=None, counter=None):
+        self.models = list(models or ROUTER_MODELS)
+        self.counter = counter or TokenCounter()
+        self.stats = {model: ModelStats(model) for model in self.models}
+        self.warm = set()  # Models kept loaded by a warmer
+
+    def use_installed(self, names):
+        """Route only to models in names (see installed_models()); order is kept"""
+        self.models = [model for model in self.models if model in names]
+
+    def load_history(self, records):
+        """Seed the averages from stored telemetry dicts (oldest first)"""
+        for telemetry in records:
+            self.record(telemetry, used=False)
+
+    def record(self, telemetry, used=True):
+        stats = self.stats.get(telemetry.get("model"))
+        if stats is None or telemetry.get("cached"):
+            return
+        stats.record(telemetry)
+        if used:
+            stats.last_used = time.monotonic()
+
+    def is_loaded(self, model):
+        stats = self.stats[model]
+        return model in self.warm or (stats.last_used and time.monotonic() - stats.last_used < LOADED_SECONDS)
+
+    def tier(self, prompt_tokens, lines):
+        """0 for short questions, up to len(models) - 1 for long prompts with a lot of code"""
+        tier = 0
+        if prompt_tokens > 80 or lines:
+            tier += 1
+        if lines > 20:
+            tier += 1
+        if lines > 150 or prompt_tokens > 3000:
+            tier += 1
+        return min(tier, len(self.models) - 1)
+
+    def route(self, prompt, target=None, prompt_tokens=None, lines=None):
+        """RouteDecision for a prompt; target is the acceptable reply time in seconds"""
+        tokens = prompt_tokens if prompt_tokens is not None else self.counter.count(prompt)
+        lines = lines if lines is not None else code_lines(prompt)
+        tier = self.tier(tokens, lines)
+        predictions = [(model, self.stats[model].predict(tokens, self.is_loaded(model)))
+                       for model in self.models[:tier + 1]]
+        fitting = [item for item in predictions if target is None or item[1] <= target]
+        if fitting:
+            model, predicted = fitting[-1]
+            why = "largest needed" if model == self.models[tier] else f"fits {target}s"
+        else:
+            model, predicted = min(predictions, key=lambda item: item[1])
+            why = f"fastest, none fits {target}s"
+        detail = f"{tokens} tokens" + (f", {lines} code lines" if lines else "")
+        return RouteDecision(model, predicted, tier, f"~{predicted:.0f}s, {why} ({detail})")
+
+    def route_turn(self, turn, target=None):
+        """RouteDecision for a built ChatTurn: its whole context, including code sent earlier"""
+        text = "\n\n".join(message['content'] for message in turn.messages)
+        return self.route(turn.prompt, target, turn.context_stats.sent_tokens, code_lines(text))
+
+    def larger(self, model):
+        """The next larger configured model, or None"""
+        if model not in self.models:
+            return self.models[-1] if self.models else None
+        index = self.models.index(model)
+        return self.models[index + 1] if index + 1 < len(self.models) else None
+
+    def describe(self):
+        """One line per model: measured (or guessed) speeds"""
+        lines = []
+        for model in self.models:
+            stats = self.stats[model]
+            source = f"{stats.samples} replies" if stats.samples else "guessed"
+            lines.append(f"{model}: decode {stats.eval_tps:.1f} tok/s, prompt {stats.prompt_tps:.0f} tok/s, "
+                         f"~{stats.reply_tokens:.0f} tokens/reply ({source})")
+        return "\n".join(lines)
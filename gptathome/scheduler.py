@@ -0,0 +1,143 @@
+import heapq
+import itertools
+import os
+import threading
+
+from .backend import ChatRequest
+from .code_context import CodeContextTracker
+from .context import ContextManager
+from .outbox import Outbox
+
+# Match the server's parallel slots so extra requests queue here, not in Ollama
+MAX_PARALLEL = int(os.environ.get("OLLAMA_NUM_PARALLEL", "1") or 1)
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 10
+PRIORITY_LOW = 20
+
+
+class Session:
+    """
+    One conversation: its own history, context budget and in-flight request.
+
+    The GUI attaches its view objects (text widget, pump) to the session so
+    every response streams into the view it belongs to.
+    """
+    _ids = itertools.count(1)
+
+    def __init__(self, model, title=None, **context_kwargs):
+        self.id = next(self._ids)
+        self.title = title or f"Chat {self.id}"
+        self.model = model
+        self.chat_history = []
+        self.context = ContextManager(model, **context_kwargs)
+        self.code_context = CodeContextTracker()
+        self.outbox = Outbox()  # Follow-ups typed while a reply streams
+        self.request = None
+
+    @property
+    def is_streaming(self):
+        return self.request is not None and self.request.state != "done"
+
+    @property
+    def state(self):
+        if self.request is None:
+            return "idle"
+        return self.request.state
+
+
+class RequestScheduler:
+    """
+    Limits concurrent generations to max_parallel and queues the rest.
+
+    Queued requests start in priority order (lower value first, FIFO within a
+    priority). Cancelling a queued request removes it without ever reaching
+    the server.
+    """
+    def __init__(self, backend, max_parallel=MAX_PARALLEL):
+        self.backend = backend
+        self.max_parallel = max(1, max_parallel)
+        self._queue = []
+        self._counter = itertools.count()
+        self._running = set()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return len(self._running)
+
+    @property
+    def queued(self):
+        return sum(1 for entry in self._queue if entry[2] is not None)
+
+    def submit(self, priority=PRIORITY_NORMAL, on_chunk=None, on_done=None, on_start=None,
+               prepare=None, **kwargs):
+        """Queue a streaming chat request; returns its ChatRequest"""
+        request = ChatRequest(kwargs, on_chunk, self._wrap_done(on_done))
+        request.state = "queued"
+        request.priority = priority
+        request.on_start = on_start
+        request.prepare = prepare
+        request.cancel_hook = self._cancel_queued
+        with self._lock:
+            self._push(request)
+        self._dispatch()
+        return request
+
+    def position(self, request):
+        """1-based position among queued requests, or 0 if not queued"""
+        with self._lock:
+            ordered = sorted(entry for entry in self._queue if entry[2] is not None)
+        for index, entry in enumerate(ordered, 1):
+            if entry[2] is request:
+                return index
+        return 0
+
+    def reprioritize(self, request, priority):
+        with self._lock:
+            if request.state != "queued" or request.priority == priority:
+                return
+            self._remove(request)
+            request.priority = priority
+            self._push(request)
+
+    def _push(self, request):
+        entry = [request.priority, next(self._counter), request]
+        request.queue_entry = entry
+        heapq.heappush(self._queue, entry)
+
+    def _remove(self, request):
+        # Lazy deletion: the heap entry is blanked and skipped on pop
+        request.queue_entry[2] = None
+
+    def _cancel_queued(self, request):
+        with self._lock:
+            if request.state != "queued":
+                return
+            self._remove(request)
+        request.finish()
+
+    def _wrap_done(self, on_done):
+        def done(request):
+            with self._lock:
+                self._running.discard(request)
+            if on_done:
+                on_done(request)
+            self._dispatch()
+        return done
+
+    def _dispatch(self):
+        to_start = []
+        with self._lock:
+            while self._queue and len(self._running) < self.max_parallel:
+                request = heapq.heappop(self._queue)[2]
+                if request is None:
+                    continue
+                request.state = "running"
+                request.cancel_hook = None
+                self._running.add(request)
+                to_start.append(request)
+        for request in to_start:
+            if request.on_start:
+                request.on_start(request)
+            self.backend.start(request)
@@ -0,0 +1,152 @@
+"""
+Startup timing for the GUIs.
+
+    python -m gptathome.startup [APP.py]
+
+runs the app once under `python -X importtime`, closes it as soon as it is
+interactive and prints the slowest imports next to the app's startup marks.
+Every normal start also appends its time-to-interactive to STARTUP_LOG.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Reference point for all marks; the apps import this module first
+PROCESS_START = time.perf_counter()
+
+# Set by the report runner: print the marks to stderr / quit once interactive
+REPORT_ENV = "GPTATHOME_STARTUP_REPORT"
+EXIT_ENV = "GPTATHOME_EXIT_AFTER_STARTUP"
+
+STARTUP_LOG = "startup_times.jsonl"
+DEFAULT_APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                           "Canvas", "14b_canvas_5.py")
+# Imports listed in the report
+TOP_IMPORTS = 15
+
+
+class StartupTimer:
+    """
+    Marks startup phases and runs deferred work after the first frame.
+
+    The app builds its widgets, calls watch(root) and enters mainloop. Once
+    the window has painted, "first_frame" is marked and the deferred tasks
+    run one per event loop tick; the idle loop after the last one marks
+    "interactive", the app's time-to-interactive.
+    """
+    def __init__(self, app, log_path=STARTUP_LOG):
+        self.app = app
+        self.log_path = log_path
+        self.marks = []
+        self.tasks = []
+        self.interactive = None
+        self._root = None
+        self._on_close = None
+        self.mark("imports")
+
+    def mark(self, label):
+        self.marks.append((label, time.perf_counter() - PROCESS_START))
+
+    def defer(self, func, label=None):
+        """Run func on the UI thread after the window has painted"""
+        self.tasks.append((func, label or getattr(func, "__name__", "task")))
+
+    def watch(self, root, on_close=None):
+        """Call right before mainloop()"""
+        self.mark("widgets")
+        self._root = root
+        self._on_close = on_close or root.destroy
+        root.after_idle(self._first_frame)
+
+    def _first_frame(self):
+        self._root.update_idletasks()
+        self.mark("first_frame")
+        self._root.after(1, self._run_next)
+
+    def _run_next(self):
+        if not self.tasks:
+            self._root.after_idle(self._done)
+            return
+        func, label = self.tasks.pop(0)
+        try:
+            func()
+        except Exception as e:
+            print(f"Startup task {label} failed: {e}")
+        self.mark(label)
+        self._root.after(1, self._run_next)
+
+    def _done(self):
+        self.mark("interactive")
+        self.interactive = self.marks[-1][1]
+        record = self.to_dict()
+        try:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError as e:
+            print(f"Saving startup time failed: {e}")
+        if os.environ.get(REPORT_ENV):
+            print(f"startup {json.dumps(record)}", file=sys.stderr, flush=True)
+        if os.environ.get(EXIT_ENV):
+            self._root.after(0, self._on_close)
+
+    def to_dict(self):
+        return {
+            "app": self.app,
+            "time": time.time(),
+            "tti": self.interactive,
+            "marks": dict(self.marks),
+        }
+
+
+def parse_importtime(stderr):
+    """Top-level (name, self_us, cumulative_us) entries from -X importtime output"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        if not self_us.strip().isdigit() or name.startswith("  "):
+            continue  # Header line, or a nested import counted in its parent
+        entries.append((name.strip(), int(self_us), int(cumulative_us)))
+    return entries
+
+
+def measure(app=DEFAULT_APP, timeout=120, cwd=None):
+    """Start app once; returns (startup record or None, imports, wall seconds)"""
+    app = os.path.abspath(app)
+    env = dict(os.environ, **{REPORT_ENV: "1", EXIT_ENV: "1"})
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", app], env=env,
+                            cwd=cwd or os.path.dirname(app),
+                            capture_output=True, text=True, timeout=timeout)
+    wall = time.perf_counter() - start
+    record = None
+    for line in result.stderr.splitlines():
+        if line.startswith("startup "):
+            record = json.loads(line[len("startup "):])
+    if record is None:
+        print(result.stderr[-2000:], file=sys.stderr)
+    return record, parse_importtime(result.stderr), wall
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    app = argv[0] if argv else DEFAULT_APP
+    record, imports, wall = measure(app)
+    print(f"Slowest imports ({sum(e[2] for e in imports) / 1000:.0f}ms total):")
+    for name, self_us, cumulative_us in sorted(imports, key=lambda e: -e[2])[:TOP_IMPORTS]:
+        print(f"  {cumulative_us / 1000:8.1f}ms  {name}")
+    if record is None:
+        print("The app did not report startup marks")
+        return 1
+    print("Startup marks (seconds since gptathome.startup was imported):")
+    for label, seconds in record["marks"].items():
+        print(f"  {seconds:8.3f}s  {label}")
+    print(f"Time to interactive: {record['tti']:.3f}s (process wall time {wall:.3f}s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
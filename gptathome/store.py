@@ -0,0 +1,276 @@
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+DB_PATH = "conversations.db"
+# Writes are grouped into one transaction per batch
+BATCH_SIZE = 200
+BATCH_WAIT_SECONDS = 0.5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    title TEXT,
+    model TEXT,
+    created REAL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT REFERENCES sessions(id),
+    role TEXT,
+    content TEXT,
+    created REAL
+);
+CREATE INDEX IF NOT EXISTS messages_session ON messages(session_id, id);
+CREATE TABLE IF NOT EXISTS timings (
+    message_id INTEGER PRIMARY KEY REFERENCES messages(id),
+    elapsed REAL,
+    stats TEXT
+);
+CREATE TABLE IF NOT EXISTS imports (
+    path TEXT PRIMARY KEY,
+    size INTEGER,
+    imported REAL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    content, content='messages', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts(rowid, content) VALUES (new.id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_ad AFTER DELETE ON messages BEGIN
+    INSERT INTO messages_fts(messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+END;
+"""
+
+
+def fts_query(query):
+    """FTS5 query matching every word of query, each quoted so punctuation is literal"""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+
+class ConversationStore:
+    """
+    SQLite (WAL) store for sessions, messages and timings.
+
+    All writes are queued to one background writer thread that commits them
+    in batches, so logging never blocks a response. Reads use a separate
+    connection per calling thread.
+    """
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._queue = queue.Queue()
+        self._local = threading.local()
+        self._closed = False
+        # (path, size) of imports queued but maybe not committed yet
+        self._pending_imports = set()
+        self._import_lock = threading.Lock()
+
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        conn.commit()
+
+        self._writer = threading.Thread(target=self._write_loop, daemon=True, name="store-writer")
+        self._writer.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @property
+    def reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    # Writes (any thread, non-blocking)
+    def start_session(self, title, model):
+        session_id = uuid.uuid4().hex
+        self._queue.put(("session", (session_id, title, model, time.time())))
+        return session_id
+
+    def add_message(self, session_id, role, content):
+        self._queue.put(("message", (session_id, role, content, time.time())))
+
+    def add_exchange(self, session_id, prompt, response, elapsed=None, stats=None):
+        """Log a prompt/response pair and the response's timing"""
+        self._queue.put(("exchange", (session_id, prompt, response, elapsed, stats, time.time())))
+
+    def flush(self):
+        """Block until everything queued so far is committed"""
+        self._queue.join()
+
+    def close(self):
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._writer.join(timeout=5)
+
+    def _write_loop(self):
+        conn = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + BATCH_WAIT_SECONDS
+            while len(batch) < BATCH_SIZE and batch[-1] is not None:
+                try:
+                    batch.append(self._queue.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                with conn:
+                    for item in batch:
+                        if item is not None:
+                            self._apply(conn, *item)
+            except sqlite3.Error as e:
+                print(f"Conversation store write failed: {e}")
+            for _ in batch:
+                self._queue.task_done()
+            if batch[-1] is None:
+                conn.close()
+                return
+
+    def _apply(self, conn, kind, args):
+        if kind == "session":
+            conn.execute("INSERT OR IGNORE INTO sessions VALUES (?, ?, ?, ?)", args)
+        elif kind == "message":
+            conn.execute("INSERT INTO messages (session_id, role, content, created) VALUES (?, ?, ?, ?)", args)
+        elif kind == "exchange":
+            session_id, prompt, response, elapsed, stats, created = args
+            conn.execute("INSERT INTO messages (session_id, role, content, created) VALUES (?, 'user', ?, ?)",
+                         (session_id, prompt, created))
+            cursor = conn.execute(
+                "INSERT INTO messages (session_id, role, content, created) VALUES (?, 'assistant', ?, ?)",
+                (session_id, response, created))
+            conn.execute("INSERT INTO timings VALUES (?, ?, ?)",
+                         (cursor.lastrowid, elapsed, json.dumps(stats) if stats else None))
+        elif kind == "import":
+            path, size, rows = args
+            for session_id, title, model, entries in rows:
+                conn.execute("INSERT OR IGNORE INTO sessions VALUES (?, ?, ?, ?)",
+                             (session_id, title, model, time.time()))
+                for prompt, response, elapsed in entries:
+                    self._apply(conn, "exchange", (session_id, prompt, response, elapsed, None, time.time()))
+            conn.execute("INSERT OR REPLACE INTO imports VALUES (?, ?, ?)", (path, size, time.time()))
+
+    # Reads (calling thread)
+    def search(self, query, limit=20):
+        """Full-text search over prompts and responses, best matches first"""
+        match = fts_query(query)
+        if not match:
+            return []
+        try:
+            rows = self.reader.execute(
+                """SELECT m.id, m.session_id, m.role, m.created,
+                          snippet(messages_fts, 0, '[', ']', '…', 12)
+                   FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid
+                   WHERE messages_fts MATCH ? ORDER BY rank LIMIT ?""",
+                (match, limit))
+            return rows.fetchall()
+        except sqlite3.OperationalError as e:
+            print(f"Conversation search failed: {e}")
+            return []
+
+    def timing_stats(self):
+        """Stats dicts of every logged response, oldest first"""
+        rows = self.reader.execute("SELECT stats FROM timings WHERE stats IS NOT NULL ORDER BY message_id")
+        return [json.loads(stats) for (stats,) in rows]
+
+    def messages(self, session_id):
+        rows = self.reader.execute(
+            "SELECT role, content FROM messages WHERE session_id = ? ORDER BY id", (session_id,))
+        return [{'role': role, 'content': content} for role, content in rows]
+
+    def messages_after(self, message_id, limit=100):
+        """(id, session_id, role, content) of committed messages newer than message_id"""
+        rows = self.reader.execute(
+            "SELECT id, session_id, role, content FROM messages WHERE id > ? ORDER BY id LIMIT ?",
+            (message_id, limit))
+        return rows.fetchall()
+
+    def was_imported(self, path):
+        path = os.path.abspath(path)
+        row = self.reader.execute("SELECT size FROM imports WHERE path = ?", (path,)).fetchone()
+        return row is not None and row[0] == os.path.getsize(path)
+
+    def import_text_log(self, path, model=None):
+        """
+        One-time import of a legacy model_responses.txt file.
+
+        Returns the number of exchanges queued, or 0 if this file (at this
+        size) was imported before.
+        """
+        if not os.path.exists(path):
+            return 0
+        key = (os.path.abspath(path), os.path.getsize(path))
+        # The import is written by the writer thread; a second call before it
+        # commits must not pass the was_imported() check
+        with self._import_lock:
+            if key in self._pending_imports or self.was_imported(path):
+                return 0
+            self._pending_imports.add(key)
+        entries = parse_text_log(path)
+        title = f"Imported from {os.path.basename(path)}"
+        rows = [(uuid.uuid4().hex, title, model, entries)]
+        self._queue.put(("import", key + (rows,)))
+        return len(entries)
+
+
+def parse_text_log(path):
+    """Parse model_responses.txt into (prompt, response, elapsed) tuples"""
+    entries = []
+    prompt = None
+    response = []
+    with open(path, encoding="utf-8", errors="replace") as file:
+        lines = file.read().split("\n")
+    index = 0
+    while index < len(lines):
+        line = lines[index]
+        if line.strip() == "user input:" and index + 1 < len(lines):
+            prompt = lines[index + 1]
+            response = []
+            index += 2
+            continue
+        if prompt is not None and line.startswith("elapsed time: "):
+            try:
+                elapsed = float(line[len("elapsed time: "):].rstrip("s"))
+            except ValueError:
+                elapsed = None
+            entries.append((prompt, "\n".join(response).strip("\n"), elapsed))
+            prompt = None
+        elif prompt is not None:
+            response.append(line)
+        index += 1
+    return entries
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) < 2 or argv[0] not in ("search", "import"):
+        print("usage: python -m gptathome.store search QUERY | import model_responses.txt")
+        return 2
+    store = ConversationStore()
+    if argv[0] == "import":
+        for path in argv[1:]:
+            print(f"{path}: {store.import_text_log(path)} exchanges imported")
+        store.flush()
+    else:
+        results = store.search(" ".join(argv[1:]))
+        for message_id, session_id, role, created, snippet in results:
+            stamp = time.strftime("%Y-%m-%d %H:%M", time.localtime(created))
+            print(f"{stamp} {role:9} {snippet}")
+        if not results:
+            print("No results")
+    store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
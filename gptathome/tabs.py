@@ -0,0 +1,184 @@
+"""
+Bookkeeping for the editor's code tabs.
+
+Every tab is indexed by a hash of its content, so a code block the model
+repeats later in the session selects the existing tab instead of opening a
+copy. At most max_tabs stay open: untouched tabs that were used least
+recently are written to an on-disk stash and can be reopened from there.
+Nothing here touches Tk; the editor reports selections, edits and closes.
+"""
+import hashlib
+import json
+import os
+import time
+
+STASH_PATH = "tab_stash"
+MAX_TABS = int(os.environ.get("GPTATHOME_MAX_TABS", "12"))
+# Oldest stash entries are deleted beyond this
+MAX_STASHED = 200
+
+
+def content_key(code):
+    """Hash of code that ignores trailing whitespace and surrounding blank lines"""
+    lines = [line.rstrip() for line in code.strip("\n").splitlines()]
+    return hashlib.sha1("\n".join(lines).encode("utf-8")).hexdigest()
+
+
+def estimate_bytes(chars, lines, tag_ranges):
+    """Rough Tk text widget footprint: text, B-tree line records and tag toggles"""
+    return chars + lines * 80 + tag_ranges * 2 * 40
+
+
+class TabStash:
+    """Evicted tabs, one JSON file per content hash"""
+    def __init__(self, path=STASH_PATH):
+        self.path = path
+        self.entries = {}  # key -> {"title", "language", "path", "newline", "stashed"}
+        if os.path.isdir(path):
+            for name in os.listdir(path):
+                if name.endswith(".json"):
+                    try:
+                        with open(os.path.join(path, name), encoding="utf-8") as f:
+                            data = json.load(f)
+                    except (OSError, ValueError):
+                        continue
+                    data.pop("code", None)
+                    self.entries[name[:-5]] = data
+
+    def _file(self, key):
+        return os.path.join(self.path, key + ".json")
+
+    def put(self, key, code, title, language=None, path=None, newline="\n"):
+        os.makedirs(self.path, exist_ok=True)
+        entry = {"title": title, "language": language, "path": path,
+                 "newline": newline, "stashed": time.time()}
+        with open(self._file(key), "w", encoding="utf-8") as f:
+            json.dump(dict(entry, code=code), f)
+        self.entries[key] = entry
+        for old_key, _ in self.recent(len(self.entries))[MAX_STASHED:]:
+            self.discard(old_key)
+
+    def take(self, key):
+        """Remove an entry and return it with its "code", or None"""
+        if key not in self.entries:
+            return None
+        try:
+            with open(self._file(key), encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = None
+        self.discard(key)
+        return data
+
+    def discard(self, key):
+        self.entries.pop(key, None)
+        try:
+            os.remove(self._file(key))
+        except OSError:
+            pass
+
+    def recent(self, limit=20):
+        """(key, entry) pairs, most recently stashed first"""
+        items = sorted(self.entries.items(), key=lambda item: -item[1]["stashed"])
+        return items[:limit]
+
+
+class TabRecord:
+    __slots__ = ("name", "key", "last_used", "opened")
+
+    def __init__(self, name, key):
+        self.name = name
+        self.key = key
+        self.opened = self.last_used = time.monotonic()
+
+
+class TabManager:
+    """
+    Content-hash index and LRU order of the open tabs.
+
+    Tabs are identified by name (the notebook's widget path). A tab's key is
+    the hash of the code it was opened with; it is dropped from the index
+    once the tab is edited, so edited code never stands in for a new block.
+    """
+    def __init__(self, max_tabs=MAX_TABS, stash=None):
+        self.max_tabs = max_tabs
+        self.stash = stash if stash is not None else TabStash()
+        self.tabs = {}     # name -> TabRecord
+        self.by_key = {}   # content key -> name
+        self.reused = 0
+        self.evicted = 0
+
+    def add(self, name, code):
+        key = content_key(code) if code.strip() else None
+        record = self.tabs[name] = TabRecord(name, key)
+        if key and key not in self.by_key:
+            self.by_key[key] = name
+        return record
+
+    def find(self, code):
+        """Name of an open tab with this code, or the stash key holding it, or (None, None)"""
+        key = content_key(code)
+        name = self.by_key.get(key)
+        if name is not None:
+            self.reused += 1
+            self.touch(name)
+            return name, None
+        if key in self.stash.entries:
+            self.reused += 1
+            return None, key
+        return None, None
+
+    def touch(self, name):
+        record = self.tabs.get(name)
+        if record is not None:
+            record.last_used = time.monotonic()
+
+    def edited(self, name):
+        """The tab's content no longer matches its key"""
+        record = self.tabs.get(name)
+        if record is not None and record.key:
+            if self.by_key.get(record.key) == name:
+                del self.by_key[record.key]
+            record.key = None
+
+    def remove(self, name):
+        record = self.tabs.pop(name, None)
+        if record is not None and record.key and self.by_key.get(record.key) == name:
+            del self.by_key[record.key]
+
+    def eviction_candidates(self, can_evict):
+        """Names to stash so at most max_tabs stay open, least recently used first"""
+        excess = len(self.tabs) - self.max_tabs
+        if excess <= 0:
+            return []
+        order = sorted(self.tabs.values(), key=lambda record: record.last_used)
+        return [record.name for record in order if can_evict(record.name)][:excess]
+
+    def stash_tab(self, name, code, title, language=None, path=None, newline="\n"):
+        """Write a tab to the stash and forget it; returns its stash key"""
+        record = self.tabs.get(name)
+        # Unedited file tabs are stashed without their text and re-read on restore
+        key = (record.key if record else None) or content_key(code or path or "")
+        self.stash.put(key, code, title, language, path, newline)
+        self.remove(name)
+        self.evicted += 1
+        return key
+
+    def report(self, measure):
+        """
+        One line per open tab, largest first. measure(name) returns
+        (title, chars, lines, tag_ranges, built) for a tab.
+        """
+        rows = []
+        now = time.monotonic()
+        for name, record in self.tabs.items():
+            title, chars, lines, tag_ranges, built = measure(name)
+            size = estimate_bytes(chars, lines, tag_ranges) if built else chars
+            rows.append((size, f"{title}: {lines} lines, {chars} chars, {tag_ranges} tag ranges, "
+                               f"~{size / 1024:.0f} KB{'' if built else ' (editor not built)'}, "
+                               f"idle {now - record.last_used:.0f}s"))
+        rows.sort(key=lambda row: -row[0])
+        total = sum(size for size, _ in rows)
+        summary = (f"{len(rows)} open tabs, ~{total / 1024:.0f} KB | "
+                   f"{len(self.stash.entries)} stashed | {self.reused} reused, {self.evicted} evicted")
+        return "\n".join([summary] + [text for _, text in rows])
@@ -0,0 +1,185 @@
+import csv
+import json
+import sys
+import threading
+import time
+
+from .cache import final_fields
+
+NS = 1e9
+
+FIELDS = ["started", "model", "session", "cached", "queue_wait", "ttft", "total",
+          "chunks", "itl_p50", "itl_p90", "itl_p99", "live_tps",
+          "load_duration", "prompt_eval_count", "prompt_eval_duration", "prompt_tps",
+          "eval_count", "eval_duration", "eval_tps"]
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of an unsorted list (None when empty)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(p / 100 * (len(ordered) - 1))))
+    return ordered[rank]
+
+
+class RequestTelemetry:
+    """
+    Timing for one streamed request: queue wait, time to first token,
+    inter-token latency and Ollama's own counters from the final chunk.
+    """
+    def __init__(self, model, session=None):
+        self.model = model
+        self.session = session
+        self.created = time.time()
+        self.submitted = time.perf_counter()
+        self.started = None
+        self.first_token = None
+        self.last_token = None
+        self.finished = None
+        self.gaps = []
+        self.chunks = 0
+        self.cached = False
+        self.final = {}
+
+    def mark_started(self):
+        """The request got a generation slot and was sent to the server"""
+        self.started = time.perf_counter()
+
+    def on_chunk(self, chunk):
+        now = time.perf_counter()
+        message = chunk['message']
+        if message['content'] or message.get('thinking'):
+            if self.first_token is None:
+                self.first_token = now
+            else:
+                self.gaps.append(now - self.last_token)
+            self.last_token = now
+            self.chunks += 1
+        if chunk.get('done'):
+            self.final = final_fields(chunk)
+            self.cached = bool(chunk.get('cached'))
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    @property
+    def ttft(self):
+        if self.first_token is None:
+            return None
+        return self.first_token - (self.started or self.submitted)
+
+    @property
+    def live_tps(self):
+        """Chunks per second since the first token (about tokens/s)"""
+        if self.first_token is None or self.chunks < 2:
+            return None
+        elapsed = self.last_token - self.first_token
+        return (self.chunks - 1) / elapsed if elapsed > 0 else None
+
+    def _rate(self, count, duration):
+        count, duration = self.final.get(count), self.final.get(duration)
+        return count / (duration / NS) if count and duration else None
+
+    def to_dict(self):
+        started = self.started or self.submitted
+        seconds = lambda name: self.final[name] / NS if self.final.get(name) is not None else None
+        return {
+            "started": self.created,
+            "model": self.model,
+            "session": self.session,
+            "cached": self.cached,
+            "queue_wait": started - self.submitted,
+            "ttft": self.ttft,
+            "total": (self.finished - started) if self.finished else None,
+            "chunks": self.chunks,
+            "itl_p50": percentile(self.gaps, 50),
+            "itl_p90": percentile(self.gaps, 90),
+            "itl_p99": percentile(self.gaps, 99),
+            "live_tps": self.live_tps,
+            "load_duration": seconds("load_duration"),
+            "prompt_eval_count": self.final.get("prompt_eval_count"),
+            "prompt_eval_duration": seconds("prompt_eval_duration"),
+            "prompt_tps": self._rate("prompt_eval_count", "prompt_eval_duration"),
+            "eval_count": self.final.get("eval_count"),
+            "eval_duration": seconds("eval_duration"),
+            "eval_tps": self._rate("eval_count", "eval_duration"),
+        }
+
+    def live_text(self):
+        """Short status-bar text while streaming"""
+        parts = []
+        if self.ttft is not None:
+            parts.append(f"TTFT {self.ttft:.2f}s")
+        elif self.started is not None:
+            parts.append(f"waiting {time.perf_counter() - self.started:.1f}s")
+        if self.live_tps:
+            parts.append(f"{self.live_tps:.1f} tok/s")
+        return " | ".join(parts)
+
+    def summary_text(self):
+        data = self.to_dict()
+        parts = []
+        if data["ttft"] is not None:
+            parts.append(f"TTFT {data['ttft']:.2f}s")
+        if data["load_duration"]:
+            parts.append(f"load {data['load_duration']:.2f}s")
+        if data["prompt_eval_count"]:
+            rate = f" @ {data['prompt_tps']:.0f} tok/s" if data["prompt_tps"] else ""
+            parts.append(f"prompt {data['prompt_eval_count']} tok{rate}")
+        if data["eval_tps"]:
+            parts.append(f"decode {data['eval_tps']:.1f} tok/s")
+        if data["itl_p50"] is not None:
+            parts.append(f"ITL p50/p99 {data['itl_p50'] * 1000:.0f}/{data['itl_p99'] * 1000:.0f}ms")
+        return " | ".join(parts)
+
+
+class TelemetryLog:
+    """In-memory list of finished requests with CSV/JSON export"""
+    def __init__(self):
+        self.records = []
+        self._lock = threading.Lock()
+
+    def add(self, telemetry):
+        record = telemetry.to_dict() if isinstance(telemetry, RequestTelemetry) else telemetry
+        with self._lock:
+            self.records.append(record)
+        return record
+
+    def export(self, path):
+        """Write CSV or JSON depending on the file extension"""
+        with self._lock:
+            records = list(self.records)
+        export_records(records, path)
+        return len(records)
+
+
+def export_records(records, path):
+    if path.lower().endswith(".json"):
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(records, file, indent=2)
+        return
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.DictWriter(file, fieldnames=FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(records)
+
+
+def main(argv=None):
+    """Export telemetry persisted in the conversation store"""
+    from .store import ConversationStore
+
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2 or argv[0] != "export":
+        print("usage: python -m gptathome.telemetry export OUT.csv|OUT.json")
+        return 2
+    store = ConversationStore()
+    records = [stats["telemetry"] for stats in store.timing_stats() if "telemetry" in stats]
+    export_records(records, argv[1])
+    store.close()
+    print(f"{len(records)} requests written to {argv[1]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
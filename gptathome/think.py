@@ -0,0 +1,110 @@
+import re
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+# Send reasoning back to the model in chat_history (usually wasted context)
+KEEP_THINKING = False
+
+_THINK_RE = re.compile(r"<think>.*?(?:</think>|$)\s*", re.DOTALL)
+
+
+def strip_think(text):
+    """Remove <think>...</think> segments from a complete response"""
+    return _THINK_RE.sub("", text)
+
+
+def _partial_suffix(text, tag):
+    """Length of the longest suffix of text that is a prefix of tag"""
+    for size in range(min(len(tag) - 1, len(text)), 0, -1):
+        if text.endswith(tag[:size]):
+            return size
+    return 0
+
+
+class ThinkParser:
+    """
+    Streaming splitter for DeepSeek-R1 <think> reasoning.
+
+    feed() returns ("think" | "answer", text) segments for a chunk, holding
+    back only a possibly split tag at the end. Chunks are counted per kind
+    (Ollama streams roughly one token per chunk); finish() can rescale the
+    counts to the server's eval_count.
+    """
+    def __init__(self):
+        self.in_think = False
+        self.think_parts = []
+        self.answer_parts = []
+        self.think_tokens = 0
+        self.answer_tokens = 0
+        self._pending = ""
+
+    @property
+    def thinking(self):
+        return "".join(self.think_parts)
+
+    @property
+    def answer(self):
+        return "".join(self.answer_parts)
+
+    def feed(self, chunk, thinking=None):
+        """Split a chunk; thinking is Ollama's separate message.thinking field"""
+        segments = []
+        if thinking:
+            self._emit(segments, "think", thinking)
+        text = self._pending + chunk
+        self._pending = ""
+        while text:
+            tag = THINK_CLOSE if self.in_think else THINK_OPEN
+            index = text.find(tag)
+            if index >= 0:
+                self._emit(segments, self.kind, text[:index])
+                text = text[index + len(tag):]
+                self.in_think = not self.in_think
+                continue
+            keep = _partial_suffix(text, tag)
+            self._emit(segments, self.kind, text[:len(text) - keep])
+            self._pending = text[len(text) - keep:]
+            break
+        for kind in {kind for kind, _ in segments}:
+            if kind == "think":
+                self.think_tokens += 1
+            else:
+                self.answer_tokens += 1
+        return segments
+
+    @property
+    def kind(self):
+        return "think" if self.in_think else "answer"
+
+    def finish(self, eval_count=None):
+        """Flush held-back text; optionally scale token counts to eval_count"""
+        segments = []
+        if self._pending:
+            self._emit(segments, self.kind, self._pending)
+            self._pending = ""
+        total = self.think_tokens + self.answer_tokens
+        if eval_count and total:
+            self.think_tokens = round(eval_count * self.think_tokens / total)
+            self.answer_tokens = eval_count - self.think_tokens
+        return segments
+
+    def history_content(self, keep_thinking=KEEP_THINKING):
+        """What to store in chat_history for this response"""
+        if keep_thinking and self.think_parts:
+            return f"{THINK_OPEN}{self.thinking}{THINK_CLOSE}\n\n{self.answer}"
+        return self.answer
+
+    def _emit(self, segments, kind, text):
+        if not text:
+            return
+        parts = self.think_parts if kind == "think" else self.answer_parts
+        if not parts:
+            text = text.lstrip()
+            if not text:
+                return
+        parts.append(text)
+        if segments and segments[-1][0] == kind:
+            segments[-1] = (kind, segments[-1][1] + text)
+        else:
+            segments.append((kind, text))
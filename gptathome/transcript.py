@@ -0,0 +1,372 @@
+import itertools
+import re
+import tkinter as tk
+from tkinter import font as tkfont
+
+from .markdown import MarkdownStream, split_lines
+
+# Messages kept in the Text widget; older ones are re-inserted on scroll-back
+MAX_RENDERED = 60
+MAX_RENDERED_CHARS = 200_000
+# Messages materialized per scroll step
+PAGE = 20
+# Code blocks longer than this many lines are echoed behind an expander
+COLLAPSE_LINES = 12
+
+# Tag used for reasoning text, both in pump.put() and in the widget
+THINK_TAG = "think"
+
+# Right-gravity mark used as the running insert position while rendering
+_CURSOR = "transcript_cursor"
+# Prefix of the Markdown tags in the widget
+MD_PREFIX = "md_"
+
+_FENCE_RE = re.compile(r"```[^\n]*\n.*?\n```", re.DOTALL)
+
+
+class TranscriptMessage:
+    _ids = itertools.count(1)
+
+    def __init__(self, role, text, collapse_code):
+        self.id = next(self._ids)
+        self.role = role
+        self.parts = [["text", text]]  # ["text" | "think", str] in stream order
+        self.collapse_code = collapse_code
+        self.expanded = set()          # Indices of code blocks the user expanded
+        self.expanded_think = set()    # Indices of reasoning parts the user opened
+        self.markdown = None           # MarkdownStream while the message is rendered
+
+    @property
+    def line_mark(self):
+        """Start of the Markdown line being streamed"""
+        return f"mdline{self.id}"
+
+    @property
+    def mark(self):
+        return f"msg{self.id}"
+
+    @property
+    def text(self):
+        return "".join(text for kind, text in self.parts if kind == "text")
+
+    @property
+    def thinking(self):
+        return "".join(text for kind, text in self.parts if kind == "think")
+
+    def append(self, kind, text):
+        """Append streamed text; returns True if it started a new part"""
+        if self.parts[-1][0] == kind:
+            self.parts[-1][1] += text
+            return False
+        self.parts.append([kind, text])
+        return True
+
+
+class Transcript:
+    """
+    Message model behind a chat Text widget with a bounded rendered window.
+
+    Only messages[lo:hi] live in the widget. When the window grows past
+    MAX_RENDERED messages (or MAX_RENDERED_CHARS), the oldest are deleted from
+    the widget and re-inserted when the user scrolls back to the top. Long
+    code blocks in echoed prompts are drawn as a clickable expander, and
+    reasoning (text inserted with the THINK_TAG tag) is kept in the model but
+    only drawn when its collapsed header is clicked.
+
+    It also quacks like the widget for TokenPump (insert at END, see, after),
+    so streamed text is appended to the last message.
+
+    With markdown (a style dict such as markdown.STYLES), assistant text is
+    formatted line by line as it streams: headings, bold, inline code and
+    highlighted fences. Markup stays in the widget as elided text.
+    """
+    def __init__(self, widget, max_rendered=MAX_RENDERED, max_chars=MAX_RENDERED_CHARS,
+                 markdown=None):
+        self.widget = widget
+        self.max_rendered = max_rendered
+        self.max_chars = max_chars
+        self.markdown = markdown is not None
+        self._fonts = []
+        if markdown is not None:
+            self._configure_markdown(markdown)
+        self.messages = []
+        self.lo = 0
+        self.hi = 0
+        self._follow = True
+        self._loading = False
+
+        widget.tag_configure("expander", foreground="#58A6FF", underline=True)
+        widget.tag_bind("expander", "<Enter>", lambda e: widget.config(cursor="hand2"))
+        widget.tag_bind("expander", "<Leave>", lambda e: widget.config(cursor=""))
+        widget.tag_configure(THINK_TAG, foreground="#8B949E")
+
+        # Watch the scroll position to materialize evicted messages
+        self._scrollbar = getattr(widget, "vbar", None)
+        widget.config(yscrollcommand=self._on_yscroll)
+
+    # TokenPump interface
+    def after(self, ms, func, *args):
+        return self.widget.after(ms, func, *args)
+
+    def after_cancel(self, after_id):
+        self.widget.after_cancel(after_id)
+
+    def insert(self, index, text, tags=None):
+        """Append streamed text to the last message"""
+        if not self.messages:
+            self.add_message("system", "")
+        message = self.messages[-1]
+        kind = "think" if tags == THINK_TAG else "text"
+        new_part = message.append(kind, text)
+        if self.hi != len(self.messages):
+            return
+        self._follow = self.widget.yview()[1] >= 0.999
+        if kind == "text":
+            self._insert_text(message, tk.END, text, tags)
+            return
+        self._end_markdown_line(message)
+        part_index = len(message.parts) - 1
+        if new_part:
+            self.widget.mark_set(_CURSOR, "end-1c")
+            self.widget.mark_gravity(_CURSOR, tk.RIGHT)
+            self._render_think(message, part_index)
+        else:
+            self._update_think_header(message, part_index)
+            if part_index in message.expanded_think:
+                self.widget.insert(tk.END, text, THINK_TAG)
+
+    def see(self, index):
+        if self._follow and self.hi == len(self.messages):
+            self.widget.see(tk.END)
+
+    # Model
+    def add_message(self, role, text, collapse_code=False):
+        """Start a new message; later insert() calls append to it"""
+        if self.messages:
+            self._end_markdown_line(self.messages[-1])
+        message = TranscriptMessage(role, text, collapse_code)
+        self.messages.append(message)
+        if self.hi == len(self.messages) - 1:
+            self._follow = self.widget.yview()[1] >= 0.999
+            self._render(message)
+            self.hi += 1
+            self._trim_top()
+            if self._follow:
+                self.widget.see(tk.END)
+        return message
+
+    def clear(self):
+        self.widget.delete("1.0", tk.END)
+        self.messages.clear()
+        self.lo = self.hi = 0
+
+    def text(self):
+        return "".join(message.text for message in self.messages)
+
+    # Markdown
+    def _configure_markdown(self, styles):
+        base = tkfont.Font(root=self.widget, font=self.widget.cget("font"))
+        fixed = tkfont.Font(root=self.widget, font="TkFixedFont")
+        for name, options in styles.items():
+            options = dict(options)
+            if "font" in options:
+                # ("bold" | "fixed", scale) relative to the widget's font
+                kind, scale = options["font"]
+                font = (fixed if kind == "fixed" else base).copy()
+                size = font.cget("size")
+                font.configure(size=round(size * scale) if scale != 1.0 else size)
+                if kind == "bold":
+                    font.configure(weight="bold")
+                self._fonts.append(font)
+                options["font"] = font
+            self.widget.tag_configure(MD_PREFIX + name, **options)
+        # Syntax colors win over the fence background tag
+        for name in ("keyword", "string", "comment", "function", "number"):
+            self.widget.tag_raise(MD_PREFIX + name)
+        self.widget.tag_raise(MD_PREFIX + "marker")
+
+    def _insert_text(self, message, index, text, tags=None):
+        """Insert message text at index, tagging each Markdown line once it is complete"""
+        parser = message.markdown
+        if parser is None:
+            self.widget.insert(index, text, tags)
+            return
+        widget = self.widget
+        mark = message.line_mark
+        for piece in split_lines(text):
+            if parser.at_line_start:
+                widget.mark_set(mark, "end-1c" if index == tk.END else index)
+                widget.mark_gravity(mark, tk.LEFT)
+            # Text inside an open fence is shaded before its line is complete
+            piece_tags = tags
+            if parser.in_fence:
+                piece_tags = (tags, MD_PREFIX + "fence") if tags else MD_PREFIX + "fence"
+            widget.insert(index, piece, piece_tags)
+            spans = parser.feed_piece(piece)
+            if spans:
+                self._tag_line(mark, spans)
+
+    def _end_markdown_line(self, message):
+        """Tag a partial line now (before reasoning or at the end of a message)"""
+        parser = message.markdown
+        if parser is not None and not parser.at_line_start:
+            self._tag_line(message.line_mark, parser.end_line())
+
+    def _tag_line(self, mark, spans):
+        for tag, start, end in spans:
+            if end > start:
+                self.widget.tag_add(MD_PREFIX + tag, f"{mark}+{start}c", f"{mark}+{end}c")
+
+    # Rendering
+    def _segments(self, message):
+        """Split a message into (kind, text, index) segments"""
+        segments = []
+        code_index = 0
+        for part_index, (kind, text) in enumerate(message.parts):
+            if kind == "think":
+                segments.append(("think", text, part_index))
+                continue
+            if not message.collapse_code:
+                segments.append(("text", text, None))
+                continue
+            pos = 0
+            for match in _FENCE_RE.finditer(text):
+                segments.append(("text", text[pos:match.start()], None))
+                segments.append(("code", match.group(0), code_index))
+                code_index += 1
+                pos = match.end()
+            segments.append(("text", text[pos:], None))
+        return segments
+
+    def _think_label(self, message, part_index):
+        if part_index in message.expanded_think:
+            return "[▼ Reasoning]\n"
+        size = len(message.parts[part_index][1])
+        size = f"{size / 1000:.1f}k" if size >= 1000 else str(size)
+        return f"[▶ Reasoning, {size} chars]\n"
+
+    def _render_think(self, message, part_index):
+        """Draw a reasoning header at the cursor, and its text only if opened"""
+        tag = f"think{message.id}_{part_index}"
+        self.widget.insert(_CURSOR, self._think_label(message, part_index), ("expander", tag))
+        self.widget.tag_bind(tag, "<Button-1>",
+                             lambda e, m=message, i=part_index: self.toggle_think(m, i))
+        if part_index in message.expanded_think:
+            self.widget.insert(_CURSOR, message.parts[part_index][1], THINK_TAG)
+
+    def _update_think_header(self, message, part_index):
+        tag = f"think{message.id}_{part_index}"
+        ranges = self.widget.tag_ranges(tag)
+        if ranges:
+            start = self.widget.index(ranges[0])
+            self.widget.delete(ranges[0], ranges[1])
+            self.widget.insert(start, self._think_label(message, part_index), ("expander", tag))
+
+    def toggle_think(self, message, part_index):
+        """Open or close a reasoning region (drawn lazily)"""
+        message.expanded_think ^= {part_index}
+        position = self.messages.index(message)
+        if self.lo <= position < self.hi:
+            self._rerender(position)
+
+    def _render(self, message, before=None):
+        """Insert a message at the end, or just before another rendered message"""
+        widget = self.widget
+        start = widget.index(before.mark if before else "end-1c")
+        widget.mark_set(_CURSOR, start)
+        widget.mark_gravity(_CURSOR, tk.RIGHT)
+        widget.mark_set(message.mark, start)
+        widget.mark_gravity(message.mark, tk.LEFT)
+        message.markdown = MarkdownStream() if self.markdown and message.role == "assistant" else None
+        for kind, text, code_index in self._segments(message):
+            if kind == "think":
+                self._end_markdown_line(message)
+                self._render_think(message, code_index)
+                continue
+            if kind == "code":
+                lines = text.count("\n") - 1
+                if lines > COLLAPSE_LINES and code_index not in message.expanded:
+                    tag = f"expand{message.id}_{code_index}"
+                    widget.insert(_CURSOR, f"[▶ show {lines} lines of code]", ("expander", tag))
+                    widget.tag_bind(tag, "<Button-1>",
+                                    lambda e, m=message, i=code_index: self.expand(m, i))
+                    continue
+            if text:
+                self._insert_text(message, _CURSOR, text)
+        if message is not self.messages[-1]:
+            self._end_markdown_line(message)
+        if before:
+            # before's mark stayed left of the new text; move it to its real start
+            widget.mark_set(before.mark, _CURSOR)
+
+    def expand(self, message, code_index):
+        """Replace a collapsed code block with its full text"""
+        message.expanded.add(code_index)
+        position = self.messages.index(message)
+        if self.lo <= position < self.hi:
+            self._rerender(position)
+
+    def _end_of(self, position):
+        if position + 1 < self.hi:
+            return self.messages[position + 1].mark
+        return "end-1c"
+
+    def _rerender(self, position):
+        message = self.messages[position]
+        self.widget.delete(message.mark, self._end_of(position))
+        self.widget.mark_unset(message.mark, message.line_mark)
+        following = self.messages[position + 1] if position + 1 < self.hi else None
+        self._render(message, following)
+
+    def _rendered_chars(self):
+        return sum(len(message.text) for message in self.messages[self.lo:self.hi])
+
+    def _trim_top(self):
+        while self.hi - self.lo > 2 and (
+                self.hi - self.lo > self.max_rendered or self._rendered_chars() > self.max_chars):
+            self._evict(self.lo)
+            self.lo += 1
+
+    def _trim_bottom(self):
+        while self.hi - self.lo > self.max_rendered + PAGE:
+            self.hi -= 1
+            self._evict(self.hi)
+
+    def _evict(self, position):
+        message = self.messages[position]
+        self.widget.delete(message.mark, self._end_of(position))
+        self.widget.mark_unset(message.mark, message.line_mark)
+        message.markdown = None
+        for tag in self.widget.tag_names():
+            if tag.startswith((f"expand{message.id}_", f"think{message.id}_")):
+                self.widget.tag_delete(tag)
+
+    def _on_yscroll(self, first, last):
+        if self._scrollbar is not None:
+            self._scrollbar.set(first, last)
+        if self._loading:
+            return
+        if float(first) <= 0.0 and self.lo > 0:
+            self._loading = True
+            self.widget.after_idle(self._load_older)
+        elif float(last) >= 1.0 and self.hi < len(self.messages):
+            self._loading = True
+            self.widget.after_idle(self._load_newer)
+
+    def _load_older(self):
+        anchor = self.messages[self.lo].mark
+        start = max(0, self.lo - PAGE)
+        for position in range(self.lo - 1, start - 1, -1):
+            self._render(self.messages[position], self.messages[position + 1])
+        self.lo = start
+        self._trim_bottom()
+        self.widget.yview(anchor)
+        self._loading = False
+
+    def _load_newer(self):
+        end = min(len(self.messages), self.hi + PAGE)
+        for position in range(self.hi, end):
+            self._render(self.messages[position])
+        self.hi = end
+        self._trim_top()
+        self._loading = False
@@ -0,0 +1,252 @@
+"""
+Ollama runtime options autotuner.
+
+Runs a fixed benchmark prompt with different num_thread, num_batch and
+num_ctx values, reads prompt-eval and decode tokens/s from Ollama's own
+counters, and saves the best options per model and machine. ContextManager
+loads the saved profile, so every chat request (and the warm-up) uses it.
+
+    python -m gptathome.tuning deepseek-r1:14b
+    python -m gptathome.tuning deepseek-r1:14b --show
+
+Changing these options makes Ollama reload the model, so each setting gets
+one unmeasured warm-up request; only the server-side eval durations are
+compared, never load time.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import threading
+import time
+import uuid
+
+from .cache import final_fields
+
+PROFILE_PATH = os.environ.get("GPTATHOME_TUNING_PROFILES", "tuning_profiles.json")
+# Tokens decoded per trial; fixed so trials compare like with like
+BENCH_PREDICT = 96
+# Decode speed matters most in chat; prompt eval counts for long prompts
+DECODE_WEIGHT = 0.75
+# Another num_ctx replaces the default only if it is this much faster
+CTX_TOLERANCE = 0.05
+# Fraction of the smallest context filled by the prompt of the num_ctx trials
+CTX_FILL = 0.5
+NUM_BATCH_CHOICES = (128, 256, 512, 1024)
+NUM_CTX_CHOICES = (4096, 8192, 16384)
+
+BENCH_PROMPT = """Review this function and suggest one improvement. Answer briefly.
+
+```python
+def merge_intervals(intervals):
+    intervals = sorted(intervals, key=lambda pair: pair[0])
+    merged = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def total_covered(intervals):
+    return sum(end - start for start, end in merge_intervals(intervals))
+
+
+def gaps(intervals, lower, upper):
+    result = []
+    cursor = lower
+    for start, end in merge_intervals(intervals):
+        if start > cursor:
+            result.append((cursor, min(start, upper)))
+        cursor = max(cursor, end)
+        if cursor >= upper:
+            break
+    if cursor < upper:
+        result.append((cursor, upper))
+    return result
+```"""
+
+_lock = threading.Lock()
+
+
+def machine_key():
+    """Identifies the hardware a profile was measured on"""
+    return f"{platform.node()}/{platform.machine()}/{os.cpu_count()}cpu"
+
+
+def thread_choices(cpus=None):
+    """num_thread values to try: around the physical core count, which is usually best"""
+    cpus = cpus or os.cpu_count() or 4
+    physical = max(1, cpus // 2)
+    return sorted({max(1, physical - 2), physical, min(cpus, physical + 2), cpus})
+
+
+def load_profiles(path=PROFILE_PATH):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_profile(model, profile, path=PROFILE_PATH):
+    with _lock:
+        profiles = load_profiles(path)
+        profiles.setdefault(machine_key(), {})[model] = profile
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(profiles, f, indent=2)
+        os.replace(tmp_path, path)
+
+
+def load_profile(model, path=PROFILE_PATH):
+    """Tuned options for model on this machine, or None"""
+    profile = load_profiles(path).get(machine_key(), {}).get(model)
+    return dict(profile["options"]) if profile else None
+
+
+def fill_prompt(tokens):
+    """BENCH_PROMPT with its code repeated until it is about tokens long"""
+    from .context import TokenCounter
+
+    counter = TokenCounter()
+    intro, code = BENCH_PROMPT.split("\n\n", 1)
+    parts = [intro]
+    while counter.count("\n\n".join(parts)) < tokens:
+        parts.append(f"# Module {len(parts)}\n{code}")
+    return "\n\n".join(parts)
+
+
+def score(trial):
+    """Weighted tokens/s of a trial (higher is better)"""
+    if not trial.get("decode_tps"):
+        return 0.0
+    return DECODE_WEIGHT * trial["decode_tps"] + (1 - DECODE_WEIGHT) * (trial.get("prompt_tps") or 0.0)
+
+
+class Autotuner:
+    """
+    Coordinate search over the option grid: num_thread first, then
+    num_batch with the best thread count, then num_ctx. That is about ten
+    settings instead of the full product, each of which reloads the model.
+    """
+    def __init__(self, model, host=None, repeat=2, predict=BENCH_PREDICT, on_trial=None):
+        import ollama
+
+        self.model = model
+        self.client = ollama.Client(host=host)
+        self.repeat = repeat
+        self.predict = predict
+        self.on_trial = on_trial
+        self.trials = []
+
+    def measure(self, options, prompt=BENCH_PROMPT):
+        """Median prompt/decode tokens/s of repeat runs with options (after one warm-up)"""
+        prompt_rates, decode_rates = [], []
+        for run in range(self.repeat + 1):
+            # A unique first line defeats Ollama's prompt (KV) cache reuse
+            messages = [{'role': 'user', 'content': f"Run {uuid.uuid4().hex[:8]}.\n{prompt}"}]
+            final = {}
+            for chunk in self.client.chat(model=self.model, messages=messages, stream=True,
+                                          options=dict(options, num_predict=self.predict,
+                                                       temperature=0, seed=0)):
+                if chunk.get('done'):
+                    final = final_fields(chunk)
+            if run == 0:
+                continue  # Model (re)load and cold caches
+            if final.get('prompt_eval_count') and final.get('prompt_eval_duration'):
+                prompt_rates.append(final['prompt_eval_count'] / (final['prompt_eval_duration'] / 1e9))
+            if final.get('eval_count') and final.get('eval_duration'):
+                decode_rates.append(final['eval_count'] / (final['eval_duration'] / 1e9))
+        trial = {
+            "options": dict(options),
+            "prompt_tps": statistics.median(prompt_rates) if prompt_rates else None,
+            "decode_tps": statistics.median(decode_rates) if decode_rates else None,
+        }
+        self.trials.append(trial)
+        if self.on_trial:
+            self.on_trial(trial)
+        return trial
+
+    def _best(self, base, name, choices):
+        trials = [self.measure(dict(base, **{name: value})) for value in choices]
+        return max(trials, key=score)
+
+    def run(self, threads=None, batches=NUM_BATCH_CHOICES, contexts=NUM_CTX_CHOICES, num_ctx=None):
+        """
+        Returns the profile of the best options found. num_ctx is the
+        context the chats need (default: ContextManager's); it is kept
+        unless another value is clearly faster with a prompt that actually
+        fills the context. A larger context only costs memory, so it is never
+        chosen just for being about as fast.
+        """
+        from .context import NUM_CTX
+
+        num_ctx = num_ctx or NUM_CTX
+        best = self._best({"num_ctx": num_ctx}, "num_thread", threads or thread_choices())
+        best = self._best(best["options"], "num_batch", batches)
+        contexts = sorted(set(contexts) | {num_ctx})
+        prompt = fill_prompt(int(min(contexts) * CTX_FILL))
+        by_ctx = [self.measure(dict(best["options"], num_ctx=value), prompt) for value in contexts]
+        best = next(trial for trial in by_ctx if trial["options"]["num_ctx"] == num_ctx)
+        faster = [trial for trial in by_ctx if score(trial) > score(best) * (1 + CTX_TOLERANCE)]
+        if faster:
+            best = max(faster, key=score)
+        return {
+            "options": best["options"],
+            "prompt_tps": best["prompt_tps"],
+            "decode_tps": best["decode_tps"],
+            "tuned": time.time(),
+            "trials": self.trials,
+        }
+
+
+def format_trial(trial):
+    options = " ".join(f"{name}={value}" for name, value in sorted(trial["options"].items()))
+    prompt = f"{trial['prompt_tps']:.1f}" if trial.get("prompt_tps") else "-"
+    decode = f"{trial['decode_tps']:.1f}" if trial.get("decode_tps") else "-"
+    return f"{options:48} prompt {prompt:>7} tok/s  decode {decode:>6} tok/s"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Find the fastest Ollama options for a model on this machine")
+    parser.add_argument("model")
+    parser.add_argument("--host", help="Ollama host (default: OLLAMA_HOST)")
+    parser.add_argument("--repeat", type=int, default=2, help="measured runs per setting")
+    parser.add_argument("--threads", type=int, nargs="+", help="num_thread values (default: around the core count)")
+    parser.add_argument("--batches", type=int, nargs="+", default=NUM_BATCH_CHOICES)
+    parser.add_argument("--contexts", type=int, nargs="+", default=NUM_CTX_CHOICES)
+    parser.add_argument("--num-ctx", type=int, help="context size the chats need (default: 8192)")
+    parser.add_argument("--num-predict", type=int, help="also cap replies at this many tokens")
+    parser.add_argument("--show", action="store_true", help="print the saved profile and exit")
+    args = parser.parse_args(argv)
+
+    if args.show:
+        profile = load_profiles().get(machine_key(), {}).get(args.model)
+        if not profile:
+            print(f"No profile for {args.model} on {machine_key()}")
+            return 1
+        print(format_trial(profile))
+        return 0
+
+    tuner = Autotuner(args.model, args.host, args.repeat, on_trial=lambda trial: print(format_trial(trial)))
+    try:
+        profile = tuner.run(args.threads, args.batches, args.contexts, args.num_ctx)
+    except KeyboardInterrupt:
+        print("Interrupted; no profile saved")
+        return 130
+    if not profile["decode_tps"]:
+        print("No timings returned by the server; no profile saved")
+        return 1
+    if args.num_predict:
+        profile["options"]["num_predict"] = args.num_predict
+    save_profile(args.model, profile)
+    print(f"Best for {args.model} on {machine_key()}:\n{format_trial(profile)}\nSaved to {PROFILE_PATH}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
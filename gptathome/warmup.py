@@ -0,0 +1,105 @@
+import threading
+import time
+
+# How long Ollama keeps the model loaded after the last request
+KEEP_ALIVE = "30m"
+# Seconds between keep-alive pings while the app is open
+HEARTBEAT_INTERVAL = 240
+
+STATUS_TEXT = {
+    "idle": "",
+    "loading": "Loading model {model}...",
+    "ready": "Model {model} ready",
+    "error": "Model {model} failed to load: {error}",
+}
+
+
+class ModelWarmer:
+    """
+    Preloads a model on a background thread and keeps it resident.
+
+    An empty generate request makes Ollama load the weights without decoding
+    anything. The same request is repeated as a heartbeat so the server does
+    not unload the model while the app is idle.
+    """
+    def __init__(self, model, keep_alive=KEEP_ALIVE, heartbeat=HEARTBEAT_INTERVAL,
+                 on_status=None, status_text=None, options=None):
+        self.model = model
+        # Load-time options (num_ctx, num_thread, ...) must match the chat
+        # requests, or the first request reloads the model
+        self.options = options
+        self.keep_alive = keep_alive
+        self.heartbeat = heartbeat
+        self.on_status = on_status
+        self.status_text = status_text or STATUS_TEXT
+
+        self.state = "idle"
+        self.error = None
+        self.load_seconds = None
+        self._last_activity = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def touch(self):
+        """Record a real request; it refreshes keep_alive on its own"""
+        self._last_activity = time.monotonic()
+
+    def switch_model(self, model, options=None):
+        """Warm a different model (the heartbeat follows it)"""
+        self.model = model
+        self.options = options
+        threading.Thread(target=self._load, daemon=True).start()
+
+    def describe(self):
+        template = self.status_text.get(self.state, "")
+        text = template.format(model=self.model, error=self.error)
+        if self.state == "ready" and self.load_seconds is not None:
+            text += f" ({self.load_seconds:.1f}s)"
+        return text
+
+    def _set_state(self, state):
+        self.state = state
+        if self.on_status:
+            self.on_status(self.describe())
+
+    def _ping(self):
+        import ollama
+        return ollama.generate(model=self.model, prompt="", keep_alive=self.keep_alive,
+                               options=self.options)
+
+    def _load(self):
+        self._set_state("loading")
+        start = time.perf_counter()
+        try:
+            self._ping()
+        except Exception as e:
+            self.error = e
+            self._set_state("error")
+            return False
+        self.load_seconds = time.perf_counter() - start
+        self._last_activity = time.monotonic()
+        self._set_state("ready")
+        return True
+
+    def _run(self):
+        self._load()
+        while not self._stop.wait(self.heartbeat):
+            if time.monotonic() - self._last_activity < self.heartbeat:
+                continue
+            if self.state != "ready":
+                self._load()
+                continue
+            try:
+                self._ping()
+                self._last_activity = time.monotonic()
+            except Exception as e:
+                self.error = e
+                self._set_state("error")
@@ -0,0 +1,358 @@
+"""
+Symbol and chunk index of a project directory.
+
+Python files are split with ast into functions, classes (large classes into
+their methods) and module-level code; other text files into line windows.
+refresh() only re-reads files whose mtime or size changed, re-parses only
+those whose content hash changed, and does the parsing in a process pool.
+Per prompt, the best scoring chunks that fit a token budget are sent instead
+of whole files.
+
+    python -m gptathome.workspace PROJECT_DIR "query words"
+"""
+import ast
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+import threading
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+# Tokens of workspace code allowed per request
+WORKSPACE_TOKENS = 2048
+SOURCE_EXTENSIONS = {".py", ".pyw", ".js", ".ts", ".c", ".h", ".cpp", ".java", ".go", ".rs",
+                     ".md", ".txt", ".toml", ".cfg", ".ini", ".json", ".yaml", ".yml"}
+SKIP_DIRS = {".git", ".hg", ".svn", "__pycache__", "node_modules", ".venv", "venv", "env",
+             "build", "dist", ".mypy_cache", ".pytest_cache", ".tox"}
+MAX_FILE_BYTES = 1_000_000
+# Classes longer than this are indexed method by method
+MAX_CHUNK_LINES = 80
+# Line window for files that are not (valid) Python
+WINDOW_LINES = 60
+# Files per process pool task; smaller refreshes are parsed in the thread
+FILES_PER_TASK = 16
+
+_WORD_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_SPLIT_RE = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+
+def terms(text):
+    """Identifier words of text, split on snake_case and camelCase, lowercased"""
+    words = []
+    for word in _WORD_RE.findall(text):
+        lower = word.lower()
+        words.append(lower)
+        parts = _SPLIT_RE.findall(word)
+        if len(parts) > 1:
+            words.extend(part.lower() for part in parts)
+    return words
+
+
+def _chunk(path, kind, name, lines, start, end):
+    return {"path": path, "kind": kind, "name": name, "start": start, "end": end,
+            "text": "\n".join(lines[start - 1:end])}
+
+
+def python_chunks(path, source):
+    """Chunks of a Python file; raises SyntaxError for invalid code"""
+    tree = ast.parse(source)
+    lines = source.splitlines()
+    chunks = []
+    runs = []    # [start, end] of consecutive top-level statements between definitions
+    run = None
+    for node in tree.body:
+        start = min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])])
+        end = node.end_lineno
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            run = None
+            chunks.append(_chunk(path, "function", node.name, lines, start, end))
+        elif isinstance(node, ast.ClassDef):
+            run = None
+            methods = [n for n in node.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))]
+            if end - start < MAX_CHUNK_LINES or not methods:
+                chunks.append(_chunk(path, "class", node.name, lines, start, end))
+                continue
+            first = min([methods[0].lineno] + [d.lineno for d in methods[0].decorator_list])
+            chunks.append(_chunk(path, "class", node.name, lines, start, first - 1))
+            for method in methods:
+                method_start = min([method.lineno] + [d.lineno for d in method.decorator_list])
+                chunks.append(_chunk(path, "method", f"{node.name}.{method.name}", lines,
+                                     method_start, method.end_lineno))
+        elif run is None:
+            # Imports and constants before the first definition also take the
+            # comments above them; later runs are e.g. a __main__ block
+            run = [1 if not chunks else start, end]
+            runs.append(run)
+        else:
+            run[1] = end
+    name = os.path.basename(path)
+    for start, end in runs:
+        chunks.append(_chunk(path, "module", name if start == 1 else f"{name}:{start}", lines, start, end))
+    chunks.sort(key=lambda chunk: chunk["start"])
+    return chunks
+
+
+def text_chunks(path, source):
+    lines = source.splitlines()
+    return [_chunk(path, "text", f"{os.path.basename(path)}:{start}", lines, start,
+                   min(len(lines), start + WINDOW_LINES - 1))
+            for start in range(1, len(lines) + 1, WINDOW_LINES)]
+
+
+def index_file(path, rel_path):
+    """(content hash, chunks) of one file; runs in a worker process"""
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha1(data).hexdigest()
+    source = data.decode("utf-8", errors="replace")
+    if rel_path.endswith((".py", ".pyw")):
+        try:
+            return digest, python_chunks(rel_path, source)
+        except (SyntaxError, ValueError):
+            pass
+    return digest, text_chunks(rel_path, source)
+
+
+def chunk_terms(chunk):
+    """Term counts of a chunk for scoring"""
+    counts = Counter(terms(chunk["text"]))
+    # Names and paths count extra: they say what the chunk is
+    for word in terms(chunk["name"]) + terms(chunk["path"]):
+        counts[word] += 3
+    return counts
+
+
+def index_files(batch):
+    """
+    (hash, chunks, term counts per chunk) for a batch of (path, rel_path,
+    old hash); unchanged files return None
+    """
+    results = []
+    for path, rel_path, old_hash in batch:
+        try:
+            with open(path, "rb") as f:
+                digest = hashlib.sha1(f.read()).hexdigest()
+            if digest == old_hash:
+                results.append(None)
+                continue
+            digest, chunks = index_file(path, rel_path)
+            results.append((digest, chunks, [chunk_terms(chunk) for chunk in chunks]))
+        except OSError:
+            results.append(("", [], []))
+    return results
+
+
+class WorkspaceIndex:
+    """
+    Incremental chunk index of one directory.
+
+    files maps a relative path to {"mtime", "size", "hash", "chunks"}; it is
+    saved next to the app so the next start only re-checks changed files.
+    """
+    def __init__(self, root, cache_path=None):
+        self.root = os.path.abspath(root)
+        key = hashlib.sha1(self.root.encode()).hexdigest()[:12]
+        self.cache_path = cache_path or f"workspace_{key}.json"
+        self.files = {}
+        self.chunks = []
+        self.ready = False
+        self.tokens = WORKSPACE_TOKENS
+        self._df = Counter()
+        self._chunk_terms = []
+        self._file_terms = {}  # rel_path -> term counts of each of its chunks
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("root") == self.root:
+            self.files = data["files"]  # Scored once the first refresh() has run
+
+    def save(self):
+        with self._lock:
+            data = {"root": self.root, "files": self.files}
+        with open(self.cache_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+    def scan(self):
+        """(rel_path, mtime, size) of every indexable file"""
+        found = []
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS and not d.startswith(".")]
+            for name in filenames:
+                if os.path.splitext(name)[1].lower() not in SOURCE_EXTENSIONS:
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if stat.st_size <= MAX_FILE_BYTES:
+                    found.append((os.path.relpath(path, self.root), stat.st_mtime, stat.st_size))
+        return found
+
+    def refresh(self, executor=None, on_progress=None):
+        """
+        Bring the index up to date; returns the number of re-parsed files.
+
+        Files with a new mtime or size are hashed and re-parsed in executor
+        (a ProcessPoolExecutor is created for large refreshes when None).
+        """
+        found = self.scan()
+        current = {rel: (mtime, size) for rel, mtime, size in found}
+        changed = []
+        for rel, (mtime, size) in current.items():
+            entry = self.files.get(rel)
+            if entry is None or entry["mtime"] != mtime or entry["size"] != size:
+                changed.append((os.path.join(self.root, rel), rel,
+                                entry["hash"] if entry else None))
+        removed = [rel for rel in self.files if rel not in current]
+
+        batches = [changed[i:i + FILES_PER_TASK] for i in range(0, len(changed), FILES_PER_TASK)]
+        own_executor = executor is None and len(batches) > 1
+        if own_executor:
+            executor = ProcessPoolExecutor()
+        try:
+            if executor is not None and len(batches) > 1:
+                results = executor.map(index_files, batches)
+            else:
+                results = map(index_files, batches)
+            reparsed = 0
+            done = 0
+            updates = {}
+            new_terms = {}
+            for batch, batch_results in zip(batches, results):
+                for (path, rel, old_hash), result in zip(batch, batch_results):
+                    mtime, size = current[rel]
+                    if result is None:
+                        updates[rel] = dict(self.files[rel], mtime=mtime, size=size)
+                    else:
+                        digest, chunks, new_terms[rel] = result
+                        updates[rel] = {"mtime": mtime, "size": size, "hash": digest, "chunks": chunks}
+                        reparsed += 1
+                done += len(batch)
+                if on_progress:
+                    on_progress(done, len(changed))
+        finally:
+            if own_executor:
+                executor.shutdown()
+
+        with self._lock:
+            for rel in removed:
+                del self.files[rel]
+            self.files.update(updates)
+        if changed or removed or not self.ready:
+            self._rebuild(removed, new_terms)
+        if changed or removed:
+            try:
+                self.save()
+            except OSError as e:
+                print(f"Saving workspace index failed: {e}")
+        self.ready = True
+        return reparsed
+
+    def _rebuild(self, removed=(), new_terms=None):
+        """
+        Swap the term counts of removed and re-parsed files (new_terms, from
+        the workers) into the document frequencies and rebuild the chunk list.
+        Only files loaded from the saved index are scored here, once.
+        """
+        new_terms = dict(new_terms or {})
+        with self._lock:
+            files = dict(self.files)
+        file_terms = dict(self._file_terms)
+        for rel, entry in files.items():
+            if rel not in file_terms and rel not in new_terms:
+                new_terms[rel] = [chunk_terms(chunk) for chunk in entry["chunks"]]
+        df = Counter(self._df)
+        for rel in list(removed) + list(new_terms):
+            for counts in file_terms.pop(rel, ()):
+                df.subtract(counts.keys())
+        for rel, counts_list in new_terms.items():
+            file_terms[rel] = counts_list
+            for counts in counts_list:
+                df.update(counts.keys())
+        chunks = []
+        terms_list = []
+        for rel in sorted(files):
+            chunks.extend(files[rel]["chunks"])
+            terms_list.extend(file_terms[rel])
+        with self._lock:
+            self.chunks, self._chunk_terms, self._df = chunks, terms_list, +df
+            self._file_terms = file_terms
+
+    def search(self, query, limit=20):
+        """(score, chunk) pairs for query, best first (BM25-style scoring)"""
+        with self._lock:
+            chunks, chunk_terms, df = self.chunks, self._chunk_terms, self._df
+        query_terms = set(terms(query))
+        if not chunks or not query_terms:
+            return []
+        total = len(chunks)
+        idf = {t: math.log(1 + (total - df[t] + 0.5) / (df[t] + 0.5)) for t in query_terms if df[t]}
+        average = sum(sum(c.values()) for c in chunk_terms) / total
+        scored = []
+        for chunk, counts in zip(chunks, chunk_terms):
+            length = sum(counts.values())
+            score = 0.0
+            for term, weight in idf.items():
+                tf = counts.get(term)
+                if tf:
+                    score += weight * tf * 2.2 / (tf + 1.2 * (0.25 + 0.75 * length / average))
+            if score > 0:
+                scored.append((score, chunk))
+        scored.sort(key=lambda item: -item[0])
+        return scored[:limit]
+
+    def render(self, chunk):
+        language = "python" if chunk["path"].endswith((".py", ".pyw")) else ""
+        return (f"# {chunk['path']}:{chunk['start']}-{chunk['end']} ({chunk['name']})\n"
+                f"```{language}\n{chunk['text']}\n```")
+
+    def context_message(self, query, budget, counter, model=None, exclude=()):
+        """A system message with the best chunks that fit budget tokens, or None"""
+        if not self.ready or budget <= 0:
+            return None
+        header = f"Relevant code from the workspace {os.path.basename(self.root)}:"
+        used = counter.count(header, model)
+        parts = []
+        for score, chunk in self.search(query):
+            if any(chunk["text"].strip() and chunk["text"].strip() in text for text in exclude):
+                continue  # Already in the conversation (e.g. the open tab)
+            part = self.render(chunk)
+            cost = counter.count(part, model)
+            if used + cost > budget:
+                continue
+            parts.append(part)
+            used += cost
+        if not parts:
+            return None
+        return {'role': 'system', 'content': header + "\n\n" + "\n\n".join(parts)}
+
+
+def main(argv=None):
+    from .context import TokenCounter
+
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) < 2:
+        print("usage: python -m gptathome.workspace PROJECT_DIR QUERY...")
+        return 2
+    index = WorkspaceIndex(argv[0])
+    reparsed = index.refresh(on_progress=lambda done, total: print(f"\rIndexing {done}/{total}", end=""))
+    print(f"\n{len(index.files)} files, {len(index.chunks)} chunks ({reparsed} re-parsed)")
+    message = index.context_message(" ".join(argv[1:]), WORKSPACE_TOKENS, TokenCounter())
+    print(message['content'] if message else "No matching code")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from gptathome.backend import ChatRequest, OllamaBackend
+from gptathome.scheduler import RequestScheduler
+
+
+class FakeClient:
+    """Streams one chunk per word, with a short pause before each"""
+    def __init__(self):
+        self.calls = 0
+        self._client = self
+
+    async def aclose(self):
+        pass
+
+    async def chat(self, stream=True, messages=None, **kwargs):
+        self.calls += 1
+
+        async def chunks():
+            for word in "one two three four five".split():
+                await asyncio.sleep(0.02)
+                yield {'message': {'role': 'assistant', 'content': word + " "}, 'done': False}
+            yield {'message': {'role': 'assistant', 'content': ''}, 'done': True, 'eval_count': 5}
+        return chunks()
+
+
+@pytest.fixture
+def backend():
+    backend = OllamaBackend()
+    backend._client = FakeClient()
+    yield backend
+    backend.close()
+
+
+def run(backend, **kwargs):
+    done = []
+    chunks = []
+    request = backend.chat(model="m", messages=[{'role': 'user', 'content': "hi"}],
+                           on_chunk=lambda chunk: chunks.append(chunk['message']['content']),
+                           on_done=done.append, **kwargs)
+    return request, chunks, done
+
+
+def block_loop(backend):
+    """Keep the backend loop busy until the returned event is set"""
+    release = threading.Event()
+    backend.loop.call_soon_threadsafe(release.wait)
+    return release
+
+
+def test_stream_completes(backend):
+    request, chunks, done = run(backend)
+    request.wait(5)
+    assert "".join(chunks) == "one two three four five "
+    assert done == [request] and not request.cancelled and request.final_chunk['done']
+
+
+def test_cancel_mid_stream(backend):
+    request, chunks, done = run(backend)
+    time.sleep(0.05)
+    request.cancel()
+    request.wait(5)
+    assert done == [request] and request.cancelled
+    assert len(chunks) < 6
+
+
+def test_cancel_before_first_step_still_finishes(backend):
+    release = block_loop(backend)
+    request, chunks, done = run(backend)
+    request.cancel()
+    release.set()
+    request.wait(5)
+    time.sleep(0.05)
+    assert done == [request] and request.cancelled
+    assert chunks == [] and backend.client.calls == 0
+
+
+def test_cancel_before_start_is_not_lost(backend):
+    done = []
+    request = ChatRequest({'model': "m", 'messages': []}, on_done=done.append)
+    request.cancel()  # Not queued and not started: only the flag is set
+    backend.start(request)
+    request.wait(5)
+    time.sleep(0.05)
+    assert done == [request] and request.cancelled
+    assert backend.client.calls == 0
+
+
+def test_scheduler_cancel_while_queued(backend):
+    scheduler = RequestScheduler(backend, max_parallel=1)
+    done = []
+    first = scheduler.submit(model="m", messages=[], on_done=done.append)
+    second = scheduler.submit(model="m", messages=[], on_done=done.append)
+    assert second.state == "queued"
+    second.cancel()
+    first.wait(5)
+    assert done == [second, first]
+    assert backend.client.calls == 1
@@ -0,0 +1,99 @@
+import json
+
+import pytest
+
+from gptathome.batch import BatchRunner, load_finished, load_jobs
+
+
+@pytest.fixture(autouse=True)
+def no_tuned_profile(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+
+class FakeClient:
+    """Answers "<think>..</think>re: PROMPT"; prompts in fail raise once"""
+    def __init__(self, fail=()):
+        self.prompts = []
+        self.requests = []
+        self.fail = set(fail)
+        self._client = self
+
+    async def aclose(self):
+        pass
+
+    async def chat(self, stream=True, messages=None, **kwargs):
+        prompt = messages[-1]['content']
+        self.prompts.append(prompt)
+        self.requests.append(messages)
+        if prompt in self.fail:
+            self.fail.discard(prompt)
+            raise ConnectionError("server went away")
+
+        async def chunks():
+            for text in ("<think>hmm</think>", f"re: {prompt}"):
+                yield {'message': {'role': 'assistant', 'content': text}, 'done': False}
+            yield {'message': {'role': 'assistant', 'content': ''}, 'done': True, 'eval_count': 2}
+        return chunks()
+
+
+def write_jobs(path, items):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("# comment\n\n")
+        for item in items:
+            f.write(json.dumps(item) + "\n")
+
+
+def run(jobs, output, client):
+    runner = BatchRunner(str(output), "m", concurrency=2)
+    runner.backend._client = client
+    try:
+        runner.run(jobs, load_finished(str(output)))
+    finally:
+        runner.close()
+    return runner
+
+
+def test_load_jobs_formats(tmp_path):
+    path = tmp_path / "in.jsonl"
+    write_jobs(path, ["bare", {"id": "c", "turns": ["a", "b"], "system": "s", "model": "x"},
+                      {"messages": [{'role': 'user', 'content': "u1"},
+                                    {'role': 'assistant', 'content': "a1"},
+                                    {'role': 'user', 'content': "u2"}]}])
+    jobs = load_jobs(str(path))
+    assert [job["id"] for job in jobs] == ["line-3", "c", "line-5"]
+    assert jobs[0]["turns"] == ["bare"]
+    assert jobs[1]["history"] == [{'role': 'system', 'content': "s"}] and jobs[1]["model"] == "x"
+    assert jobs[2]["turns"] == ["u2"] and len(jobs[2]["history"]) == 2
+
+
+def test_failed_turns_are_resumed_with_finished_history(tmp_path):
+    path, output = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_jobs(path, [{"id": "q", "prompt": "one"}, {"id": "c", "turns": ["t0", "t1", "t2"]}])
+    jobs = load_jobs(str(path))
+
+    first = run(jobs, output, FakeClient(fail={"t1"}))
+    assert (first.written, first.failed) == (3, 1)
+    finished = load_finished(str(output))
+    assert set(finished) == {("q", 0), ("c", 0)}
+    assert finished[("c", 0)]["answer"] == "re: t0"
+    assert finished[("c", 0)]["thinking"] == "hmm"
+
+    # Only the failed turn and the ones after it run again
+    client = FakeClient()
+    second = run(load_jobs(str(path)), output, client)
+    assert client.prompts == ["t1", "t2"]
+    assert [m['content'] for m in client.requests[0]] == ["t0", "re: t0", "t1"]
+    assert (second.written, second.failed) == (2, 0)
+    assert set(load_finished(str(output))) == {("q", 0), ("c", 0), ("c", 1), ("c", 2)}
+
+    # Everything is done: nothing is sent
+    client = FakeClient()
+    run(load_jobs(str(path)), output, client)
+    assert client.prompts == []
+
+
+def test_partial_lines_are_ignored(tmp_path):
+    output = tmp_path / "out.jsonl"
+    output.write_text('{"id": "a", "turn": 0, "status": "ok", "answer": "x"}\n{"id": "b", "tu',
+                      encoding="utf-8")
+    assert set(load_finished(str(output))) == {("a", 0)}
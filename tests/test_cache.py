@@ -0,0 +1,59 @@
+import threading
+import time
+
+from gptathome.cache import ResponseCache, final_fields
+
+MESSAGES = [{'role': 'user', 'content': "hello"}]
+DETERMINISTIC = {'temperature': 0}
+
+
+def make_cache(tmp_path, **kwargs):
+    return ResponseCache(str(tmp_path / "cache.db"), **kwargs)
+
+
+def test_only_deterministic_requests_are_cached(tmp_path):
+    cache = make_cache(tmp_path)
+    assert cache.lookup("m", MESSAGES) == (None, None)
+    assert cache.lookup("m", MESSAGES, {'temperature': 0.7}) == (None, None)
+    key, entry = cache.lookup("m", MESSAGES, DETERMINISTIC)
+    assert key and entry is None
+    assert (cache.hits, cache.misses, cache.bypassed) == (0, 1, 2)
+
+
+def test_round_trip_and_normalized_keys(tmp_path):
+    cache = make_cache(tmp_path)
+    key, _ = cache.lookup("m", MESSAGES, DETERMINISTIC)
+    cache.put(key, "m", ["hel", "lo"], {'eval_count': 2})
+    noisy = [{'role': 'user', 'content': "hello  \r\n", 'images': None}]
+    assert cache.lookup("m", noisy, DETERMINISTIC)[1] == {'chunks': ["hel", "lo"], 'final': {'eval_count': 2}}
+    assert cache.lookup("other", MESSAGES, DETERMINISTIC)[1] is None
+    assert cache.lookup("m", MESSAGES, dict(DETERMINISTIC, num_ctx=4096))[1] is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = make_cache(tmp_path, max_entries=2)
+    keys = []
+    for text in ("a", "b", "c"):
+        key, _ = cache.lookup("m", [{'role': 'user', 'content': text}], DETERMINISTIC)
+        cache.put(key, "m", [text])
+        keys.append(key)
+        time.sleep(0.02)  # Distinct last_used times on coarse clocks
+        if text == "b":
+            cache.get(keys[0])  # "a" is now more recent than "b"
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[2]) is not None
+
+
+def test_usable_from_other_threads(tmp_path):
+    cache = make_cache(tmp_path)
+    key, _ = cache.lookup("m", MESSAGES, DETERMINISTIC)
+    thread = threading.Thread(target=cache.put, args=(key, "m", ["x"]))
+    thread.start()
+    thread.join()
+    assert cache.get(key)['chunks'] == ["x"]
+
+
+def test_final_fields():
+    chunk = {'done': True, 'eval_count': 5, 'message': {}, 'load_duration': None}
+    assert final_fields(chunk) == {'eval_count': 5}
@@ -0,0 +1,66 @@
+import types
+
+import pytest
+
+from gptathome.chat import ChatTurn
+from gptathome.context import ContextManager
+
+
+@pytest.fixture(autouse=True)
+def no_tuned_profile(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+
+def chunk(content, done=False, **extra):
+    return dict({'message': {'role': 'assistant', 'content': content}, 'done': done}, **extra)
+
+
+def run(turn, contents):
+    segments = []
+    for i, content in enumerate(contents):
+        segments += turn.feed(chunk(content, done=i == len(contents) - 1, eval_count=len(contents)))
+    request = types.SimpleNamespace(final_chunk=chunk("", True, eval_count=len(contents)))
+    segments += turn.finish(request)
+    return segments
+
+
+def new_turn(**kwargs):
+    context = ContextManager("m", num_ctx=8192, summarize=False)
+    history = [{'role': 'system', 'content': "Be brief."}, {'role': 'user', 'content': "Hi?"}]
+    return ChatTurn("m", context, history, **kwargs)
+
+
+def test_turn_splits_reasoning_and_answer():
+    turn = new_turn()
+    assert turn.prompt == "Hi?"
+    assert [m['content'] for m in turn.messages] == ["Be brief.", "Hi?"]
+    segments = run(turn, ["<thi", "nk>hmm</th", "ink>Hel", "lo"])
+    assert "".join(text for kind, text in segments if kind == "think") == "hmm"
+    assert "".join(text for kind, text in segments if kind == "answer") == "Hello"
+    assert turn.response == "<think>hmm</think>Hello"
+    assert turn.elapsed is not None
+
+
+def test_history_entry_drops_thinking_by_default():
+    turn = new_turn()
+    run(turn, ["<think>hmm</think>", "Hello"])
+    assert turn.history_entry() == {'role': 'assistant', 'content': "Hello"}
+    assert "hmm" in turn.history_entry(keep_thinking=True)['content']
+
+
+def test_keep_thinking_is_fixed_when_the_turn_is_built():
+    turn = new_turn(keep_thinking=True)
+    run(turn, ["<think>hmm</think>", "Hello"])
+    assert "hmm" in turn.history_entry()['content']
+    assert turn.history_entry(keep_thinking=False)['content'] == "Hello"
+
+
+def test_stats_and_retarget():
+    turn = new_turn(session="s")
+    turn.retarget("bigger")
+    run(turn, ["<think>a</think>", "b"])
+    assert turn.model == "bigger" and turn.telemetry.model == "bigger"
+    assert turn.telemetry.session == "s"
+    stats = turn.stats()
+    assert stats['context_tokens'] == turn.context_stats.sent_tokens
+    assert stats['think_tokens'] + stats['answer_tokens'] == 2
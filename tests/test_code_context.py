@@ -0,0 +1,54 @@
+from gptathome.code_context import CodeContextTracker
+
+CODE = "\n".join(f"def f{i}():\n    return {i}\n" for i in range(30))
+
+
+def send(tracker, history, code, window_start=0):
+    text = tracker.render("tab", "main.py", code, history, window_start)
+    history.append({'role': 'user', 'content': "question\n\n" + text})
+    history.append({'role': 'assistant', 'content': "ok"})
+    return text
+
+
+def test_first_turn_sends_full_code_then_unchanged_note():
+    tracker = CodeContextTracker()
+    history = []
+    assert send(tracker, history, CODE).startswith("Current code (main.py v1):\n```python\n")
+    assert send(tracker, history, CODE) == "Current code (main.py): unchanged since version 1."
+
+
+def test_small_edit_sends_diff():
+    tracker = CodeContextTracker()
+    history = []
+    send(tracker, history, CODE)
+    text = send(tracker, history, CODE.replace("return 7", "return 70"))
+    assert text.startswith("Changes to main.py since the previous version:\n```diff\n")
+    assert "-    return 7\n+    return 70" in text
+    assert "def f20" not in text
+
+
+def test_rewrite_sends_full_copy_and_collapses_old_ones():
+    tracker = CodeContextTracker()
+    history = []
+    send(tracker, history, CODE)
+    send(tracker, history, CODE.replace("return 7", "return 70"))
+    text = send(tracker, history, "print('rewritten')\n")
+    assert text.startswith("Current code (main.py v3):")
+    assert history[0]['content'] == "question\n\n[Earlier copy of main.py, superseded by v3 below]"
+    assert history[2]['content'] == "question\n\n[Earlier copy of main.py, superseded by v3 below]"
+
+
+def test_full_copy_resent_once_base_leaves_the_window():
+    tracker = CodeContextTracker()
+    history = []
+    send(tracker, history, CODE)
+    text = send(tracker, history, CODE, window_start=2)
+    assert text.startswith("Current code (main.py v2):")
+
+
+def test_full_text_is_what_a_full_copy_sends():
+    tracker = CodeContextTracker()
+    history = []
+    assert tracker.full_text("tab", "main.py", CODE) == send(tracker, history, CODE)
+    assert tracker.full_text("tab", "main.py", CODE).startswith("Current code (main.py v2):")
+    assert len(tracker.tabs["tab"].messages) == 1
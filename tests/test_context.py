@@ -0,0 +1,112 @@
+import pytest
+
+from gptathome.context import ContextManager, TokenCounter
+
+
+@pytest.fixture(autouse=True)
+def no_tuned_profile(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+
+def history(turns, words=50):
+    messages = [{'role': 'system', 'content': "You are helpful."}]
+    for i in range(turns):
+        messages.append({'role': 'user', 'content': f"question {i} " + "word " * words})
+        messages.append({'role': 'assistant', 'content': f"answer {i} " + "word " * words})
+    return messages
+
+
+def test_everything_fits():
+    context = ContextManager("m", num_ctx=8192, summarize=False)
+    messages, stats = context.build(history(3))
+    assert messages == history(3)
+    assert stats.saved_tokens == 0
+
+
+def test_window_pins_system_and_keeps_latest():
+    context = ContextManager("m", num_ctx=2048 + 700, summarize=False)
+    full = history(20)
+    messages, stats = context.build(full)
+    assert messages[0] == full[0]
+    assert messages[-1] == full[-1]
+    assert len(messages) < len(full)
+    assert stats.sent_tokens <= context.budget
+    assert stats.dropped_messages == len(full) - len(messages)
+    assert context.first_kept == len(full) - len(messages) + 1
+
+
+def test_window_start_matches_build_without_building():
+    context = ContextManager("m", num_ctx=2048 + 700)
+    full = history(20)
+    start = context.window_start(full)
+    assert context.first_kept == 0 and context._summary_thread is None
+    context.build(full)
+    assert context.first_kept == start
+    # A longer new message pushes the window start later
+    short = full + [{'role': 'user', 'content': "diff"}]
+    long = full + [{'role': 'user', 'content': "word " * 500}]
+    assert context.window_start(short) < context.window_start(long)
+
+
+def test_summary_strips_thinking():
+    summaries = []
+
+    def summarizer(model, transcript):
+        summaries.append(transcript)
+        return "<think>what matters here?</think>\nThe user asked about words."
+
+    context = ContextManager("m", num_ctx=2048 + 700, summarizer=summarizer)
+    full = history(20)
+    context.build(full)
+    context._summary_thread.join()
+    assert summaries and "question 0" in summaries[0]
+    assert context.summary == "The user asked about words."
+
+    messages, stats = context.build(full)
+    assert messages[1]['content'].endswith("The user asked about words.")
+    assert stats.summarized_messages > 0
+
+
+def test_scheduled_summary_waits_for_the_request_and_runs_at_low_priority():
+    from gptathome.backend import ChatRequest
+    from gptathome.scheduler import PRIORITY_LOW
+
+    class Scheduler:
+        def __init__(self):
+            self.submitted = []
+
+        def submit(self, priority, on_chunk=None, on_done=None, **kwargs):
+            request = ChatRequest(kwargs, on_chunk, on_done)
+            self.submitted.append((priority, request))
+            return request
+
+    scheduler = Scheduler()
+    context = ContextManager("m", num_ctx=2048 + 700, scheduler=scheduler)
+    full = history(20)
+    context.build(full)
+    assert scheduler.submitted == [] and context._summary_thread is None
+    context.start_pending_summary()
+    context.start_pending_summary()  # Nothing new pending
+    assert len(scheduler.submitted) == 1
+    priority, request = scheduler.submitted[0]
+    assert priority == PRIORITY_LOW
+    assert request.kwargs['model'] == "m" and "question 0" in request.kwargs['messages'][1]['content']
+    assert request.kwargs['options'] == context.options()
+
+    for text in ("<think>hmm</think>", "Short ", "summary."):
+        request.on_chunk({'message': {'content': text}})
+    request.finish()
+    assert context.summary == "Short summary."
+
+
+def test_counter_calibration():
+    counter = TokenCounter()
+    messages = [{'role': 'user', 'content': "hello there " * 20}]
+    raw = counter.count_messages(messages, "m")
+    counter.calibrate("m", messages, raw * 2)
+    assert counter.count_messages(messages, "m") > raw * 1.5
+
+
+def test_options_carry_num_ctx():
+    context = ContextManager("m", num_ctx=4096)
+    assert context.options({'temperature': 0}) == {'num_ctx': 4096, 'temperature': 0}
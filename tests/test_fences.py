@@ -0,0 +1,68 @@
+import random
+
+from gptathome.fences import CodeBlock, FenceParser
+
+REPLY = """Here you go:
+
+```python
+def f():
+    return 1
+```
+
+And a shell one:
+````bash
+echo "```"
+````
+```x = 1```
+Inline ```y``` is not a block.
+```
+never closed
+"""
+
+
+def feed_all(pieces):
+    parser = FenceParser()
+    blocks = []
+    for piece in pieces:
+        blocks.extend(parser.feed(piece))
+    return parser, blocks + parser.finish()
+
+
+def test_blocks_in_one_chunk():
+    parser, blocks = feed_all([REPLY])
+    assert blocks == [
+        CodeBlock("python", "def f():\n    return 1"),
+        CodeBlock("bash", 'echo "```"'),
+        CodeBlock("", "x = 1"),
+    ]
+    assert parser.blocks == blocks
+
+
+def test_any_chunking_gives_same_blocks():
+    _, expected = feed_all([REPLY])
+    rng = random.Random(6)
+    for _ in range(200):
+        cuts = sorted(rng.sample(range(1, len(REPLY)), rng.randint(1, 40)))
+        pieces = [REPLY[a:b] for a, b in zip([0] + cuts, cuts + [len(REPLY)])]
+        assert feed_all(pieces)[1] == expected
+
+
+def test_block_is_returned_when_its_fence_closes():
+    parser = FenceParser()
+    assert parser.feed("```py\nx = 1\n") == []
+    assert parser.in_block
+    assert parser.pending() == CodeBlock("py", "x = 1")
+    assert parser.feed("``") == []
+    assert parser.feed("`\n") == [CodeBlock("py", "x = 1")]
+    assert not parser.in_block
+
+
+def test_closing_fence_on_last_line_without_newline():
+    parser = FenceParser()
+    parser.feed("```\ny = 2\n```")
+    assert parser.finish() == [CodeBlock("", "y = 2")]
+
+
+def test_empty_blocks_are_skipped():
+    _, blocks = feed_all(["```\n\n```\n"])
+    assert blocks == []
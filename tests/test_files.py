@@ -0,0 +1,42 @@
+import os
+import stat
+import sys
+
+import pytest
+
+from gptathome.files import detect_newline, iter_text_chunks, write_text
+
+
+def test_chunks_end_at_line_breaks(tmp_path):
+    path = tmp_path / "big.py"
+    text = "".join(f"line {i} ünicode\n" for i in range(5000))
+    path.write_text(text, encoding="utf-8")
+    chunks = list(iter_text_chunks(str(path), chunk_bytes=1000))
+    assert "".join(chunks) == text
+    assert all(chunk.endswith("\n") for chunk in chunks)
+
+
+def test_write_text_keeps_newline_style(tmp_path):
+    path = tmp_path / "crlf.py"
+    write_text(str(path), "a\nb\n", newline="\r\n")
+    assert path.read_bytes() == b"a\r\nb\r\n"
+    assert detect_newline(str(path)) == "\r\n"
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="POSIX permissions")
+def test_write_text_keeps_mode(tmp_path):
+    path = tmp_path / "script.sh"
+    path.write_text("echo hi\n")
+    os.chmod(path, 0o755)
+    write_text(str(path), "echo bye\n")
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o755
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="POSIX permissions")
+def test_write_text_new_file_uses_umask(tmp_path):
+    umask = os.umask(0o022)
+    try:
+        write_text(str(tmp_path / "new.py"), "x = 1\n")
+    finally:
+        os.umask(umask)
+    assert stat.S_IMODE(os.stat(tmp_path / "new.py").st_mode) == 0o644
@@ -0,0 +1,88 @@
+import random
+
+from gptathome.highlighter import LineHighlighter, lex_line
+
+
+def full_lex(lines):
+    spans = []
+    state = None
+    for text in lines:
+        line_spans, state = lex_line(text, state)
+        spans.append(line_spans)
+    return spans
+
+
+def relex_all(highlighter, lines):
+    highlighter.relex(lambda first, last: lines[first - 1:last], len(lines))
+    return highlighter.spans
+
+
+def apply_edit(highlighter, lines, first, removed, texts):
+    """Replace lines first..first+removed with texts, the way HighlightDocument.edit does"""
+    lines[first - 1:first + removed] = texts
+    if removed:
+        highlighter.lines_deleted(first, removed)
+    highlighter.lines_inserted(first, len(texts) - 1)
+
+
+def test_lex_line_keywords_and_strings():
+    spans, state = lex_line('def f(a): return "x"  # done')
+    assert ("keyword", 0, 3) in spans
+    assert ("function", 4, 5) in spans
+    assert ("string", 17, 20) in spans
+    assert ("comment", 22, 28) in spans
+    assert state is None
+
+
+def test_triple_quote_state_carries_over():
+    spans, state = lex_line('s = """start')
+    assert state == '"""'
+    spans, state = lex_line('end""" + 1', state)
+    assert spans[0] == ("string", 0, 6)
+    assert state is None
+
+
+def test_joining_line_that_opened_string():
+    lines = ['x = 1', 's = """', 'def f(a):', '    return 2']
+    highlighter = LineHighlighter()
+    highlighter.reset(len(lines))
+    relex_all(highlighter, lines)
+    assert highlighter.spans[2] == [("string", 0, 9)]
+
+    # Delete from the end of line 1 to the end of line 2: 's = """' disappears
+    apply_edit(highlighter, lines, 1, 1, ['x = 1'])
+    assert relex_all(highlighter, lines) == full_lex(lines)
+
+
+def test_splitting_line_that_closes_string():
+    lines = ['s = """', 'a', 'b"""', 'x = 1']
+    highlighter = LineHighlighter()
+    highlighter.reset(len(lines))
+    relex_all(highlighter, lines)
+    apply_edit(highlighter, lines, 3, 0, ['b', '"""'])
+    assert relex_all(highlighter, lines) == full_lex(lines)
+
+
+def test_random_edits_match_full_lex():
+    rng = random.Random(4)
+    pieces = ['x = 1', 's = """', '"""', 'def f(a):', '    return "a"', '# c', "t = '''", "'''", '']
+    for _ in range(500):
+        lines = [rng.choice(pieces) for _ in range(rng.randint(1, 12))]
+        highlighter = LineHighlighter()
+        highlighter.reset(len(lines))
+        relex_all(highlighter, lines)
+        for _ in range(4):
+            first = rng.randint(1, len(lines))
+            removed = rng.randint(0, len(lines) - first)
+            texts = [rng.choice(pieces) for _ in range(rng.randint(1, 3))]
+            apply_edit(highlighter, lines, first, removed, texts)
+            assert relex_all(highlighter, lines) == full_lex(lines), (lines, first, removed, texts)
+
+
+def test_limit_leaves_rest_dirty():
+    lines = ['x = 1'] * 50
+    highlighter = LineHighlighter()
+    highlighter.reset(len(lines))
+    highlighter.relex(lambda first, last: lines[first - 1:last], len(lines), limit=10)
+    assert highlighter.dirty == [[11, 50]]
+    assert relex_all(highlighter, lines) == full_lex(lines)
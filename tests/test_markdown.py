@@ -0,0 +1,60 @@
+import os
+import random
+import subprocess
+import sys
+
+from gptathome.markdown import MarkdownStream, split_lines
+
+REPLY = """# Plan
+Use **bold** and `code` here.
+
+```python
+s = '''doc
+still doc'''
+def f():
+    return 1
+```
+Done.
+"""
+
+
+def parse_whole(text):
+    stream = MarkdownStream()
+    return [stream.feed_piece(piece) for piece in split_lines(text)]
+
+
+def test_headings_inline_and_fences():
+    spans = parse_whole(REPLY)
+    assert ("h1", 2, 6) in spans[0]
+    assert ("bold", 6, 10) in spans[1] and ("code", 18, 22) in spans[1]
+    assert ("fence_label", 3, 9) in spans[3]
+    assert ("string", 0, 12) in spans[5]
+    assert ("keyword", 0, 3) in spans[6]
+    assert spans[8] == [("marker", 0, 3)]
+    assert spans[9] == []
+
+
+def test_random_chunking_gives_same_spans():
+    expected = parse_whole(REPLY)
+    rng = random.Random(22)
+    for _ in range(50):
+        stream = MarkdownStream()
+        spans = []
+        for piece in split_lines(REPLY):
+            # Pieces arrive split at arbitrary points; only the last part ends the line
+            cuts = sorted(rng.sample(range(1, len(piece)), min(3, len(piece) - 1))) if len(piece) > 1 else []
+            parts = [piece[a:b] for a, b in zip([0] + cuts, cuts + [len(piece)])]
+            for part in parts:
+                result = stream.feed_piece(part)
+                if result is not None:
+                    spans.append(result)
+        assert spans == expected
+
+
+def test_lexer_not_imported_until_code():
+    code = ("import sys, gptathome.markdown as m\n"
+            "m.MarkdownStream().parse_line('plain **text**')\n"
+            "print('gptathome.highlighter' in sys.modules)")
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert output.stdout.strip() == "False"
@@ -0,0 +1,50 @@
+from gptathome.outbox import Outbox, QueuedMessage
+
+
+def test_pop_in_order():
+    outbox = Outbox()
+    outbox.add("first")
+    outbox.add("second", attachment="code")
+    assert outbox.pop_next() == ("first", None, 1)
+    assert outbox.pop_next() == ("second", "code", 1)
+    assert outbox.pop_next() is None
+
+
+def test_merge_joins_messages_with_the_same_or_no_attachment():
+    outbox = Outbox(merge=True)
+    outbox.add("a")
+    outbox.add("b", attachment="v1")
+    outbox.add("c")
+    outbox.add("d", attachment="v1")
+    assert outbox.pop_next() == ("a\n\nb\n\nc\n\nd", "v1", 4)
+    assert len(outbox) == 0
+
+
+def test_merge_stops_at_a_different_attachment():
+    outbox = Outbox(merge=True)
+    outbox.add("a", attachment="v1")
+    outbox.add("b")
+    outbox.add("c", attachment="v2")
+    outbox.add("d")
+    assert outbox.pop_next() == ("a\n\nb", "v1", 2)
+    assert outbox.pop_next() == ("c\n\nd", "v2", 2)
+    assert outbox.pop_next() is None
+
+
+def test_edit_move_remove():
+    outbox = Outbox()
+    a, b, c = (outbox.add(text) for text in "abc")
+    assert outbox.move(c.id, -5) == 0
+    assert [item.text for item in outbox] == ["c", "a", "b"]
+    outbox.edit(a.id, "A")
+    outbox.edit(b.id, "   ")  # Blank edits remove the item
+    outbox.remove(c.id)
+    assert [item.text for item in outbox] == ["A"]
+    assert outbox.move(12345, 1) is None
+
+
+def test_preview():
+    message = QueuedMessage("line one\n\nline   two " + "x" * 100)
+    preview = message.preview(20)
+    assert len(preview) == 20 and preview.startswith("line one line two")
+    assert preview.endswith("…")
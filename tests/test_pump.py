@@ -0,0 +1,60 @@
+import time
+
+from gptathome.pump import TokenPump
+
+
+class FakeText:
+    """Records what a Tk Text widget would be asked to do"""
+    def __init__(self):
+        self.inserts = []
+        self.scrolls = 0
+        self.timers = []
+
+    def insert(self, index, text, tags=None):
+        self.inserts.append((text, tags))
+
+    def see(self, index):
+        self.scrolls += 1
+
+    def after(self, ms, func):
+        self.timers.append(func)
+        return len(self.timers)
+
+    def after_cancel(self, after_id):
+        pass
+
+
+def test_flush_coalesces_chunks_into_one_insert():
+    widget = FakeText()
+    pump = TokenPump(widget)
+    for text in ("a", "b", "c"):
+        pump.put(text)
+    pump.put("")  # Empty chunks are skipped
+    pump.flush()
+    assert widget.inserts == [("abc", None)]
+    assert widget.scrolls == 1
+    assert (pump.frames, pump.chunks, pump.coalesced_frames, pump.max_backlog) == (1, 3, 1, 3)
+
+
+def test_tags_and_callbacks_keep_their_order():
+    widget = FakeText()
+    pump = TokenPump(widget)
+    pump.put("think", "think")
+    pump.put("more", "think")
+    pump.call(lambda: widget.inserts.append(("callback", None)))
+    pump.put("answer")
+    pump.flush()
+    assert widget.inserts == [("thinkmore", "think"), ("callback", None), ("answer", None)]
+
+
+def test_late_frames_are_counted_and_stats_reset():
+    widget = FakeText()
+    pump = TokenPump(widget, frame_rate=100)
+    pump.start()
+    pump._last_frame = time.perf_counter() - 0.1  # The UI was blocked for ~10 frames
+    pump.put("x")
+    widget.timers[-1]()
+    assert pump.dropped_frames >= 8
+    assert "dropped: " in pump.stats_text() and "max backlog: 1" in pump.stats_text()
+    pump.reset_stats()
+    assert (pump.frames, pump.chunks, pump.dropped_frames, pump.max_backlog) == (0, 0, 0, 0)
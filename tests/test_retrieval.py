@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+from gptathome.retrieval import EmbeddingIndex, Retriever, RETRIEVAL_TOKENS
+
+np = pytest.importorskip("numpy")
+
+
+def make_index(path, rows=3):
+    index = EmbeddingIndex(str(path), model="test")
+    index.append(np.eye(rows, 4), [{"id": i + 1, "text": f"m{i}"} for i in range(rows)])
+    return index
+
+
+def test_load_is_lazy(tmp_path):
+    make_index(tmp_path / "idx")
+    index = EmbeddingIndex(str(tmp_path / "idx"), model="test")
+    assert not index._loaded
+    assert index.last_id == 3
+    assert index._loaded
+
+
+def test_intact_index_is_not_rewritten(tmp_path):
+    make_index(tmp_path / "idx")
+    meta_path = str(tmp_path / "idx.jsonl")
+    os.utime(meta_path, (0, 0))
+    assert len(EmbeddingIndex(str(tmp_path / "idx"), model="test")) == 3
+    assert os.stat(meta_path).st_mtime == 0
+
+
+def test_torn_tail_is_dropped(tmp_path):
+    make_index(tmp_path / "idx")
+    with open(tmp_path / "idx.jsonl", "a", encoding="utf-8") as f:
+        f.write('{"id": 4, "te')
+    index = EmbeddingIndex(str(tmp_path / "idx"), model="test")
+    assert len(index) == 3
+    with open(tmp_path / "idx.jsonl", encoding="utf-8") as f:
+        assert len(f.readlines()) == 3
+
+
+def test_search_orders_by_similarity(tmp_path):
+    index = make_index(tmp_path / "idx")
+    hits = index.search([[0, 1, 0, 0]], k=2)[0]
+    assert hits[0][1]["id"] == 2
+    assert len(hits) == 2
+
+
+def test_budget_reserved_only_once_model_answers():
+    retriever = Retriever(store=None, index=object(), embed=lambda texts: [[1.0]])
+    assert retriever.tokens == 0
+    retriever.ready = True
+    assert retriever.tokens == RETRIEVAL_TOKENS
@@ -0,0 +1,80 @@
+import sys
+import types
+
+from gptathome.context import ContextStats
+from gptathome.router import ModelRouter, code_lines, installed_models, model_size
+
+MODELS = ["r1:1.5b", "r1:7b", "r1:14b", "r1:32b"]
+
+
+def code_block(lines):
+    return "```python\n" + "\n".join(f"x{i} = {i}" for i in range(lines)) + "\n```"
+
+
+def test_model_size_and_code_lines():
+    assert model_size("deepseek-r1:14b") == 14
+    assert model_size("llama3") == 7
+    assert code_lines("see\n" + code_block(30) + "\nand " + code_block(5)) == 35
+
+
+def test_short_question_gets_smallest_model():
+    decision = ModelRouter(MODELS).route("What is a tuple?")
+    assert decision.model == "r1:1.5b"
+    assert decision.tier == 0
+
+
+def test_code_raises_tier_within_target():
+    router = ModelRouter(MODELS)
+    assert router.route("fix this\n" + code_block(200)).model == "r1:32b"
+    # Nothing fits one second: the fastest model answers
+    assert router.route("fix this\n" + code_block(200), target=1).model == "r1:1.5b"
+
+
+def test_measured_speed_changes_prediction():
+    router = ModelRouter(MODELS)
+    before = router.route("fix this\n" + code_block(30), target=60)
+    router.record({"model": "r1:7b", "eval_tps": 100.0, "prompt_tps": 2000.0, "eval_count": 100})
+    after = router.route("fix this\n" + code_block(30), target=60)
+    assert after.model == "r1:7b"
+    assert after.predicted < before.predicted
+    assert router.is_loaded("r1:7b")
+
+
+def test_cached_replies_are_not_measurements():
+    router = ModelRouter(MODELS)
+    router.record({"model": "r1:7b", "eval_tps": 1000.0, "cached": True})
+    assert router.stats["r1:7b"].samples == 0
+
+
+def test_route_turn_counts_whole_context():
+    # A follow-up whose code was sent in an earlier turn still routes as a code prompt
+    messages = [
+        {'role': 'user', 'content': "review\n" + code_block(200)},
+        {'role': 'assistant', 'content': "Looks fine."},
+        {'role': 'user', 'content': "and now?"},
+    ]
+    turn = types.SimpleNamespace(prompt="and now?", messages=messages,
+                                 context_stats=ContextStats(4000, 4000, 0, 0))
+    router = ModelRouter(MODELS)
+    assert router.route("and now?").tier == 0
+    decision = router.route_turn(turn)
+    assert decision.tier == 3
+    assert "4000 tokens, 200 code lines" in decision.reason
+
+
+def test_larger():
+    router = ModelRouter(MODELS)
+    assert router.larger("r1:7b") == "r1:14b"
+    assert router.larger("r1:32b") is None
+    assert router.larger("other") == "r1:32b"
+
+
+def test_only_installed_models_are_routed(monkeypatch):
+    listing = {'models': [{'model': "r1:1.5b"}, {'name': "r1:14b"}, {'model': "llama3:8b"}]}
+    client = types.SimpleNamespace(list=lambda: listing)
+    monkeypatch.setitem(sys.modules, "ollama", types.SimpleNamespace(Client=lambda host=None: client))
+    router = ModelRouter(MODELS)
+    router.use_installed(installed_models())
+    assert router.models == ["r1:1.5b", "r1:14b"]
+    assert router.route("fix this\n" + code_block(200)).model == "r1:14b"
+    assert router.larger("r1:1.5b") == "r1:14b"
@@ -0,0 +1,66 @@
+import json
+
+from gptathome import startup
+from gptathome.startup import StartupTimer, parse_importtime
+
+IMPORTTIME = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:       300 |        420 | io
+import time:        50 |         50 |     encodings.aliases
+import time:      1000 |       1050 | gptathome.store
+something else printed by the app
+"""
+
+
+def test_parse_importtime_keeps_top_level_imports():
+    assert parse_importtime(IMPORTTIME) == [("io", 300, 420), ("gptathome.store", 1000, 1050)]
+
+
+class FakeRoot:
+    """Runs after/after_idle callbacks when step() is called"""
+    def __init__(self):
+        self.pending = []
+        self.closed = False
+
+    def after(self, ms, func):
+        self.pending.append(func)
+
+    def after_idle(self, func):
+        self.pending.append(func)
+
+    def update_idletasks(self):
+        pass
+
+    def destroy(self):
+        self.closed = True
+
+    def run(self):
+        while self.pending:
+            self.pending.pop(0)()
+
+
+def test_deferred_tasks_run_after_first_frame(tmp_path, monkeypatch):
+    monkeypatch.delenv(startup.REPORT_ENV, raising=False)
+    monkeypatch.setenv(startup.EXIT_ENV, "1")
+    log = tmp_path / "startup.jsonl"
+    timer = StartupTimer("app", log_path=str(log))
+    ran = []
+
+    def failing():
+        raise RuntimeError("boom")
+
+    timer.defer(lambda: ran.append("a"), "a")
+    timer.defer(failing)
+    root = FakeRoot()
+    timer.watch(root)
+    assert ran == []  # Nothing runs before the first frame
+    root.run()
+
+    assert ran == ["a"]
+    labels = [label for label, seconds in timer.marks]
+    assert labels == ["imports", "widgets", "first_frame", "a", "failing", "interactive"]
+    times = [seconds for _, seconds in timer.marks]
+    assert times == sorted(times)
+    record = json.loads(log.read_text(encoding="utf-8"))
+    assert record["app"] == "app" and record["tti"] == timer.interactive
+    assert root.closed  # EXIT_ENV closes the app once it is interactive
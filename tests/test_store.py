@@ -0,0 +1,78 @@
+import pytest
+
+from gptathome.store import ConversationStore, fts_query
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ConversationStore(str(tmp_path / "conversations.db"))
+    yield store
+    store.close()
+
+
+def test_fts_query_quotes_terms():
+    assert fts_query('C++ "x" foo-bar') == '"C++" """x""" "foo-bar"'
+    assert fts_query("   ") == ""
+
+
+def test_search_with_punctuation(store):
+    session = store.start_session("s", "m")
+    store.add_exchange(session, "How do I use C++ templates?", "With the template keyword.", 1.0)
+    store.add_exchange(session, "what's a foo-bar?", "A hyphenated name.", 1.0)
+    store.flush()
+    for query in ("C++", "what's", "foo-bar", '"unbalanced', "AND OR NOT", "NEAR(", "*"):
+        store.search(query)  # Must not raise
+    assert [row[2] for row in store.search("C++ templates")] == ["user"]
+    assert store.search("foo-bar")[0][4] == "what's a [foo-bar]?"
+    assert store.search("template keyword")[0][2] == "assistant"
+    assert store.search("missing") == []
+
+
+LOG = """user input:
+first question
+first answer
+elapsed time: 1.50s
+user input:
+second question
+line one
+
+line two
+elapsed time: 2.00s
+"""
+
+
+def test_import_is_idempotent_before_and_after_commit(store, tmp_path):
+    path = tmp_path / "model_responses.txt"
+    path.write_text(LOG, encoding="utf-8")
+    assert store.import_text_log(str(path), "m") == 2
+    assert store.import_text_log(str(path), "m") == 0  # Still queued on the writer
+    store.flush()
+    assert store.import_text_log(str(path), "m") == 0
+    rows = store.messages_after(0)
+    assert [row[3] for row in rows] == ["first question", "first answer",
+                                        "second question", "line one\n\nline two"]
+    assert [stats for stats in store.timing_stats()] == []
+
+    # A grown log is imported again
+    with open(path, "a", encoding="utf-8") as f:
+        f.write("user input:\nthird\nanswer\nelapsed time: 1s\n")
+    assert store.import_text_log(str(path), "m") == 3
+
+
+def test_writes_are_batched_off_the_calling_thread(store, monkeypatch):
+    import gptathome.store as store_module
+
+    commits = []
+    real_apply = store._apply
+    monkeypatch.setattr(store, "_apply", lambda conn, kind, args: (commits.append(kind), real_apply(conn, kind, args)))
+    session = store.start_session("s", "m")
+    for i in range(50):
+        store.add_exchange(session, f"q{i}", f"a{i}", 0.1, {"i": i})
+    assert len(store.messages_after(0, 1000)) < 100  # Not committed synchronously
+    store.flush()
+    assert len(store.messages_after(0, 1000)) == 100
+    assert [stats["i"] for stats in store.timing_stats()] == list(range(50))
+    assert store.messages(session)[:2] == [{'role': 'user', 'content': "q0"},
+                                           {'role': 'assistant', 'content': "a0"}]
+    assert len(commits) == 51 and store_module.BATCH_SIZE >= 51
+    assert store.reader.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
@@ -0,0 +1,59 @@
+import time
+
+from gptathome.tabs import TabManager, TabStash, content_key
+
+
+def make_manager(tmp_path, max_tabs=2):
+    return TabManager(max_tabs=max_tabs, stash=TabStash(str(tmp_path / "stash")))
+
+
+def test_content_key_ignores_trailing_whitespace():
+    assert content_key("\nx = 1   \ny = 2\n\n") == content_key("x = 1\ny = 2")
+    assert content_key("x = 1") != content_key("x = 2")
+
+
+def test_repeated_code_finds_open_tab(tmp_path):
+    tabs = make_manager(tmp_path)
+    tabs.add("tab1", "x = 1\n")
+    assert tabs.find("x = 1") == ("tab1", None)
+    assert tabs.find("x = 2") == (None, None)
+    assert tabs.reused == 1
+
+
+def test_edited_tab_is_not_reused(tmp_path):
+    tabs = make_manager(tmp_path)
+    tabs.add("tab1", "x = 1")
+    tabs.edited("tab1")
+    assert tabs.find("x = 1") == (None, None)
+
+
+def test_least_recently_used_tabs_are_stashed_and_restored(tmp_path):
+    tabs = make_manager(tmp_path)
+    for name in ("a", "b", "c"):
+        tabs.add(name, f"{name} = 1")
+        time.sleep(0.02)
+    tabs.touch("a")
+    candidates = tabs.eviction_candidates(lambda name: True)
+    assert candidates == ["b"]
+    assert tabs.eviction_candidates(lambda name: name != "b") == ["c"]
+
+    key = tabs.stash_tab("b", "b = 1", "Code 2", language="python")
+    assert "b" not in tabs.tabs and tabs.evicted == 1
+    assert tabs.find("b = 1") == (None, key)
+
+    # A new manager sees the stash on disk; take() removes the entry
+    reloaded = make_manager(tmp_path)
+    assert [entry["title"] for _, entry in reloaded.stash.recent()] == ["Code 2"]
+    data = reloaded.stash.take(key)
+    assert data["code"] == "b = 1" and data["language"] == "python"
+    assert reloaded.stash.take(key) is None
+
+
+def test_report_lists_largest_first(tmp_path):
+    tabs = make_manager(tmp_path)
+    tabs.add("small", "x")
+    tabs.add("large", "y")
+    sizes = {"small": ("Small", 10, 1, 0, True), "large": ("Large", 100000, 2000, 50, True)}
+    lines = tabs.report(sizes.get).splitlines()
+    assert lines[0].startswith("2 open tabs")
+    assert lines[1].startswith("Large:") and lines[2].startswith("Small:")
@@ -0,0 +1,68 @@
+import csv
+import json
+
+from gptathome.telemetry import FIELDS, RequestTelemetry, TelemetryLog, main, percentile
+from gptathome.store import ConversationStore
+
+
+def chunk(content, done=False, **final):
+    return dict({'message': {'content': content}, 'done': done}, **final)
+
+
+def finished_request(model="m"):
+    telemetry = RequestTelemetry(model, "s")
+    telemetry.mark_started()
+    for text in ("a", "b", "c"):
+        telemetry.on_chunk(chunk(text))
+    telemetry.on_chunk(chunk("", True, eval_count=30, eval_duration=2e9,
+                             prompt_eval_count=100, prompt_eval_duration=5e8))
+    telemetry.finish()
+    return telemetry
+
+
+def test_percentile():
+    assert percentile([], 50) is None
+    assert percentile([3, 1, 2], 50) == 2
+    assert percentile(list(range(101)), 99) == 99
+
+
+def test_request_timings_and_server_counters():
+    data = finished_request().to_dict()
+    assert set(data) == set(FIELDS)
+    assert data["chunks"] == 3 and data["ttft"] >= 0 and data["total"] >= data["ttft"]
+    assert data["eval_tps"] == 15 and data["prompt_tps"] == 200
+    assert data["prompt_eval_duration"] == 0.5
+    assert "decode 15.0 tok/s" in finished_request().summary_text()
+
+
+def test_export_csv_and_json(tmp_path):
+    log = TelemetryLog()
+    log.add(finished_request("a"))
+    log.add(dict(finished_request("b").to_dict(), extra="ignored"))
+
+    assert log.export(str(tmp_path / "t.csv")) == 2
+    with open(tmp_path / "t.csv", newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [row["model"] for row in rows] == ["a", "b"]
+    assert list(rows[0]) == FIELDS
+    assert rows[0]["eval_count"] == "30"
+
+    assert log.export(str(tmp_path / "t.JSON")) == 2
+    with open(tmp_path / "t.JSON", encoding="utf-8") as f:
+        records = json.load(f)
+    assert records[1]["extra"] == "ignored" and records[0]["eval_tps"] == 15
+
+
+def test_cli_exports_stored_telemetry(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    store = ConversationStore()
+    session = store.start_session("s", "m")
+    store.add_exchange(session, "q", "a", 1.0, {"telemetry": finished_request().to_dict()})
+    store.add_exchange(session, "q2", "a2", 1.0, {"context_tokens": 5})
+    store.close()
+
+    assert main(["export", "out.json"]) == 0
+    assert "1 requests written" in capsys.readouterr().out
+    with open(tmp_path / "out.json", encoding="utf-8") as f:
+        assert len(json.load(f)) == 1
+    assert main(["bogus"]) == 2
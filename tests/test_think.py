@@ -0,0 +1,52 @@
+import random
+
+from gptathome.think import ThinkParser, strip_think
+
+RESPONSE = "<think>\nLet me see. 2 < 3 and <b> is not a tag.\n</think>\n\nThe answer is 42."
+
+
+def parse(pieces):
+    parser = ThinkParser()
+    segments = []
+    for piece in pieces:
+        segments.extend(parser.feed(piece))
+    segments.extend(parser.finish())
+    return parser, segments
+
+
+def test_strip_think():
+    assert strip_think(RESPONSE) == "The answer is 42."
+    assert strip_think("<think>still going") == ""
+    assert strip_think("no reasoning") == "no reasoning"
+
+
+def test_split_into_think_and_answer():
+    parser, segments = parse([RESPONSE])
+    assert parser.thinking == "Let me see. 2 < 3 and <b> is not a tag.\n"
+    assert parser.answer == "The answer is 42."
+    assert [kind for kind, _ in segments] == ["think", "answer"]
+
+
+def test_tags_split_across_chunks():
+    rng = random.Random(13)
+    for _ in range(200):
+        cuts = sorted(rng.sample(range(1, len(RESPONSE)), rng.randint(1, 30)))
+        pieces = [RESPONSE[a:b] for a, b in zip([0] + cuts, cuts + [len(RESPONSE)])]
+        parser, segments = parse(pieces)
+        assert parser.answer == "The answer is 42."
+        assert "<" not in "".join(text for kind, text in segments if kind == "answer")
+
+
+def test_separate_thinking_field():
+    parser = ThinkParser()
+    assert parser.feed("", thinking="hmm") == [("think", "hmm")]
+    assert parser.feed("Yes.") == [("answer", "Yes.")]
+    assert parser.thinking == "hmm"
+
+
+def test_history_content_and_token_scaling():
+    parser, _ = parse(["<think>a</think>", "b", "c"])
+    assert parser.history_content() == "bc"
+    assert parser.history_content(keep_thinking=True) == "<think>a</think>\n\nbc"
+    parser.finish(eval_count=30)
+    assert (parser.think_tokens, parser.answer_tokens) == (10, 20)
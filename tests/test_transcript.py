@@ -0,0 +1,62 @@
+import tkinter as tk
+
+import pytest
+
+from gptathome.transcript import COLLAPSE_LINES, THINK_TAG, Transcript, TranscriptMessage
+
+
+def test_message_keeps_parts_in_stream_order():
+    message = TranscriptMessage("assistant", "", False)
+    assert message.append("think", "a") is True
+    assert message.append("think", "b") is False
+    assert message.append("text", "answer") is True
+    assert message.thinking == "ab" and message.text == "answer"
+    assert message.mark != TranscriptMessage("user", "", False).mark
+
+
+@pytest.fixture
+def widget():
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        pytest.skip("no display")
+    root.withdraw()
+    text = tk.Text(root)
+    yield text
+    root.destroy()
+
+
+def shown(widget):
+    return widget.get("1.0", "end-1c")
+
+
+def test_long_code_in_prompts_is_collapsed_until_expanded(widget):
+    transcript = Transcript(widget)
+    code = "\n".join(f"line {i}" for i in range(COLLAPSE_LINES + 5))
+    message = transcript.add_message("user", f"fix this\n```python\n{code}\n```\n", collapse_code=True)
+    assert "line 3" not in shown(widget)
+    assert f"show {COLLAPSE_LINES + 5} lines of code" in shown(widget)
+    transcript.expand(message, 0)
+    assert "line 3" in shown(widget)
+    assert transcript.text() == message.text
+
+
+def test_reasoning_is_drawn_only_when_opened(widget):
+    transcript = Transcript(widget)
+    message = transcript.add_message("assistant", "")
+    transcript.insert(tk.END, "secret plan", THINK_TAG)
+    transcript.insert(tk.END, "The answer.")
+    assert "secret plan" not in shown(widget)
+    assert "Reasoning, 11 chars" in shown(widget) and "The answer." in shown(widget)
+    transcript.toggle_think(message, 1)  # parts[0] is the empty text the message started with
+    assert "secret plan" in shown(widget)
+    assert transcript.text() == "The answer."
+
+
+def test_old_messages_leave_the_widget(widget):
+    transcript = Transcript(widget, max_rendered=5)
+    for i in range(12):
+        transcript.add_message("user", f"message {i}\n")
+    assert transcript.hi - transcript.lo == 5 and transcript.hi == 12
+    assert "message 0\n" not in shown(widget) and "message 11" in shown(widget)
+    assert len(transcript.messages) == 12
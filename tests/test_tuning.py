@@ -0,0 +1,55 @@
+import sys
+import types
+
+import pytest
+
+from gptathome import tuning
+
+
+class FakeClient:
+    """Decode speed peaks at 6 threads; ctx_cost(num_ctx) slows decoding"""
+    ctx_cost = staticmethod(lambda num_ctx: 0.0)
+
+    def __init__(self, host=None):
+        self.prompts = []
+
+    def chat(self, model, messages, stream, options):
+        self.prompts.append((options["num_ctx"], len(messages[0]["content"])))
+        decode = 10 - abs(options["num_thread"] - 6) - self.ctx_cost(options["num_ctx"])
+        prompt = 50 + options.get("num_batch", 512) / 64
+        yield {"done": False, "message": {"content": "x"}}
+        yield {"done": True, "eval_count": 96, "eval_duration": int(96 / decode * 1e9),
+               "prompt_eval_count": 400, "prompt_eval_duration": int(400 / prompt * 1e9)}
+
+
+@pytest.fixture
+def fake_ollama(monkeypatch):
+    monkeypatch.setitem(sys.modules, "ollama", types.SimpleNamespace(Client=FakeClient))
+    return FakeClient
+
+
+def test_default_context_kept_when_larger_is_as_fast(fake_ollama):
+    tuner = tuning.Autotuner("m", repeat=1)
+    profile = tuner.run(threads=[4, 6, 8], batches=[256, 512])
+    assert profile["options"] == {"num_ctx": 8192, "num_thread": 6, "num_batch": 512}
+
+
+def test_context_trials_fill_the_context(fake_ollama):
+    tuner = tuning.Autotuner("m", repeat=1)
+    tuner.run(threads=[6], batches=[512])
+    lengths = {length for _, length in tuner.client.prompts}
+    assert max(lengths) > 4 * len(tuning.BENCH_PROMPT)
+
+
+def test_clearly_faster_context_replaces_default(fake_ollama, monkeypatch):
+    monkeypatch.setattr(FakeClient, "ctx_cost", staticmethod(lambda num_ctx: num_ctx / 2048))
+    tuner = tuning.Autotuner("m", repeat=1)
+    profile = tuner.run(threads=[6], batches=[512])
+    assert profile["options"]["num_ctx"] == 4096
+
+
+def test_profiles_round_trip(tmp_path):
+    path = str(tmp_path / "profiles.json")
+    tuning.save_profile("m", {"options": {"num_thread": 6}}, path)
+    assert tuning.load_profile("m", path) == {"num_thread": 6}
+    assert tuning.load_profile("other", path) is None
@@ -0,0 +1,56 @@
+import sys
+import threading
+import types
+
+import pytest
+
+from gptathome.warmup import ModelWarmer
+
+
+class Pings(list):
+    def __init__(self):
+        super().__init__()
+        self.done = threading.Event()
+
+
+@pytest.fixture
+def pings(monkeypatch):
+    calls = Pings()
+    done = calls.done
+
+    def generate(model, prompt, keep_alive, options):
+        calls.append((model, keep_alive, options))
+        done.set()
+        if model == "missing":
+            raise RuntimeError("model not found")
+
+    monkeypatch.setitem(sys.modules, "ollama", types.SimpleNamespace(generate=generate))
+    return calls
+
+
+def test_start_loads_with_options(pings):
+    statuses = []
+    warmer = ModelWarmer("m", options={'num_ctx': 4096}, heartbeat=60, on_status=statuses.append)
+    warmer.start()
+    assert pings.done.wait(5)
+    warmer.stop()
+    assert pings[0] == ("m", "30m", {'num_ctx': 4096})
+    warmer._thread.join(5)
+    assert statuses[0] == "Loading model m..." and statuses[-1].startswith("Model m ready")
+
+
+def test_switch_model_moves_the_heartbeat(pings):
+    warmer = ModelWarmer("small", heartbeat=60)
+    assert warmer._load()
+    pings.done.clear()
+    warmer.switch_model("large", {'num_thread': 8})
+    assert pings.done.wait(5)
+    assert pings[-1] == ("large", "30m", {'num_thread': 8})
+    assert warmer.model == "large"
+
+
+def test_load_error_is_reported(pings):
+    warmer = ModelWarmer("missing")
+    assert not warmer._load()
+    assert warmer.state == "error"
+    assert warmer.describe() == "Model missing failed to load: model not found"
@@ -0,0 +1,67 @@
+from collections import Counter
+
+from gptathome.workspace import WorkspaceIndex, chunk_terms, python_chunks
+
+SOURCE = '''"""Doc"""
+import os
+
+LIMIT = 3
+
+
+def first():
+    return LIMIT
+
+
+TABLE = {"a": 1}
+
+
+class Thing:
+    pass
+
+
+if __name__ == "__main__":
+    first()
+'''
+
+
+def test_module_level_code_after_definitions_is_indexed():
+    chunks = python_chunks("mod.py", SOURCE)
+    assert [(c["kind"], c["name"], c["start"], c["end"]) for c in chunks] == [
+        ("module", "mod.py", 1, 4),
+        ("function", "first", 7, 8),
+        ("module", "mod.py:11", 11, 11),
+        ("class", "Thing", 14, 15),
+        ("module", "mod.py:18", 18, 19),
+    ]
+
+
+def full_df(index):
+    df = Counter()
+    for entry in index.files.values():
+        for chunk in entry["chunks"]:
+            df.update(chunk_terms(chunk).keys())
+    return df
+
+
+def test_refresh_updates_frequencies_incrementally(tmp_path):
+    project = tmp_path / "project"
+    project.mkdir()
+    (project / "a.py").write_text("def alpha_value():\n    return 1\n")
+    (project / "b.py").write_text("def beta_value():\n    return 2\n")
+    cache = str(tmp_path / "index.json")
+    index = WorkspaceIndex(str(project), cache)
+    assert index.refresh() == 2
+    assert index.search("alpha")[0][1]["name"] == "alpha_value"
+
+    (project / "a.py").write_text("def gamma_value():\n    return 3\n\nDEFAULT = gamma_value()\n")
+    (project / "b.py").unlink()
+    assert index.refresh() == 1
+    assert index._df == full_df(index)
+    assert not index.search("alpha") and not index.search("beta")
+    assert [chunk["name"] for _, chunk in index.search("gamma")] == ["gamma_value", "a.py:4"]
+
+    # A new index loads the saved files and scores them on its first refresh
+    reloaded = WorkspaceIndex(str(project), cache)
+    assert reloaded.refresh() == 0
+    assert reloaded._df == index._df
+    assert len(reloaded.chunks) == len(index.chunks)